@@ -0,0 +1,98 @@
+"""
+Benchmark for the HTML to DOCX renderer behind /generate-docx.
+
+Renders a long document shaped like the Quill editor's output: headings,
+aligned paragraphs with bold/italic/underline runs, rgb() text colors and
+background highlights, flat and nested lists, links and the odd table. Reports
+the best render time, the save time and the peak Python-heap memory of one
+render (tracemalloc; lxml's C allocations are not included).
+
+Usage:
+    python -m benchmarks.bench_docx_render [--pages 200] [--repeat 3]
+"""
+import io
+import time
+import argparse
+import tracemalloc
+from docx import Document
+from utils.docx_generator import add_html_to_docx
+
+COLORS = ["rgb(230, 0, 0)", "rgb(0, 138, 0)", "rgb(0, 102, 204)", "#9933ff"]
+HIGHLIGHTS = ["rgb(255, 255, 0)", "rgb(204, 232, 204)", "#ffebcc"]
+ALIGN = ["", ' class="ql-align-center"', ' class="ql-align-right"', ' class="ql-align-justify"']
+
+
+def make_paragraph(i: int) -> str:
+    color = COLORS[i % len(COLORS)]
+    highlight = HIGHLIGHTS[i % len(HIGHLIGHTS)]
+    return (
+        f"<p{ALIGN[i % len(ALIGN)]}>The <strong>cell membrane</strong> controls what enters and leaves "
+        f"the cell. <em>Active transport</em> uses <u>ATP</u> to move ions against their gradient, "
+        f'while <span style="color: {color};">diffusion</span> needs no energy. '
+        f'<span style="background-color: {highlight};">Osmosis is the diffusion of water</span> '
+        f'through a <strong><em><span style="color: {color};">partially permeable</span></em></strong> '
+        f'membrane (see <a href="https://example.com/biology/{i % 50}" target="_blank">notes</a>).</p>'
+    )
+
+
+def make_page(n: int) -> str:
+    parts = [f"<h2>Chapter {n + 1}: Transport across membranes</h2>"]
+    parts += [make_paragraph(n * 6 + j) for j in range(6)]
+    parts.append(
+        "<ul><li>Diffusion</li><li class=\"ql-indent-1\">Simple</li>"
+        "<li class=\"ql-indent-1\">Facilitated <strong>by carrier proteins</strong></li>"
+        "<li>Osmosis</li><li>Active transport<ol><li>Sodium-potassium pump</li>"
+        "<li>Endocytosis</li></ol></li></ul>"
+    )
+    if n % 10 == 0:
+        parts.append(
+            "<table><tr><th>Process</th><th>Energy</th></tr>"
+            "<tr><td>Diffusion</td><td>None</td></tr>"
+            "<tr><td>Active transport</td><td><strong>ATP</strong></td></tr></table>"
+        )
+    parts.append("<p><br></p>")
+    return "".join(parts)
+
+
+def make_html(pages: int) -> str:
+    return "".join(make_page(i) for i in range(pages))
+
+
+def render(html: str) -> Document:
+    doc = Document()
+    doc.add_heading("Benchmark", 0)
+    add_html_to_docx(doc, html)
+    return doc
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    html = make_html(args.pages)
+    print(f"{args.pages} pages of Quill HTML, {len(html) / 1e6:.2f} MB")
+
+    best_render = best_save = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        doc = render(html)
+        best_render = min(best_render, time.perf_counter() - start)
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        doc.save(buffer)
+        best_save = min(best_save, time.perf_counter() - start)
+
+    tracemalloc.start()
+    render(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"render: {best_render:.3f}s  save: {best_save:.3f}s  "
+          f"peak Python memory: {peak / 1e6:.1f} MB  docx: {buffer.getbuffer().nbytes / 1e6:.2f} MB")
+    print(f"paragraphs: {len(doc.paragraphs)}  tables: {len(doc.tables)}")
+
+
+if __name__ == "__main__":
+    main()
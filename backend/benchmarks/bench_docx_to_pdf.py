@@ -0,0 +1,73 @@
+"""
+Benchmark cold vs pooled DOCX to PDF conversion.
+
+Cold runs one `libreoffice --convert-to` process per document, as the
+endpoint used to. Pooled submits all documents to LibreOfficePool at once.
+Requires LibreOffice; the pooled run also needs unoserver (see UNOSERVER_CMD).
+Without it the pooled run converts cold too, which is printed as a warning
+and as "COLD FALLBACK" in its result line.
+
+Usage:
+    python -m benchmarks.bench_docx_to_pdf [--docs 8] [--pool-size 2]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from docx import Document
+from utils.docx_to_pdf import UNOSERVER_CMD, convert_docx_to_pdf, LibreOfficePool
+
+
+def make_docs(directory: str, count: int) -> list[str]:
+    paths = []
+    for i in range(count):
+        doc = Document()
+        doc.add_heading(f"Handout {i}", 0)
+        for j in range(40):
+            doc.add_paragraph(f"Paragraph {j}: the quick brown fox jumps over the lazy dog. " * 4)
+        path = os.path.join(directory, f"handout-{i}.docx")
+        doc.save(path)
+        paths.append(path)
+    return paths
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_docs(tmp, args.docs)
+
+        start = time.perf_counter()
+        for path in paths:
+            convert_docx_to_pdf(path, os.path.join(tmp, "cold"))
+        cold = time.perf_counter() - start
+
+        pool = LibreOfficePool(args.pool_size)
+        start = time.perf_counter()
+        await pool.start()
+        startup = time.perf_counter() - start
+        if not pool.warm:
+            print(f"[WARN] No warm LibreOffice instance started (UNOSERVER_CMD={UNOSERVER_CMD!r}); "
+                  "the pooled run falls back to one cold process per document")
+        try:
+            # First conversion on each worker loads the Writer filters
+            await asyncio.gather(*(pool.convert(p, os.path.join(tmp, "warmup")) for p in paths[:args.pool_size]))
+            start = time.perf_counter()
+            await asyncio.gather(*(pool.convert(p, os.path.join(tmp, "pooled")) for p in paths))
+            pooled = time.perf_counter() - start
+            stats = pool.stats()
+        finally:
+            await pool.close()
+
+    print(f"cold:   {cold:.2f}s total, {cold / args.docs:.2f}s/doc, {args.docs / cold:.2f} docs/s")
+    mode = f"{stats['warm_workers']}/{stats['size']} warm workers" if stats["warm"] else "COLD FALLBACK, not warm"
+    print(f"pooled: {pooled:.2f}s total, {pooled / args.docs:.2f}s/doc, {args.docs / pooled:.2f} docs/s "
+          f"({mode}, start-up {startup:.2f}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
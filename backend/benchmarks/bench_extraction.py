@@ -0,0 +1,76 @@
+"""
+Benchmark for the shared document-extraction engine on large text PDFs.
+
+Compares parsing every page serially in one process with extract_document,
+which splits large PDFs across the worker pool. The speedup tracks the
+number of cores available to WORKER_PROCESSES.
+
+Usage:
+    python -m benchmarks.bench_extraction [--pages 400] [--repeat 3]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import fitz
+from utils.extraction import extract_document, _extract_pdf_range, _pdf_page_count
+from utils.workers import WORKER_PROCESSES, get_process_pool, shutdown_pool
+
+LINE = "The mitochondrion is the powerhouse of the cell and produces ATP through respiration."
+
+
+def make_pdf(n_pages: int) -> str:
+    doc = fitz.open()
+    for i in range(n_pages):
+        page = doc.new_page()
+        text = "\n".join(f"{i}.{j} {LINE}" for j in range(45))
+        page.insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=8)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(doc.tobytes())
+    return path
+
+
+def serial(path: str) -> list[str]:
+    texts, _, _ = _extract_pdf_range(path, 0, _pdf_page_count(path))
+    return texts
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = make_pdf(args.pages)
+    warmup = make_pdf(1)
+    print(f"{args.pages}-page PDF, {os.path.getsize(path) / 1e6:.1f} MB, {WORKER_PROCESSES} worker processes")
+
+    # Warm the pool so process start-up is not measured
+    get_process_pool()
+    await extract_document(warmup)
+
+    best_serial = min(_timed(lambda: serial(path)) for _ in range(args.repeat))
+    best_parallel = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        doc = await extract_document(path)
+        best_parallel = min(best_parallel, time.perf_counter() - start)
+
+    print(f"serial:   {best_serial:.3f}s")
+    print(f"parallel: {best_parallel:.3f}s  ({best_serial / best_parallel:.2f}x), "
+          f"mean page {sum(doc.page_timings) / len(doc.page_timings) * 1000:.2f} ms")
+    shutdown_pool()
+    os.remove(path)
+    os.remove(warmup)
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark: import time of the app and time to the first healthy response.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the total and the slowest modules by cumulative import time, checks
+that none of the heavy dependencies (OpenAI SDK, PyMuPDF, lxml/python-docx,
+tiktoken, ...) are imported at start-up, then starts uvicorn several times and
+measures the time from launching the process to the first 200 from /health.
+
+Exits non-zero if a heavy module is imported eagerly or the slowest start
+exceeds the budget, so it can guard against regressions.
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs 5] [--top 15] [--budget 1.0] [--port 8014]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+import httpx
+from benchmarks.load_llm import BACKEND_DIR
+
+# Loaded on first use or by the background preload, never at import
+HEAVY_MODULES = ("openai", "httpx", "lxml", "docx", "docx2txt", "fitz", "pymupdf", "tiktoken",
+                 "PIL", "numpy", "pandas", "scipy", "bs4")
+
+
+def _env() -> dict:
+    return dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "test"))
+
+
+def import_times() -> list[tuple[int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative), depth, name.strip()))
+    return rows
+
+
+def eager_heavy_modules() -> list[str]:
+    code = "import sys, json, main; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=_env(),
+                            capture_output=True, text=True, check=True)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def time_to_healthy(port: int, timeout: float = 30) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1) as http:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if http.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError("Server did not become healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds to the first healthy response")
+    parser.add_argument("--port", type=int, default=8014)
+    args = parser.parse_args()
+
+    rows = import_times()
+    total = next(cumulative for cumulative, _, name in rows if name == "main")
+    print(f"import main: {total / 1000:.0f} ms")
+    for cumulative, depth, name in sorted(rows, reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative / 1000:7.1f} ms  {'  ' * depth}{name}")
+
+    failed = False
+    heavy = eager_heavy_modules()
+    if heavy:
+        failed = True
+        print(f"FAIL: imported at start-up: {', '.join(heavy)}")
+    else:
+        print("no heavy modules imported at start-up")
+
+    times = [time_to_healthy(args.port) for _ in range(args.runs)]
+    print(f"time to first healthy response over {args.runs} starts: "
+          f"median {statistics.median(times):.2f}s, max {max(times):.2f}s (budget {args.budget:.2f}s)")
+    if max(times) > args.budget:
+        failed = True
+        print("FAIL: over budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
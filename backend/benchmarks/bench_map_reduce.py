@@ -0,0 +1,59 @@
+"""
+Benchmark for map-reduce summarization with a stub LLM.
+
+Each stub completion sleeps for a fixed latency, so wall time should track the
+number of parallel chunk batches (ceil(chunks / concurrency)) plus the reduce
+passes, not the page count.
+
+Usage:
+    python -m benchmarks.bench_map_reduce [--latency 0.2] [--concurrency 8]
+"""
+import time
+import asyncio
+import argparse
+from utils.chunking import split_into_chunks
+from utils.map_reduce import map_reduce_summarize, SUMMARY_CHUNK_TOKENS
+from utils.prompts import PromptTemplate, get_prompt
+
+PARAGRAPH = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "The light-dependent reactions occur in the thylakoid membranes. "
+) * 6
+
+
+def make_pages(n: int) -> list[str]:
+    return [f"Chapter {i // 20 + 1}\n\n{PARAGRAPH}\n\n{PARAGRAPH}" for i in range(n)]
+
+
+def stub_llm(latency: float):
+    calls = {"count": 0}
+
+    async def complete(prompt: PromptTemplate, text: str, max_tokens: int, kind: str) -> str:
+        calls["count"] += 1
+        await asyncio.sleep(latency)
+        return f"Summary of {len(text)} characters about photosynthesis."
+
+    return complete, calls
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for n_pages in (10, 50, 150, 300):
+        pages = make_pages(n_pages)
+        n_chunks = len(split_into_chunks(pages, SUMMARY_CHUNK_TOKENS))
+        complete, calls = stub_llm(args.latency)
+        start = time.perf_counter()
+        await map_reduce_summarize(pages, get_prompt("summary.short"), complete,
+                                   concurrency=args.concurrency)
+        elapsed = time.perf_counter() - start
+        batches = -(-n_chunks // args.concurrency)
+        print(f"pages={n_pages:<4} chunks={n_chunks:<4} map_batches={batches:<3} "
+              f"llm_calls={calls['count']:<4} wall={elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
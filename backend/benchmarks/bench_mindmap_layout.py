@@ -0,0 +1,63 @@
+"""
+Benchmark for the server-side mindmap layout (utils/graph_layout.py).
+
+Builds mindmap-shaped graphs (a tree of topics with a few cross-links) of
+increasing size and lays each one out. Reports the algorithm used, the
+layout time, the number of clusters, the size of the JSON layout payload
+and, for a sample of nodes, the closest distance between two nodes and how
+many pairs sit closer than half the minimum ring gap (overlapping nodes).
+
+Usage:
+    python -m benchmarks.bench_mindmap_layout [--sizes 100,300,1000,3000,10000] [--repeat 3]
+"""
+import json
+import time
+import random
+import argparse
+import numpy as np
+from utils.graph_layout import NODE_GAP, layout_graph
+
+SAMPLE = 2000
+
+
+def make_graph(n: int, seed: int = 0) -> tuple[list[str], list[str], list[list[str]]]:
+    rng = random.Random(seed)
+    ids = [str(i) for i in range(n)]
+    labels = [f"Concept {i}" for i in range(n)]
+    # Early nodes get most children, like topics and subtopics in a mindmap
+    pairs = [[str(rng.randrange(max(1, i // 4))), str(i)] for i in range(1, n)]
+    pairs += [[str(rng.randrange(n)), str(rng.randrange(n))] for _ in range(n // 20)]
+    return ids, labels, pairs
+
+
+def crowding(layout: dict) -> tuple[float, int]:
+    pos = np.stack([layout["x"], layout["y"]], axis=1)
+    if len(pos) > SAMPLE:
+        pos = pos[np.random.default_rng(0).choice(len(pos), SAMPLE, replace=False)]
+    dist = np.linalg.norm(pos[:, None, :] - pos[None, :, :], axis=2)
+    np.fill_diagonal(dist, np.inf)
+    return float(dist.min()), int((dist < NODE_GAP / 2).sum() // 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,300,1000,3000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6} {'algorithm':>10} {'best':>9} {'clusters':>9} {'payload':>9} {'min dist':>9} {'close pairs':>12}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        ids, labels, pairs = make_graph(n)
+        times = []
+        for seed in range(args.repeat):
+            started = time.perf_counter()
+            layout = layout_graph(ids, labels, pairs, seed=seed)
+            times.append(time.perf_counter() - started)
+        closest, close = crowding(layout)
+        payload = len(json.dumps(layout, separators=(",", ":")))
+        print(f"{n:>6} {layout['algorithm']:>10} {1000 * min(times):>7.0f}ms {len(layout['clusters']):>9} "
+              f"{payload / 1024:>7.0f}KB {closest:>9.1f} {close:>12}")
+
+
+if __name__ == "__main__":
+    main()
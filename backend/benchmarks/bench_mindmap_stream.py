@@ -0,0 +1,97 @@
+"""
+Check and benchmark streamed mindmap parsing against the local fake OpenAI server.
+
+Sends one /generate-mindmap-stream request per reply shape the fake server
+can produce (clean, fenced, truncated, malformed) and reports the time to the
+first node, the total time, how many nodes and edges arrived, and how many
+upstream completions were used. Clean and fenced replies must need one
+completion; broken ones one repair. Exits non-zero if any scenario fails.
+
+Usage:
+    python -m benchmarks.bench_mindmap_stream [--latency 0.5] [--tokens-per-sec 40]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import httpx
+from benchmarks.load_llm import start_server, wait_healthy
+
+FAKE = "http://127.0.0.1:8001"
+BACKEND = "http://127.0.0.1:8002"
+TEXT = "Photosynthesis converts light energy into chemical energy inside chloroplasts. " * 4
+
+# scenario -> completions it should take
+SCENARIOS = {"clean": 1, "fenced": 1, "truncated": 2, "malformed": 2}
+
+
+async def run_scenario(http: httpx.AsyncClient, name: str) -> dict:
+    # A fresh nonce keeps the result cache out of the measurement
+    text = f"[fake:{name}] {TEXT} run{uuid.uuid4().hex[:8]}"
+    before = (await http.get(f"{FAKE}/stats")).json()["completions"]
+    counts = {"node": 0, "edge": 0, "repair": 0}
+    first_node = done = None
+    event = None
+    start = time.perf_counter()
+    async with http.stream("POST", f"{BACKEND}/generate-mindmap-stream", json={"text": text, "mode": "single"}) as r:
+        async for line in r.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event in counts:
+                    counts[event] += 1
+                if event == "node" and first_node is None:
+                    first_node = time.perf_counter() - start
+                if event == "done":
+                    done = json.loads(line[6:])
+                if event == "error":
+                    raise RuntimeError(f"{name}: {line[6:]}")
+    total = time.perf_counter() - start
+    after = (await http.get(f"{FAKE}/stats")).json()["completions"]
+    return {
+        "first_node": first_node, "total": total, "completions": after - before,
+        "nodes": len(done["nodes"]) if done else 0, "edges": len(done["edges"]) if done else 0, **counts,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "FAKE_OPENAI_LATENCY": str(args.latency),
+        "FAKE_OPENAI_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "OPENAI_API_KEY": "test",
+        "OPENAI_BASE_URL": f"{FAKE}/v1",
+    })
+    fake = start_server(["benchmarks.fake_openai:app", "--port", "8001"], env)
+    backend = start_server(["main:app", "--port", "8002"], env)
+    failed = False
+    try:
+        await wait_healthy(f"{FAKE}/docs")
+        await wait_healthy(f"{BACKEND}/health")
+        print(f"upstream latency {args.latency}s, {args.tokens_per_sec:g} tokens/s")
+        print(f"{'reply':<10} {'first node':>10} {'total':>7} {'nodes':>6} {'edges':>6} {'repairs':>8} {'completions':>12}")
+        async with httpx.AsyncClient(timeout=120) as http:
+            for name, expected in SCENARIOS.items():
+                result = await run_scenario(http, name)
+                ok = result["nodes"] > 0 and result["completions"] == expected
+                failed |= not ok
+                print(f"{name:<10} {result['first_node'] or 0:>9.2f}s {result['total']:>6.2f}s "
+                      f"{result['nodes']:>6} {result['edges']:>6} {result['repair']:>8} "
+                      f"{result['completions']:>12}{'' if ok else '  FAILED'}")
+    finally:
+        for proc in (backend, fake):
+            proc.terminate()
+            proc.wait()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
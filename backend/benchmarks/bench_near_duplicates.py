@@ -0,0 +1,120 @@
+"""
+Benchmark for the near-duplicate index (utils/minhash.py).
+
+Stores `--docs` documents: a set of real texts (random words from a
+synthetic vocabulary) and, to reach the target size quickly, random
+signatures that behave like unrelated documents. Then queries edited copies
+of the real texts (new cover page, a moved appendix, changed words) and
+unrelated texts. Reports the signature time of one document, the lookup
+and insert latency at full size, the memory and on-disk size of the index,
+how many edited copies were found and how many unrelated texts matched.
+
+Lookups should stay well under a millisecond at 100k documents.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates [--docs 100000] [--real 500] [--words 3000]
+"""
+import os
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from utils.minhash import MinHashIndex, shingle_hashes
+from utils.near_duplicates import NEAR_DUP_BANDS, NEAR_DUP_NUM_PERM, NEAR_DUP_SHINGLE_WORDS, NEAR_DUP_THRESHOLD
+
+VOCABULARY = [f"term{i}" for i in range(20000)]
+
+
+def make_doc(rng: random.Random, words: int) -> list[str]:
+    return [rng.choice(VOCABULARY) for _ in range(words)]
+
+
+def edit(rng: random.Random, doc: list[str], kind: str) -> list[str]:
+    if kind == "cover":
+        return make_doc(rng, 60) + doc[len(doc) // 50:]
+    if kind == "appendix":
+        cut = len(doc) * 9 // 10
+        return doc[cut:] + doc[:cut]
+    changed = list(doc)  # "words": one word in 200 replaced
+    for i in range(0, len(changed), 200):
+        changed[i] = rng.choice(VOCABULARY)
+    return changed
+
+
+def signature(index: MinHashIndex, words: list[str]) -> np.ndarray:
+    return index.signature(shingle_hashes(words, NEAR_DUP_SHINGLE_WORDS))
+
+
+def percentiles(values: list[float]) -> str:
+    values = sorted(values)
+    return (f"p50 {1e6 * statistics.median(values):.0f} us, "
+            f"p99 {1e6 * values[int(len(values) * 0.99)]:.0f} us, max {1e6 * values[-1]:.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--real", type=int, default=500, help="real texts among the stored documents")
+    parser.add_argument("--words", type=int, default=3000, help="words per real text")
+    args = parser.parse_args()
+    rng = random.Random(7)
+    index = MinHashIndex(NEAR_DUP_NUM_PERM, NEAR_DUP_BANDS)
+
+    docs = [make_doc(rng, args.words) for _ in range(args.real)]
+    started = time.perf_counter()
+    signatures = [signature(index, doc) for doc in docs]
+    per_doc = (time.perf_counter() - started) / len(docs)
+    print(f"signature of a {args.words}-word text: {1000 * per_doc:.2f} ms")
+
+    # Unrelated documents: independent uniform values, like MinHashes of disjoint sets
+    noise = np.random.default_rng(7).integers(0, 2**32, (args.docs - args.real, NEAR_DUP_NUM_PERM), dtype=np.uint64)
+    order = list(range(args.docs))
+    rng.shuffle(order)
+    insert_times = []
+    for n, position in enumerate(order):
+        sig = signatures[position] if position < args.real else noise[position - args.real]
+        started = time.perf_counter()
+        index.add(sig, hashlib.sha256(str(position).encode()).digest())
+        insert_times.append(time.perf_counter() - started)
+    print(f"insert {args.docs} documents: total {sum(insert_times):.2f}s, {percentiles(insert_times)}")
+    print(f"index size in memory: {index.nbytes() / 2**20:.1f} MB ({index.nbytes() / args.docs:.0f} bytes per document)")
+
+    found, lookup_times, similarities = 0, [], []
+    for i, doc in enumerate(docs):
+        kind = ("cover", "appendix", "words")[i % 3]
+        sig = signature(index, edit(rng, doc, kind))
+        started = time.perf_counter()
+        matches = index.query(sig, NEAR_DUP_THRESHOLD)
+        lookup_times.append(time.perf_counter() - started)
+        if matches and matches[0][0] == hashlib.sha256(str(i).encode()).digest():
+            found += 1
+            similarities.append(matches[0][1])
+    false_matches = 0
+    for _ in range(args.real):
+        sig = signature(index, make_doc(rng, args.words))
+        started = time.perf_counter()
+        false_matches += bool(index.query(sig, NEAR_DUP_THRESHOLD))
+        lookup_times.append(time.perf_counter() - started)
+    print(f"lookup at {index.size} documents: {percentiles(lookup_times)}")
+    print(f"edited copies found: {found}/{len(docs)} (threshold {NEAR_DUP_THRESHOLD}, "
+          f"mean similarity {statistics.mean(similarities or [0]):.3f}); unrelated texts matched: {false_matches}/{args.real}")
+
+    fd, path = tempfile.mkstemp(suffix=".npz")
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        MinHashIndex.load(path, NEAR_DUP_NUM_PERM, NEAR_DUP_BANDS)
+        loaded = time.perf_counter() - started
+        print(f"save {saved:.2f}s, load {loaded:.2f}s, file {os.path.getsize(path) / 2**20:.1f} MB")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Tail latency of the LLM endpoints under upstream latency spikes, with and
+without hedging, and the completions saved by coalescing identical requests.
+
+Starts the fake OpenAI server with FAKE_OPENAI_SPIKE_RATE of its replies
+delayed by FAKE_OPENAI_SPIKE_SECONDS, then runs the backend twice: with
+OPENAI_HEDGE=0 and with OPENAI_HEDGE=1. Each run sends distinct `/summarize`
+requests (after a warm-up that fills the latency window) and reports the
+latency percentiles and the completions the fake server served for them.
+
+Then sends `--identical` concurrent copies of one `/summarize` and one
+`/summarize-stream` request, with the result cache off, and reports how many
+completions they needed.
+
+Exits non-zero if any of these fails:
+- each set of identical concurrent requests needs exactly one completion;
+- hedged p99 is below the spike latency (upstream latency + spike);
+- backups sent stay within the budget: OPENAI_HEDGE_BURST plus
+  OPENAI_HEDGE_BUDGET per hedgeable call;
+- every losing request that reached the fake server is cancelled there
+  (it counts requests the client hung up on), and none are without hedging.
+
+Usage:
+    python -m benchmarks.bench_tail_latency [--requests 300] [--concurrency 8] [--spike-rate 0.05]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from benchmarks.load_llm import start_server, wait_healthy
+from utils.openai_client import OPENAI_HEDGE_BUDGET, OPENAI_HEDGE_BURST
+
+FAKE = "http://127.0.0.1:8001"
+BACKEND = "http://127.0.0.1:8002"
+TEXT = "The water cycle moves water between the oceans, the air and the land. " * 20
+
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def fake_stats(http: httpx.AsyncClient) -> dict:
+    return (await http.get(f"{FAKE}/stats")).json()
+
+
+async def hedges(http: httpx.AsyncClient) -> dict:
+    counts = {"won": 0, "lost": 0, "skipped": 0}
+    for line in (await http.get(f"{BACKEND}/metrics")).text.splitlines():
+        if line.startswith("summaraize_openai_hedges_total{"):
+            counts[line.split('"')[1]] = int(float(line.split()[-1]))
+    return counts
+
+
+async def send(http: httpx.AsyncClient, total: int, concurrency: int, offset: int) -> list[float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with sem:
+            started = time.perf_counter()
+            r = await http.post(f"{BACKEND}/summarize", json={"text": f"Handout {offset + i}. {TEXT}", "type": "short"})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+async def identical(http: httpx.AsyncClient, copies: int, stream: bool) -> int:
+    before = (await fake_stats(http))["completions"]
+    payload = {"text": f"Shared handout, streamed={stream}. {TEXT}", "type": "short"}
+
+    async def one():
+        if stream:
+            async with http.stream("POST", f"{BACKEND}/summarize-stream", json=payload) as r:
+                r.raise_for_status()
+                async for _ in r.aiter_bytes():
+                    pass
+        else:
+            (await http.post(f"{BACKEND}/summarize", json=payload)).raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(copies)))
+    return (await fake_stats(http))["completions"] - before
+
+
+async def run(args, env: dict, hedge: bool) -> list[str]:
+    failures = []
+    env = {**env, "OPENAI_HEDGE": "1" if hedge else "0"}
+    backend = start_server(["main:app", "--port", "8002"], env)
+    try:
+        await wait_healthy(f"{BACKEND}/health")
+        async with httpx.AsyncClient(timeout=300) as http:
+            await send(http, args.warmup, args.concurrency, offset=-args.warmup)
+            await asyncio.sleep(0.5)  # let cancellations from the warm-up reach the fake server
+            before, hedges_before = await fake_stats(http), await hedges(http)
+            started = time.perf_counter()
+            latencies = await send(http, args.requests, args.concurrency, offset=0)
+            elapsed = time.perf_counter() - started
+            await asyncio.sleep(0.5)
+            after, hedges_after = await fake_stats(http), await hedges(http)
+            used = after["completions"] - before["completions"]
+            cancelled = after["cancelled"] - before["cancelled"]
+            fired = {k: hedges_after[k] - hedges_before[k] for k in hedges_after}
+            sent = fired["won"] + fired["lost"]
+            p99 = percentile(latencies, 0.99)
+            print(f"hedging {'on ' if hedge else 'off'}: p50 {statistics.median(latencies):.2f}s, "
+                  f"p95 {percentile(latencies, 0.95):.2f}s, p99 {p99:.2f}s, "
+                  f"max {max(latencies):.2f}s, {args.requests / elapsed:.1f} req/s, "
+                  f"{used} completions for {args.requests} requests, backups {fired}, "
+                  f"{cancelled} cancelled upstream")
+
+            if not hedge:
+                if sent or cancelled:
+                    failures.append(f"hedging off, yet {sent} backups sent and {cancelled} requests cancelled")
+                return failures
+            spike = args.latency + args.spike_seconds
+            if p99 >= spike:
+                failures.append(f"hedged p99 {p99:.2f}s is not below the spike latency {spike:.2f}s")
+            total_sent = hedges_after["won"] + hedges_after["lost"]
+            budget = OPENAI_HEDGE_BURST + OPENAI_HEDGE_BUDGET * (args.warmup + args.requests)
+            if total_sent > budget:
+                failures.append(f"{total_sent} backups sent, over the budget of {budget:.1f}")
+            # A backup cancelled before it reached the fake server is no extra completion
+            extra = used - args.requests
+            if extra > sent:
+                failures.append(f"{used} completions for {args.requests} requests and only {sent} backups")
+            if cancelled < extra:
+                failures.append(f"only {cancelled} of the {extra} losing requests were cancelled upstream")
+
+            for stream in (False, True):
+                used = await identical(http, args.identical, stream)
+                route = "/summarize-stream" if stream else "/summarize"
+                print(f"{args.identical} identical concurrent {route} requests: {used} completion(s)")
+                if used != 1:
+                    failures.append(f"{args.identical} identical {route} requests needed {used} completions, not 1")
+    finally:
+        backend.terminate()
+        backend.wait()
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=40, help="requests that fill the latency window first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--spike-seconds", type=float, default=5.0)
+    parser.add_argument("--identical", type=int, default=30)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "FAKE_OPENAI_LATENCY": str(args.latency),
+        "FAKE_OPENAI_SPIKE_RATE": str(args.spike_rate),
+        "FAKE_OPENAI_SPIKE_SECONDS": str(args.spike_seconds),
+        "OPENAI_API_KEY": "test",
+        "OPENAI_BASE_URL": f"{FAKE}/v1",
+        "OPENAI_HEDGE_MIN_DELAY_SECONDS": env.get("OPENAI_HEDGE_MIN_DELAY_SECONDS", "0.2"),
+        "CACHE_MAX_ENTRIES": "0",
+        "NEAR_DUP_THRESHOLD": "2",
+    })
+    fake = start_server(["benchmarks.fake_openai:app", "--port", "8001"], env)
+    failures = []
+    try:
+        await wait_healthy(f"{FAKE}/docs")
+        print(f"upstream latency {args.latency}s, {args.spike_rate:.0%} of replies {args.spike_seconds}s slower")
+        for hedge in (False, True):
+            failures += await run(args, env, hedge)
+    finally:
+        fake.terminate()
+        fake.wait()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
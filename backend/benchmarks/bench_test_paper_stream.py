@@ -0,0 +1,107 @@
+"""
+Benchmark for test-paper uploads: time to first question and event-loop stalls.
+
+Builds a long exam PDF (questions run over page breaks and the answer key
+sits on the last pages), starts the API server and posts it to
+/upload-test-paper-stream and /upload-test-paper while polling /health.
+Reports when the first question arrived, the total time, the number of
+questions and the slowest /health reply during each upload. With extraction
+and parsing off the event loop, /health should stay fast throughout.
+
+A warm-up upload starts the worker pool first, and each endpoint gets its
+own copy of the paper so neither hits the text cache.
+
+Usage:
+    python -m benchmarks.bench_test_paper_stream [--pages 200] [--port 8012]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import fitz
+import httpx
+from benchmarks.load_llm import start_server, wait_healthy
+from benchmarks.bench_test_parser import make_paper
+
+LINES_PER_PAGE = 45
+
+
+def make_pdf(pages: int, variant: int) -> str:
+    lines = make_paper(pages * LINES_PER_PAGE // 5).splitlines()
+    lines[0] += f" ({variant})"
+    doc = fitz.open()
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        page = doc.new_page()
+        page.insert_text((36, 36), "\n".join(lines[start:start + LINES_PER_PAGE]), fontsize=9)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(doc.tobytes())
+    return path
+
+
+async def watch_health(base: str, stop: asyncio.Event) -> float:
+    worst = 0.0
+    async with httpx.AsyncClient() as http:
+        while not stop.is_set():
+            start = time.perf_counter()
+            await http.get(f"{base}/health")
+            worst = max(worst, time.perf_counter() - start)
+            await asyncio.sleep(0.02)
+    return worst
+
+
+async def upload(base: str, endpoint: str, path: str) -> dict:
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(watch_health(base, stop))
+    first = None
+    questions = 0
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600) as http:
+        with open(path, "rb") as f:
+            files = {"file": ("paper.pdf", f, "application/pdf")}
+            if endpoint.endswith("-stream"):
+                async with http.stream("POST", f"{base}{endpoint}", files=files, data={"title": "Bench"}) as r:
+                    async for line in r.aiter_lines():
+                        if line == "event: question":
+                            questions += 1
+                            first = first or time.perf_counter() - start
+                        elif line == "event: error":
+                            raise RuntimeError(f"{endpoint} failed")
+            else:
+                r = await http.post(f"{base}{endpoint}", files=files, data={"title": "Bench"})
+                questions = len(r.json()["questions"])
+                first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    stop.set()
+    return {"first": first, "total": total, "questions": questions, "health": await watcher}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8012)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "test")
+    base = f"http://127.0.0.1:{args.port}"
+    papers = [make_pdf(args.pages, variant) for variant in (1, 2, 3)]
+    server = start_server(["main:app", "--port", str(args.port)], env)
+    try:
+        await wait_healthy(f"{base}/health")
+        await upload(base, "/upload-test-paper", papers[2])  # start the worker pool
+        print(f"{args.pages}-page paper")
+        for endpoint, path in zip(("/upload-test-paper-stream", "/upload-test-paper"), papers):
+            result = await upload(base, endpoint, path)
+            print(f"{endpoint:<26} first question {result['first']:.2f}s, total {result['total']:.2f}s, "
+                  f"{result['questions']} questions, slowest /health {result['health'] * 1000:.0f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+        for path in papers:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Benchmark for the test-paper parser on a large question bank.
+
+Generates a paper in the formats teachers upload: numbered stems that wrap
+over several lines, options as "A.", "B)", "(c)" or several to a line, E and
+F options, sub-parts, inline answers and an answer key at the end. Reports
+parse throughput for the list API and the peak Python memory of the list API
+against consuming the generator API.
+
+Usage:
+    python -m benchmarks.bench_test_parser [--questions 5000] [--repeat 3]
+"""
+import time
+import argparse
+import tracemalloc
+from utils import parser as test_parser
+
+STEM = "Which of the following statements about enzyme activity is correct when the temperature"
+
+
+def make_question(n: int) -> str:
+    style = n % 6
+    if style == 0:
+        return f"{n}. {STEM}\nrises above the optimum?\nA. It increases\nB. It decreases\nC. It stays the same\nD. It doubles\nAnswer: B"
+    if style == 1:
+        return f"Q{n}. {STEM} falls?\n(a) It increases\n(b) It decreases\n(c) It stops\n(d) It doubles\n(e) None of these\nAns: (b)"
+    if style == 2:
+        return f"{n}) {STEM} is constant?\nA) Rate is constant    B) Rate falls    C) Rate rises    D) Unknown"
+    if style == 3:
+        return f"{n}. Explain how temperature affects enzyme activity.\n(i) Define the optimum temperature.\n(ii) Describe denaturation."
+    if style == 4:
+        return (f"Question {n}: {STEM}\nis lowered slowly over a long period of time?\n"
+                f"a) It rises\nb) It falls\nc) It is unchanged\nd) It varies\ne) It doubles\nf) It halves")
+    return f"{n}. Name the molecule that enzymes act on.\nAnswer: The substrate"
+
+
+def make_paper(questions: int) -> str:
+    body = "\n".join(make_question(n) for n in range(1, questions + 1))
+    key = "\n".join(f"{n}. {'ABCD'[n % 4]}" for n in range(1, questions + 1) if n % 6 in (2, 4))
+    return f"Biology Question Bank\nAnswer all questions.\n{body}\nAnswer Key\n{key}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paper = make_paper(args.questions)
+    print(f"{args.questions} questions, {len(paper) / 1e6:.2f} MB of text")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        questions = test_parser.parse_test_paper(paper)
+        best = min(best, time.perf_counter() - start)
+    mcq = sum(q["type"] == "mcq" for q in questions)
+    answered = sum(bool(q.get("correctAnswer")) for q in questions)
+    print(f"parse_test_paper: {best:.3f}s ({len(questions) / best:,.0f} questions/s), "
+          f"{len(questions)} questions, {mcq} mcq, {answered} with answers")
+
+    tracemalloc.start()
+    test_parser.parse_test_paper(paper)
+    _, list_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"peak Python memory, list API: {list_peak / 1e6:.1f} MB")
+
+    if hasattr(test_parser, "iter_test_paper"):
+        pages = paper.split("\nQuestion ")  # any chunking works; stands in for pages
+        pages = [pages[0]] + ["Question " + p for p in pages[1:]]
+        tracemalloc.start()
+        for _ in test_parser.iter_test_paper(pages):
+            pass
+        _, iter_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak Python memory, generator API: {iter_peak / 1e6:.1f} MB (excluding the input)")
+
+
+if __name__ == "__main__":
+    main()
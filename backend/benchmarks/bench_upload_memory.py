@@ -0,0 +1,119 @@
+"""
+Benchmark for peak server memory while accepting large uploads.
+
+Starts a fresh API server for each upload size, posts a PDF of that size to
+/upload-test-paper and reports the peak resident memory (VmHWM) of the server
+and, separately, of its worker processes. With uploads spooled to disk the
+API process peak should stay roughly flat as the file grows, instead of
+growing with several copies of it. Workers still need memory to parse the
+document itself.
+
+The PDF is padded with incompressible image data so its size on disk matches
+the requested size. Linux only (reads /proc).
+
+Usage:
+    python -m benchmarks.bench_upload_memory [--sizes 10,50,90] [--port 8010]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import fitz
+import httpx
+
+
+def make_pdf(size_mb: int) -> str:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "1. What is 2 + 2?\nA. 3\nB. 4\nAnswer: B")
+    # Noise images do not compress, so each one adds its raw size to the file
+    side = 1024
+    for _ in range(size_mb // 3 or 1):
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, side, side), False)
+        pix.set_origin(0, 0)
+        pix.samples_mv[:] = os.urandom(len(pix.samples_mv))  # type: ignore[index]
+        padding = doc.new_page()
+        padding.insert_image(fitz.Rect(0, 0, 200, 200), pixmap=pix)
+        padding.insert_text((72, 300), "Figure")  # keeps the page out of OCR
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(doc.tobytes(deflate=False))
+    return path
+
+
+def peak_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def descendants(pid: int) -> list[int]:
+    found = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        found += children
+        pending += children
+    return found
+
+
+def run_one(path: str, port: int) -> tuple[int, int, int, float]:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "benchmark")},
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{url}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        idle = peak_rss_kb(server.pid)
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            response = httpx.post(f"{url}/upload-test-paper", files={"file": ("paper.pdf", f)},
+                                  data={"title": "benchmark"}, timeout=600)
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        workers = max((peak_rss_kb(child) for child in descendants(server.pid)), default=0)
+        return idle, peak_rss_kb(server.pid), workers, elapsed
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,50,90", help="comma-separated upload sizes in MB")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+
+    print(f"{'upload':>10} {'api idle':>10} {'api peak':>10} {'worker peak':>12} {'time':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        path = make_pdf(size)
+        try:
+            actual = os.path.getsize(path) / 1e6
+            idle, peak, workers, elapsed = run_one(path, args.port)
+        finally:
+            os.remove(path)
+        print(f"{actual:>8.1f}MB {idle / 1024:>8.1f}MB {peak / 1024:>8.1f}MB "
+              f"{workers / 1024:>10.1f}MB {elapsed:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Minimal OpenAI-compatible chat completions server for local load tests.
+
+Run with:
+    FAKE_OPENAI_LATENCY=1.0 uvicorn benchmarks.fake_openai:app --port 8001
+
+and point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1.
+FAKE_OPENAI_TOKENS_PER_SEC sets the output rate after the first token.
+Latency spikes are injected with FAKE_OPENAI_SPIKE_RATE (share of requests)
+and FAKE_OPENAI_SPIKE_SECONDS (extra delay before their first token).
+
+Mindmap replies can be broken on purpose by putting a marker in the input
+text: "[fake:fenced]" wraps the JSON in prose and a ```json fence,
+"[fake:truncated]" cuts the reply off part-way and "[fake:malformed]" adds a
+trailing comma to one edge. Repair requests (which list "Existing nodes:")
+always get a clean reply. Usage is reported with ~4 characters per prompt
+token (at the end of streams when stream_options asks for it). GET /stats
+returns the number of completions served, spikes injected and requests
+the client cancelled (hung up on) before the reply was complete.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_OPENAI_LATENCY", "1.0"))  # seconds before the first token
+TOKENS_PER_SEC = float(os.getenv("FAKE_OPENAI_TOKENS_PER_SEC", "1000"))
+SPIKE_RATE = float(os.getenv("FAKE_OPENAI_SPIKE_RATE", "0"))
+SPIKE_SECONDS = float(os.getenv("FAKE_OPENAI_SPIKE_SECONDS", "10"))
+
+app = FastAPI()
+stats = {"completions": 0, "spikes": 0, "cancelled": 0}
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4 + 1
+    completion_tokens = len(_tokens(content))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _completion(model: str, content: str, usage: dict) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+def _fake_content(body: dict) -> str:
+    prompt = body["messages"][-1]["content"]
+    if "nodes" in prompt and "edges" in prompt:
+        content = json.dumps(_fake_mindmap(prompt))
+        if "Existing nodes:" in prompt:
+            return content
+        if "[fake:malformed]" in prompt:
+            content = content.replace('"has"}', '"has",}', 1)
+        if "[fake:truncated]" in prompt:
+            content = content[: len(content) * 3 // 5]
+        if "[fake:fenced]" in prompt:
+            content = f"Here is the mindmap:\n```json\n{content}\n```\nLet me know if you need more."
+        return content
+    return f"Fake summary of {len(prompt)} characters."
+
+
+def _fake_mindmap(prompt: str) -> dict:
+    # A star around "Topic" whose leaves are the most frequent words of the
+    # input, so sections that share vocabulary share nodes
+    text = prompt.split("Input:", 1)[-1].split("\n\nA previous reply", 1)[0]
+    counts = Counter(w.strip(".,;:()").lower() for w in text.split() if len(w) > 3 and not w.startswith("[fake:"))
+    labels = ["Topic"] + ([w for w, _ in counts.most_common(6)] or ["Detail"])
+    nodes = [{"id": str(i + 1), "label": label} for i, label in enumerate(labels)]
+    edges = [{"source": "1", "target": str(i + 1), "label": "has"} for i in range(1, len(labels))]
+    return {"nodes": nodes, "edges": edges}
+
+
+def _tokens(content: str) -> list[str]:
+    words = content.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+def _first_token_delay() -> float:
+    if random.random() < SPIKE_RATE:
+        stats["spikes"] += 1
+        return LATENCY + SPIKE_SECONDS
+    return LATENCY
+
+
+async def _wait(request: Request, seconds: float) -> bool:
+    # Sleep like a slow upstream; False if the client hung up meanwhile
+    deadline = time.monotonic() + seconds
+    while (left := deadline - time.monotonic()) > 0:
+        await asyncio.sleep(min(left, 0.05))
+        if await request.is_disconnected():
+            stats["cancelled"] += 1
+            return False
+    return True
+
+
+async def _stream(model: str, content: str, usage: dict | None):
+    try:
+        async for event in _stream_events(model, content, usage):
+            yield event
+    except (asyncio.CancelledError, GeneratorExit):
+        stats["cancelled"] += 1
+        raise
+
+
+async def _stream_events(model: str, content: str, usage: dict | None):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    await asyncio.sleep(_first_token_delay())
+    for token in _tokens(content):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(1 / TOKENS_PER_SEC)
+    if usage:
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": model, "choices": [], "usage": usage}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["completions"] += 1
+    model = body.get("model", "fake")
+    content = _fake_content(body)
+    usage = _usage(body, content)
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(_stream(model, content, usage if include_usage else None),
+                                 media_type="text/event-stream")
+    if not await _wait(request, _first_token_delay() + len(_tokens(content)) / TOKENS_PER_SEC):
+        return Response(status_code=499)
+    return _completion(model, content, usage)
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,127 @@
+"""
+Fixture corpus for the load-test suite.
+
+Generates one file of each kind the upload endpoints accept: a text PDF, a
+scanned PDF (pages rendered to images, no text layer), a DOCX, a PNG photo of
+a page, an exam paper PDF with an answer key and a Quill-style HTML export.
+Content is deterministic, so results of different commits are comparable.
+
+Usage:
+    python -m benchmarks.fixtures [--out benchmarks/fixtures_out] [--pages 20]
+"""
+import os
+import json
+import argparse
+import fitz
+from docx import Document
+from benchmarks.bench_test_parser import make_paper
+from benchmarks.bench_docx_render import make_html
+
+TOPICS = ["photosynthesis", "cellular respiration", "enzyme kinetics", "membrane transport",
+          "the nervous system", "genetic inheritance", "ecosystems", "the immune response"]
+SENTENCES = [
+    "{topic} is a central idea in introductory biology courses.",
+    "Students often confuse {topic} with related processes that share the same molecules.",
+    "The rate of {topic} depends on temperature, concentration and the available surface area.",
+    "Experiments on {topic} usually control one variable at a time and measure the outcome.",
+    "Exam questions about {topic} ask for definitions, diagrams and short explanations.",
+    "A common misconception is that {topic} happens only in specialised cells.",
+]
+LINES_PER_PAGE = 40
+SCAN_DPI = 100
+
+
+def make_text(pages: int) -> list[str]:
+    out = []
+    for page in range(pages):
+        topic = TOPICS[page % len(TOPICS)]
+        lines = [f"Chapter {page + 1}: {topic.capitalize()}"]
+        lines += [SENTENCES[(page + i) % len(SENTENCES)].format(topic=topic).capitalize()
+                  for i in range(LINES_PER_PAGE - 1)]
+        out.append("\n".join(lines))
+    return out
+
+
+def write_pdf(path: str, pages: list[str], fontsize: float = 9):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((36, 36), text, fontsize=fontsize)
+    doc.save(path, garbage=3, deflate=True)
+
+
+def write_scanned_pdf(path: str, pages: list[str]):
+    # Render each page to a bitmap and keep only the image, like a scanner would
+    source = fitz.open()
+    for text in pages:
+        source.new_page().insert_text((36, 36), text, fontsize=11)
+    doc = fitz.open()
+    for page in source:
+        pix = page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+        doc.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, pixmap=pix)
+    doc.save(path, garbage=3, deflate=True)
+
+
+def write_image(path: str, text: str):
+    doc = fitz.open()
+    doc.new_page().insert_text((36, 36), text, fontsize=11)
+    doc[0].get_pixmap(dpi=SCAN_DPI).save(path, output="png")
+
+
+def write_docx(path: str, pages: list[str]):
+    doc = Document()
+    for text in pages:
+        title, *lines = text.splitlines()
+        doc.add_heading(title, 1)
+        for start in range(0, len(lines), 6):
+            doc.add_paragraph(" ".join(lines[start:start + 6]))
+    doc.save(path)
+
+
+def write_json(path: str, payload: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def build_corpus(directory: str, pages: int = 20) -> dict[str, str]:
+    """
+    Write the fixture files, reusing ones already there.
+
+    Args:
+        directory (str): Output directory.
+        pages (int): Pages of the text documents.
+
+    Returns:
+        dict[str, str]: Fixture name -> path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    text = make_text(pages)
+    exam = make_paper(pages * 8).splitlines()
+    builders = {
+        "text.pdf": lambda path: write_pdf(path, text),
+        "scanned.pdf": lambda path: write_scanned_pdf(path, text[:3]),
+        "notes.docx": lambda path: write_docx(path, text),
+        "photo.png": lambda path: write_image(path, text[0]),
+        "exam.pdf": lambda path: write_pdf(path, ["\n".join(exam[i:i + 60]) for i in range(0, len(exam), 60)]),
+        "quill.json": lambda path: write_json(path, {"title": "Benchmark notes", "html": make_html(pages)}),
+    }
+    corpus = {}
+    for name, build in builders.items():
+        path = os.path.join(directory, f"{pages}p-{name}")
+        if not os.path.exists(path):
+            build(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        corpus[name] = path
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "fixtures_out"))
+    parser.add_argument("--pages", type=int, default=20)
+    args = parser.parse_args()
+    for name, path in build_corpus(args.out, args.pages).items():
+        print(f"{name:<12} {os.path.getsize(path) / 1024:8.1f} KB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Load test for the LLM-backed endpoints against the local fake OpenAI server.
+
+Starts the fake server and the backend, then fires batches of `/summarize`
+requests at increasing concurrency. With a non-blocking client, throughput
+should grow roughly linearly with concurrency until OPENAI_MAX_CONCURRENCY.
+
+Usage:
+    python -m benchmarks.load_llm [--latency 0.5] [--requests 32]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(args, env):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *args, "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_healthy(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                await http.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+async def run_level(base: str, concurrency: int, total: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    payload = {"text": "Lorem ipsum dolor sit amet. " * 50, "type": "short"}
+
+    async with httpx.AsyncClient(timeout=300) as http:
+        async def one():
+            async with sem:
+                r = await http.post(f"{base}/summarize", json=payload)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "FAKE_OPENAI_LATENCY": str(args.latency),
+        "OPENAI_API_KEY": "test",
+        "OPENAI_BASE_URL": "http://127.0.0.1:8001/v1",
+    })
+    fake = start_server(["benchmarks.fake_openai:app", "--port", "8001"], env)
+    backend = start_server(["main:app", "--port", "8002"], env)
+    try:
+        await wait_healthy("http://127.0.0.1:8001/docs")
+        await wait_healthy("http://127.0.0.1:8002/health")
+        print(f"upstream latency {args.latency}s, {args.requests} requests per level")
+        for level in [int(x) for x in args.levels.split(",")]:
+            rps = await run_level("http://127.0.0.1:8002", level, args.requests)
+            print(f"concurrency={level:<4} throughput={rps:.2f} req/s")
+    finally:
+        for proc in (backend, fake):
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
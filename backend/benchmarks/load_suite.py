@@ -0,0 +1,297 @@
+"""
+End-to-end load test of the upload and export endpoints.
+
+Builds the fixture corpus (benchmarks/fixtures.py), starts the fake OpenAI
+server and the API server, then runs each scenario: `--requests` requests at
+`--concurrency` after one warm-up request. For every scenario it reports
+p50/p95/p99 latency, throughput, errors, peak RSS and CPU time of the API
+process together with its worker processes (LibreOffice, the process pool),
+sampled from /proc every 50 ms. Worker processes that exit during a
+scenario are not counted in the CPU time.
+
+Result caches are disabled (CACHE_MAX_ENTRIES=0) and conversions get a
+unique payload per request, so every request does the full work; pass
+--cached to measure the warm path instead. Scenarios whose external tool
+(tesseract, LibreOffice) is missing are skipped.
+
+Results are written as JSON to benchmarks/results/<commit>.json (or --out);
+--compare prints the change against an earlier results file.
+
+Runs offline, Linux only (reads /proc).
+
+Usage:
+    python -m benchmarks.load_suite [--requests 20] [--concurrency 4] [--latency 0.2]
+        [--tokens-per-sec 1000] [--pages 20] [--scenarios summarize-pdf,mindmap-pdf]
+        [--cached] [--out results.json] [--compare benchmarks/results/abc1234.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import zipfile
+import argparse
+import platform
+import subprocess
+from dataclasses import dataclass
+from typing import Callable
+import httpx
+from benchmarks.load_llm import BACKEND_DIR, start_server, wait_healthy
+from benchmarks.bench_upload_memory import descendants
+from benchmarks.fixtures import build_corpus
+from utils.ocr import TESSERACT_CMD
+from utils.docx_to_pdf import LIBREOFFICE_CMD
+
+FAKE_PORT = 8001
+SAMPLE_INTERVAL = 0.05
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    fixture: str
+    # (fixture bytes, request number) -> httpx request keyword arguments
+    request: Callable[[bytes, int], dict]
+    needs: str | None = None  # external tool the endpoint shells out to
+
+
+def upload(filename: str, **form) -> Callable[[bytes, int], dict]:
+    return lambda data, i: {"files": {"file": (filename, data)}, "data": form}
+
+
+def unique_docx(data: bytes, i: int) -> bytes:
+    # A different zip comment changes the content hash but not the document
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            target.writestr(item, source.read(item.filename))
+        target.comment = f"request {i}".encode()
+    return out.getvalue()
+
+
+SCENARIOS = [
+    Scenario("summarize-pdf", "/summarize-file", "text.pdf", upload("notes.pdf", type="short")),
+    Scenario("summarize-docx", "/summarize-file", "notes.docx", upload("notes.docx", type="bullet")),
+    Scenario("summarize-scanned", "/summarize-file", "scanned.pdf", upload("scan.pdf", type="short"), "tesseract"),
+    Scenario("summarize-image", "/summarize-file", "photo.png", upload("photo.png", type="short"), "tesseract"),
+    Scenario("mindmap-pdf", "/generate-mindmap-file", "text.pdf", upload("notes.pdf")),
+    Scenario("test-paper", "/upload-test-paper", "exam.pdf", upload("exam.pdf", title="Benchmark")),
+    Scenario("generate-docx", "/generate-docx", "quill.json",
+             lambda data, i: {"json": {**json.loads(data), "title": f"Benchmark notes {i}"}}),
+    Scenario("convert-docx", "/convert-docx-to-pdf", "notes.docx",
+             lambda data, i: {"files": {"file": ("notes.docx", unique_docx(data, i))}}, "libreoffice"),
+]
+
+TOOLS = {"tesseract": TESSERACT_CMD, "libreoffice": LIBREOFFICE_CMD}
+COMPARED = {"p50_seconds": "p50", "p95_seconds": "p95", "p99_seconds": "p99", "throughput_rps": "req/s",
+            "peak_rss_mb": "rss", "cpu_seconds": "cpu"}
+
+
+def percentile(values: list[float], q: float) -> float:
+    # Nearest rank on sorted values
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+class ProcessSampler:
+    """
+    Tracks peak RSS and CPU time of a process tree while a scenario runs.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss = 0
+        self._cpu = {}  # pid -> (first, last) CPU seconds
+        self._task = None
+
+    def _read(self):
+        rss = 0
+        for pid in [self.pid, *descendants(self.pid)]:
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    rss += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, IndexError, ValueError):
+                continue
+            cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+            first, _ = self._cpu.get(pid, (cpu, cpu))
+            self._cpu[pid] = (first, cpu)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    async def _run(self):
+        while True:
+            self._read()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    def start(self):
+        self._read()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> tuple[int, float]:
+        self._task.cancel()
+        self._read()
+        return self.peak_rss, sum(last - first for first, last in self._cpu.values())
+
+
+async def run_scenario(http: httpx.AsyncClient, base: str, pid: int, scenario: Scenario,
+                       data: bytes, requests: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def one(i: int):
+        async with sem:
+            started = time.perf_counter()
+            try:
+                r = await http.post(f"{base}{scenario.path}", **scenario.request(data, i))
+                if r.status_code != 200 or (r.headers.get("content-type", "").startswith("application/json")
+                                            and "error" in r.json()):
+                    errors.append(f"{r.status_code}: {r.text[:200]}")
+                    return
+            except httpx.HTTPError as e:
+                errors.append(repr(e))
+                return
+            latencies.append(time.perf_counter() - started)
+
+    await one(-1)  # warm-up: worker pool, lazy imports, LibreOffice
+    errors.clear()
+    latencies.clear()
+
+    sampler = ProcessSampler(pid)
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    peak_rss, cpu = await sampler.stop()
+
+    latencies.sort()
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(100 * cpu / wall, 1),
+    }
+    if latencies:
+        result.update({f"p{q}_seconds": round(percentile(latencies, q), 4) for q in (50, 95, 99)})
+        result["max_seconds"] = round(latencies[-1], 4)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nchange against {baseline['meta']['commit']} ({baseline_path}):")
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if not before or "p50_seconds" not in before or "p50_seconds" not in result:
+            continue
+        deltas = []
+        for field, label in COMPARED.items():
+            if before.get(field):
+                deltas.append(f"{label} {100 * (result[field] / before[field] - 1):+.0f}%")
+        print(f"  {name:<18} " + "  ".join(deltas))
+
+
+def print_table(results: dict):
+    print(f"\n{'scenario':<18} {'ok':>4} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'req/s':>7} {'rss MB':>7} {'cpu s':>7} {'cpu %':>6}")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<18} skipped: {r['skipped']}")
+            continue
+        latency = [f"{r[f'p{q}_seconds']:>7.3f}s" if f"p{q}_seconds" in r else f"{'-':>8}" for q in (50, 95, 99)]
+        print(f"{name:<18} {r['ok']:>4} {r['errors']:>4} {' '.join(latency)} {r['throughput_rps']:>7.2f} "
+              f"{r['peak_rss_mb']:>7.1f} {r['cpu_seconds']:>7.2f} {r['cpu_percent']:>6.0f}")
+        if "first_error" in r:
+            print(f"{'':<18} first error: {r['first_error']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=1000, help="fake LLM output token rate")
+    parser.add_argument("--pages", type=int, default=20, help="pages of the fixture documents")
+    parser.add_argument("--scenarios", default="", help="comma-separated names, default all")
+    parser.add_argument("--cached", action="store_true", help="keep the result caches on")
+    parser.add_argument("--port", type=int, default=8015)
+    parser.add_argument("--out", default="")
+    parser.add_argument("--compare", default="", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    selected = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios.split(",")]
+    corpus = build_corpus(os.path.join(os.path.dirname(__file__), "fixtures_out"), args.pages)
+
+    env = dict(os.environ)
+    env.update({
+        "FAKE_OPENAI_LATENCY": str(args.latency),
+        "FAKE_OPENAI_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "OPENAI_API_KEY": "test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}/v1",
+    })
+    if not args.cached:
+        env["CACHE_MAX_ENTRIES"] = "0"
+        env.pop("CACHE_DIR", None)
+    fake = start_server(["benchmarks.fake_openai:app", "--port", str(FAKE_PORT)], env)
+    backend = start_server(["main:app", "--port", str(args.port)], env)
+    base = f"http://127.0.0.1:{args.port}"
+    results = {}
+    try:
+        await wait_healthy(f"http://127.0.0.1:{FAKE_PORT}/docs")
+        await wait_healthy(f"{base}/health")
+        async with httpx.AsyncClient(timeout=600) as http:
+            for scenario in selected:
+                if scenario.needs and not shutil.which(TOOLS[scenario.needs]):
+                    results[scenario.name] = {"skipped": f"{scenario.needs} not installed"}
+                    continue
+                with open(corpus[scenario.fixture], "rb") as f:
+                    data = f.read()
+                print(f"running {scenario.name} ...", flush=True)
+                results[scenario.name] = await run_scenario(http, base, backend.pid, scenario, data,
+                                                            args.requests, args.concurrency)
+    finally:
+        for proc in (backend, fake):
+            proc.terminate()
+            proc.wait()
+
+    print_table(results)
+    commit = git_commit()
+    out = args.out or os.path.join(os.path.dirname(__file__), "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    meta = {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "scenarios": results}, f, indent=2)
+    print(f"\nresults written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
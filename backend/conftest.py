@@ -0,0 +1 @@
+# Makes the backend modules (utils, routers) importable in tests/ when pytest runs from anywhere
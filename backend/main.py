@@ -1,19 +1,124 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from docx import Document
-from routers import summarizer, mindmap, testmode
-from utils.docx_generator import add_html_to_docx
+from routers import summarizer, mindmap, testmode, jobs
+from utils.openai_client import close_clients, get_client
+from utils.tokens import count_tokens
+from utils.cache import cache_stats
+from utils.usage import current_endpoint, usage_stats
+from utils.metrics import debug, render_metrics, request_seconds, timed
+from utils.workers import run_in_process, shutdown_pool, warm_pool
+from utils.docx_to_pdf import libreoffice_pool
+from utils.artifact_store import artifact_store
+from utils.jobs import job_queue
+from utils import near_duplicates
+from utils.uploads import MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, too_large
 
-import io
+import os
+import time
+import asyncio
+import hashlib
 
 app = FastAPI()
 
+background_tasks = []
+
+# Load heavy dependencies once the server is answering /health, not before
+PRELOAD = os.getenv("PRELOAD", "1") == "1"
+PRELOAD_DELAY_SECONDS = float(os.getenv("PRELOAD_DELAY_SECONDS", "0.5"))
+
+def _preload_modules():
+    get_client()  # imports openai and httpx
+    count_tokens("", summarizer.SUMMARY_MODEL)  # loads the tokenizer, if installed
+    count_tokens("", mindmap.MINDMAP_MODEL)
+    import utils.docx_generator  # noqa: F401  lxml and python-docx
+    if near_duplicates.ENABLED:
+        near_duplicates.get_index()  # NumPy and the saved index
+
+async def preload():
+    await asyncio.sleep(PRELOAD_DELAY_SECONDS)
+    started = time.perf_counter()
+    await asyncio.to_thread(_preload_modules)
+    await warm_pool()
+    debug(f"Preloaded dependencies in {time.perf_counter() - started:.2f}s")
+
+@app.on_event("startup")
+async def startup():
+    # Warm the LibreOffice workers in the background so start-up is not delayed
+    background_tasks.append(asyncio.create_task(libreoffice_pool.start()))
+    background_tasks.append(asyncio.create_task(artifact_store.run_eviction()))
+    job_queue.start()
+    if PRELOAD:
+        background_tasks.append(asyncio.create_task(preload()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await close_clients()
+    shutdown_pool()
+    await libreoffice_pool.close()
+    await job_queue.close()
+    await asyncio.to_thread(near_duplicates.save_index)
+
 @app.get("/health") # health endpoint for local Dockerfile build
 def health():
     return {"status": "ok"}
 
+@app.get("/cache-stats")
+def get_cache_stats():
+    return cache_stats()
+
+@app.get("/usage-stats")
+def get_usage_stats():
+    return usage_stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    # LLM token usage is recorded against the endpoint that caused it
+    token = current_endpoint.set(request.url.path)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _observe_request(request, 500, started)
+        raise
+    finally:
+        current_endpoint.reset(token)
+
+    # Streamed responses are timed until their last chunk is sent
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _observe_request(request, response.status_code, started)
+
+    response.body_iterator = timed_body()
+    return response
+
+def _observe_request(request: Request, status: int, started: float):
+    # Label by route template, not raw path, to keep the number of series bounded
+    route = request.scope.get("route")
+    request_seconds.observe(time.perf_counter() - started, request.method,
+                            getattr(route, "path", "unmatched"), str(status))
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject uploads whose declared Content-Length is too large, before reading the body.
+    # Chunked uploads have no declared length; spool_upload enforces the limit for them.
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": too_large().detail})
+    return await call_next(request)
+
 origins = [
     "http://localhost:5173",
     "https://orbital-summaraize.vercel.app",
@@ -33,27 +138,35 @@ app.add_middleware(
 app.include_router(summarizer.router)
 app.include_router(mindmap.router)
 app.include_router(testmode.router)
+app.include_router(jobs.router)
 
 class DocxRequest(BaseModel):
     title: str
     html: str
 
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
 # Backend function to download docx with text-styles
 @app.post("/generate-docx")
 async def generate_docx(data: DocxRequest):
     try:
-        doc = Document()
-        doc.add_heading(data.title or "Summary", 0)
-        add_html_to_docx(doc, data.html)
-
-        buffer = io.BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-
-        headers = {
-            "Content-Disposition": f"attachment; filename={data.title or 'summary'}.docx"
-        }
-        return StreamingResponse(buffer, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", headers=headers)
+        from utils.docx_generator import DOCX_RENDER_VERSION, render_docx  # lxml and python-docx load on first use
+
+        # Identical exports are rendered once and served from the artifact store
+        digest = hashlib.sha256()
+        for part in (DOCX_RENDER_VERSION, data.title, data.html):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        key = digest.hexdigest()
+        tmp_path = os.path.join(artifact_store.pdf_dir, key + ".docx.tmp")
+
+        async def render():
+            with timed("docx_render"):
+                return await run_in_process(render_docx, data.title, data.html, tmp_path)
+
+        path = await artifact_store.get_or_convert(key, ".docx", render)
+        # FileResponse streams the file from disk in chunks
+        return FileResponse(path, media_type=DOCX_MEDIA_TYPE, filename=f"{data.title or 'summary'}.docx")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
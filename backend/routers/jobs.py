@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from utils.jobs import FINISHED, job_queue
+from utils.sse import SSE_HEADERS, sse_event
+import os
+
+router = APIRouter()
+
+
+async def find_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return (await find_job(job_id)).public()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for a job: a `status` event each time its status or
+    progress changes, ending with `done` or `error` when it finishes.
+    """
+    await find_job(job_id)
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            if job.status == "done":
+                yield sse_event("done", job.public())
+            elif job.status == "failed":
+                yield sse_event("error", {**job.public(), "detail": job.error})
+            else:
+                yield sse_event("status", job.public())
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """
+    Result of a finished job: the same body the endpoint returns without
+    `?job=true` (a file download for conversions). 409 while the job is
+    still queued or running; a failed job answers with its error.
+    """
+    job = await find_job(job_id)
+    if job.status not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    if job.status == "failed":
+        raise HTTPException(status_code=job.status_code or 500, detail=job.error)
+
+    result = job.result
+    if isinstance(result, dict) and "file" in result:
+        if not os.path.exists(result["file"]):
+            raise HTTPException(status_code=410, detail="The result file has expired.")
+        return FileResponse(result["file"], media_type=result["mediaType"], filename=result["filename"])
+    return result
@@ -1,74 +1,410 @@
-from fastapi import UploadFile, File
-import fitz
-import docx2txt
-from fastapi import APIRouter, HTTPException
+from fastapi import UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
+from typing import Callable, Literal
+import os
 import json
-from openai import OpenAI
-from utils.openai_client import client
-import re
+import asyncio
+from utils.openai_client import stream_chat_completion
+from utils.cache import digest_result_key, hash_bytes, result_cache, result_key
+from utils.near_duplicates import find_near_duplicate, remember
+from utils.extraction import extract_upload_pages
+from utils.uploads import SpooledUpload, spool_upload
+from utils.jobs import JobPriority, submit_job
+from utils.chunking import split_into_chunks
+from utils.prompts import get_prompt
+from utils.tokens import count_tokens, input_budget, fit_text
+from utils.mindmap_graph import merge_mindmaps, split_levels
+from utils.json_stream import MindmapStreamParser
+from utils.sse import SSE_HEADERS, sse_event, relay_progress
+from utils.workers import run_in_process
+from utils.metrics import timed
 import traceback
-import tempfile
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-import os
-from PIL import Image
-import io
 
 router = APIRouter()
 
-def extract_json(content: str) -> str:
-    match = re.search(r"```json\n(.*?)```", content, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return content.strip()
+MINDMAP_MODEL = "gpt-4"
+MINDMAP_PROMPT = get_prompt("mindmap")
+# Tokens kept free for the reply when sizing the input of one request
+MINDMAP_OUTPUT_TOKENS = int(os.getenv("MINDMAP_OUTPUT_TOKENS", "2000"))
+# Tunables for hierarchical mindmaps of long texts
+MINDMAP_SECTION_TOKENS = int(os.getenv("MINDMAP_SECTION_TOKENS", "3000"))
+MINDMAP_SECTION_CONCURRENCY = int(os.getenv("MINDMAP_SECTION_CONCURRENCY", "4"))
+MINDMAP_TOP_NODES = int(os.getenv("MINDMAP_TOP_NODES", "40"))
+MINDMAP_DETAIL_NODES = int(os.getenv("MINDMAP_DETAIL_NODES", "40"))
+# Tunables for /generate-mindmap-batch
+MINDMAP_BATCH_CONCURRENCY = int(os.getenv("MINDMAP_BATCH_CONCURRENCY", "4"))
+MINDMAP_BATCH_MAX_ITEMS = int(os.getenv("MINDMAP_BATCH_MAX_ITEMS", "50"))
+
+# Schema-constrained output: "auto" enables it for models that support json_schema
+MINDMAP_JSON_SCHEMA = os.getenv("MINDMAP_JSON_SCHEMA", "auto")
+MINDMAP_REPAIR_ATTEMPTS = int(os.getenv("MINDMAP_REPAIR_ATTEMPTS", "1"))
+# Tunables for server-side layout (`layout: true`)
+MINDMAP_LAYOUT_FORCE_MAX_NODES = int(os.getenv("MINDMAP_LAYOUT_FORCE_MAX_NODES", "300"))
+MINDMAP_LAYOUT_CLUSTER_SIZE = int(os.getenv("MINDMAP_LAYOUT_CLUSTER_SIZE", "30"))
+MINDMAP_LAYOUT_MAX_NODES = int(os.getenv("MINDMAP_LAYOUT_MAX_NODES", "20000"))
+SCHEMA_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+MINDMAP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "string"}, "label": {"type": "string"}},
+                "required": ["id", "label"],
+                "additionalProperties": False,
+            },
+        },
+        "edges": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string"},
+                    "target": {"type": "string"},
+                    "label": {"type": "string"},
+                },
+                "required": ["source", "target", "label"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["nodes", "edges"],
+    "additionalProperties": False,
+}
+
+# "hierarchical" builds per-section maps and merges them, returning the top nodes and a
+# `mapId` whose details come from /mindmap-detail; "auto" does so for long texts only.
+# Opt-in, since the response shape differs from the single map clients expect.
+MindmapMode = Literal["auto", "single", "hierarchical"]
 
 class MindMapRequest(BaseModel):
     text: str
+    mode: MindmapMode = "single"
+    # Also return node positions, clusters and detail levels (see add_layout)
+    layout: bool = False
 
-@router.post("/generate-mindmap")
-async def generate_mindmap(request: MindMapRequest):
-    prompt = (
-        "From the following input, extract a set of concepts and relationships as a mindmap. "
-        "Return only valid JSON with two arrays: `nodes` and `edges`. No explanation, no markdown — just JSON.\n\n"
-        f"Input:\n{request.text}\n\n"
-        "Format:\n"
-        "{\n  \"nodes\": [ {\"id\": \"1\", \"label\": \"...\"} ],\n"
-        "  \"edges\": [ {\"source\": \"1\", \"target\": \"2\", \"label\": \"...\"} ]\n}"
+class MindMapGraph(BaseModel):
+    nodes: list[dict]
+    edges: list[dict] = []
+
+def edge_with_id(edge: dict, index: int) -> dict:
+    return {
+        "id": edge.get("id") or f"e{edge.get('source')}-{edge.get('target')}-{index}",
+        "source": edge.get("source"),
+        "target": edge.get("target"),
+        "label": edge.get("label", "")
+    }
+
+
+def normalize_mindmap(data: dict) -> dict:
+    """
+    Give every edge an id and the full source/target/label shape the frontend expects.
+    """
+    data["edges"] = [edge_with_id(edge, i) for i, edge in enumerate(data.get("edges", []))]
+    return data
+
+
+def repair_suffix(nodes: list, edges: list) -> str:
+    # Repair: ask only for what the cut-off or malformed reply is missing. It
+    # follows the input, so the repair request shares its prompt prefix with
+    # the first one.
+    return (
+        "A previous reply was cut off or malformed. These parts of it are already kept.\n"
+        f"Existing nodes: {json.dumps(nodes)}\n"
+        f"Existing edges: {json.dumps([[e['source'], e['target']] for e in edges])}\n"
+        "Return only the missing nodes and edges in the same format. Reuse existing node ids in "
+        "edges and give new nodes new ids."
     )
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-        )
-        content = extract_json(response.choices[0].message.content or "")
-        if content is None:
-            raise HTTPException(status_code=500, detail="OpenAI returned no content.")
 
-        if not content.startswith("{"):
+def fit_mindmap_input(text: str) -> str:
+    # Pre-flight: cut texts the model cannot take in one request instead of failing at the API
+    budget = input_budget(MINDMAP_MODEL, MINDMAP_OUTPUT_TOKENS, MINDMAP_PROMPT.overhead_tokens(MINDMAP_MODEL))
+    fitted = fit_text(text, budget, MINDMAP_MODEL)
+    if len(fitted) < len(text):
+        print(f"[WARN] Mindmap input over {budget} tokens, truncated from {len(text)} to {len(fitted)} characters")
+    return fitted
+
+
+def _response_format() -> dict | None:
+    enabled = MINDMAP_JSON_SCHEMA == "on" or (
+        MINDMAP_JSON_SCHEMA == "auto" and MINDMAP_MODEL.startswith(SCHEMA_MODEL_PREFIXES)
+    )
+    if not enabled:
+        return None
+    return {"type": "json_schema", "json_schema": {"name": "mindmap", "schema": MINDMAP_SCHEMA, "strict": True}}
+
+
+async def mindmap_events(text: str):
+    """
+    Generate the mindmap for a text, yielding nodes and edges as they stream in.
+
+    The reply is parsed incrementally (see MindmapStreamParser), with
+    schema-constrained output where the model supports it. If the reply is
+    cut off or has malformed items, up to MINDMAP_REPAIR_ATTEMPTS follow-up
+    requests ask only for the missing nodes and edges instead of redoing the
+    whole mindmap. Complete results are cached, and reused for texts that
+    are near-duplicates (utils/near_duplicates.py). A text too long for one
+    request is truncated to fit the model's context window.
+
+    Yields:
+        ("node", node) and ("edge", edge) as they arrive, ("repair", info)
+        before each follow-up request, then ("result", mindmap).
+
+    Raises:
+        HTTPException: If no usable nodes come back.
+    """
+    text = fit_mindmap_input(text)
+    key = result_key(text, "mindmap", MINDMAP_MODEL, MINDMAP_PROMPT.version)
+    cached = result_cache.get(key)
+    if cached is None:
+        cached = await find_near_duplicate(text, lambda digest: digest_result_key(
+            digest, "mindmap", MINDMAP_MODEL, MINDMAP_PROMPT.version))
+    if cached is not None:
+        for node in cached["nodes"]:
+            yield "node", node
+        for edge in cached["edges"]:
+            yield "edge", edge
+        yield "result", cached
+        return
+
+    nodes, edges = [], []
+    node_ids, edge_pairs = set(), set()
+    response_format = _response_format()
+    for attempt in range(MINDMAP_REPAIR_ATTEMPTS + 1):
+        if attempt:
+            yield "repair", {"attempt": attempt, "nodes": len(nodes), "edges": len(edges)}
+        kwargs = {"response_format": response_format} if response_format else {}
+        parser = MindmapStreamParser()
+        async for delta in stream_chat_completion(
+            model=MINDMAP_MODEL,
+            messages=MINDMAP_PROMPT.messages(text, repair_suffix(nodes, edges) if attempt else ""),
+            temperature=0.5,
+            hedge=True,
+            **kwargs,
+        ):
+            for kind, item in parser.feed(delta):
+                if kind == "node" and item.get("id") is not None and str(item["id"]) not in node_ids:
+                    node_ids.add(str(item["id"]))
+                    nodes.append(item)
+                    yield "node", item
+                elif kind == "edge" and (item.get("source"), item.get("target")) not in edge_pairs:
+                    edge_pairs.add((item.get("source"), item.get("target")))
+                    edge = edge_with_id(item, len(edges))
+                    edges.append(edge)
+                    yield "edge", edge
+        if parser.complete and not parser.malformed and nodes:
+            break
+        print(f"[WARN] Mindmap reply incomplete (complete={parser.complete}, malformed={parser.malformed})")
+    else:
+        if not nodes:
             raise HTTPException(status_code=500, detail="OpenAI did not return valid JSON.")
+        # Out of repair attempts: return what parsed, but do not cache it
+        yield "result", {"nodes": nodes, "edges": edges}
+        return
+
+    data = {"nodes": nodes, "edges": edges}
+    result_cache.set(key, data)
+    await remember(text)
+    yield "result", data
+
+
+async def build_mindmap(text: str) -> dict:
+    """
+    Generate (or fetch from cache) the normalized mindmap for a text.
+
+    Raises:
+        HTTPException: If the model returns no usable JSON.
+    """
+    async for kind, value in mindmap_events(text):
+        if kind == "result":
+            return value
+    raise HTTPException(status_code=500, detail="OpenAI returned no content.")
+
+
+def _detail_key(map_id: str) -> str:
+    return f"{map_id}:detail"
+
+
+async def build_hierarchical_mindmap(text: str, progress: Callable | None = None) -> dict:
+    """
+    Build a mindmap of a long text section by section and merge the results.
+
+    Sections of about MINDMAP_SECTION_TOKENS are mapped in parallel (each one
+    cached like a normal mindmap), merged by normalized label, then capped to
+    MINDMAP_TOP_NODES top-level nodes. The detail graph behind each top-level
+    node is stored for /mindmap-detail. Sections that fail are left out unless
+    all of them fail. `progress("sections", sections_done=, sections_total=)`
+    is called as sections finish.
+
+    Returns:
+        dict: The top-level `nodes` and `edges`, plus `mapId` for fetching
+        details and the number of `sections` merged. Each node's `detail` is
+        the size of its detail graph.
+    """
+    version = f"{MINDMAP_PROMPT.version}/{MINDMAP_SECTION_TOKENS}/{MINDMAP_TOP_NODES}/{MINDMAP_DETAIL_NODES}"
+    map_id = result_key(text, "mindmap-hierarchical", MINDMAP_MODEL, version)
+    cached = result_cache.get(map_id)
+    if cached is None:
+        # An earlier version of the document; its mapId keeps serving the details
+        cached = await find_near_duplicate(text, lambda digest: digest_result_key(
+            digest, "mindmap-hierarchical", MINDMAP_MODEL, version))
+    if cached is not None and result_cache.get(_detail_key(cached["mapId"])) is not None:
+        return cached
+
+    sections = split_into_chunks([text], MINDMAP_SECTION_TOKENS) or [text]
+    semaphore = asyncio.Semaphore(MINDMAP_SECTION_CONCURRENCY)
+
+    done = 0
+
+    async def map_section(section: str) -> dict:
+        nonlocal done
+        async with semaphore:
+            graph = await build_mindmap(section)
+        done += 1
+        if progress:
+            progress("sections", sections_done=done, sections_total=len(sections))
+        return graph
+
+    results = await asyncio.gather(*(map_section(s) for s in sections), return_exceptions=True)
+    graphs = [r for r in results if not isinstance(r, BaseException)]
+    if not graphs:
+        raise results[0]  # type: ignore[misc]
+    if len(graphs) < len(results):
+        print(f"[WARN] Mindmap: {len(results) - len(graphs)} of {len(results)} sections failed")
 
+    merged, hubs = merge_mindmaps(graphs)
+    top, details = split_levels(merged, hubs, MINDMAP_TOP_NODES, MINDMAP_DETAIL_NODES)
+    data = {**top, "mapId": map_id, "sections": len(graphs)}
+    result_cache.set(_detail_key(map_id), details)
+    if len(graphs) == len(results):
+        result_cache.set(map_id, data)
+        await remember(text)
+    return data
+
+
+def use_hierarchical(text: str, mode: str) -> bool:
+    return mode == "hierarchical" or (mode == "auto" and count_tokens(text, MINDMAP_MODEL) > MINDMAP_SECTION_TOKENS)
+
+
+async def add_layout(data: dict) -> dict:
+    """
+    Return the mindmap with a `layout`: node positions, clusters of nodes
+    that can be collapsed into one, and a detail level per node, so the
+    browser does not have to lay out large graphs itself.
+
+    The layout runs in the worker pool (see utils/graph_layout.py) and is
+    cached per graph, so the same mindmap always gets the same positions.
+    Arrays in `layout` follow the order of `nodes`.
+
+    Raises:
+        HTTPException: If the graph has more than MINDMAP_LAYOUT_MAX_NODES nodes.
+    """
+    from utils.graph_layout import LAYOUT_VERSION, layout_graph  # NumPy loads on first use
+
+    nodes, edges = data.get("nodes", []), data.get("edges", [])
+    if len(nodes) > MINDMAP_LAYOUT_MAX_NODES:
+        raise HTTPException(status_code=413, detail=f"Layout is limited to {MINDMAP_LAYOUT_MAX_NODES} nodes.")
+    ids = [str(node.get("id")) for node in nodes]
+    labels = [str(node.get("label", "")) for node in nodes]
+    pairs = [[str(edge.get("source")), str(edge.get("target"))] for edge in edges]
+    params = [LAYOUT_VERSION, MINDMAP_LAYOUT_FORCE_MAX_NODES, MINDMAP_LAYOUT_CLUSTER_SIZE]
+    key = f"layout:{hash_bytes(json.dumps([params, ids, labels, pairs]).encode())}"
+    layout = result_cache.get(key)
+    if layout is None:
+        with timed("layout"):
+            layout = await run_in_process(
+                layout_graph, ids, labels, pairs, seed=int(key[-8:], 16),
+                force_max_nodes=MINDMAP_LAYOUT_FORCE_MAX_NODES, cluster_size=MINDMAP_LAYOUT_CLUSTER_SIZE,
+            )
+        result_cache.set(key, layout)
+    return {**data, "layout": layout}
+
+
+async def mindmap_for(text: str, mode: str = "single", progress: Callable | None = None,
+                      layout: bool = False) -> dict:
+    if use_hierarchical(text, mode):
+        data = await build_hierarchical_mindmap(text, progress)
+    else:
+        data = await build_mindmap(text)
+    return await add_layout(data) if layout else data
+
+
+@router.post("/generate-mindmap")
+async def generate_mindmap(request: MindMapRequest):
+    try:
+        return await mindmap_for(request.text, request.mode, layout=request.layout)
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
+
+
+@router.post("/generate-mindmap-stream")
+async def generate_mindmap_stream(request: MindMapRequest):
+    """
+    Server-sent events variant of /generate-mindmap.
+
+    Emits `node` and `edge` events as the model produces them (`repair` before
+    any follow-up request for missing parts), or `progress` events per section
+    for hierarchical mindmaps, then `done` with the full mindmap (and its
+    layout, if asked for). Failures are sent as an `error` event.
+    """
+    async def done(data: dict) -> str:
+        return sse_event("done", await add_layout(data) if request.layout else data)
+
+    async def events():
         try:
-            data = json.loads(content)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail="OpenAI returned invalid JSON.")
+            if use_hierarchical(request.text, request.mode):
+                async for kind, value in relay_progress(build_hierarchical_mindmap, request.text):
+                    yield sse_event("progress", value) if kind == "progress" else await done(value)
+                return
+            async for kind, value in mindmap_events(request.text):
+                yield await done(value) if kind == "result" else sse_event(kind, value)
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"OpenAI error: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/mindmap-detail/{map_id}/{node_id}")
+async def mindmap_detail(map_id: str, node_id: str):
+    details = result_cache.get(_detail_key(map_id))
+    if details is None:
+        raise HTTPException(status_code=404, detail="Mindmap details expired. Generate the mindmap again.")
+    if node_id not in details:
+        raise HTTPException(status_code=404, detail="This node has no details.")
+    return details[node_id]
 
-        edges_with_ids = []
-        for i, edge in enumerate(data.get("edges", [])):
-            edge_id = edge.get("id") or f"e{edge.get('source')}-{edge.get('target')}-{i}"
-            edges_with_ids.append({
-                "id": edge_id,
-                "source": edge.get("source"),
-                "target": edge.get("target"),
-                "label": edge.get("label", "")
-            })
 
-        data["edges"] = edges_with_ids
+@router.post("/mindmap-layout")
+async def mindmap_layout(graph: MindMapGraph):
+    """
+    Lay out a mindmap the client already has, e.g. a detail graph.
+    """
+    return await add_layout(graph.model_dump())
 
-        return data
 
+async def mindmap_upload(upload: SpooledUpload, progress: Callable | None = None, layout: bool = False,
+                         mode: str = "single") -> dict:
+    with upload:
+        pages = await extract_upload_pages(upload, progress)
+    if pages is None:
+        return {"error": "Unsupported file type. Please upload a PDF, DOCX or Image File."}
+
+    try:
+        return await mindmap_for("\n".join(pages), mode, progress=progress, layout=layout)
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
@@ -76,33 +412,100 @@ async def generate_mindmap(request: MindMapRequest):
 
 # API endpoint for file uploads
 @router.post("/generate-mindmap-file")
-async def generate_mindmap_file(file: UploadFile = File(...)):
+async def generate_mindmap_file(request: Request, file: UploadFile = File(...), layout: bool = False,
+                                mode: MindmapMode = "single", job: bool = False, priority: JobPriority = "normal"):
+    """
+    Generate a mindmap of an uploaded document; `?layout=true` adds the
+    server-side layout and `?mode=` works as in /generate-mindmap. With `?job=true` the work runs in the background: the
+    response is 202 with the job status, and the result is fetched from
+    /jobs/{id}/result.
+    """
     try:
-        # PDF extraction
-        if file.filename and file.filename.lower().endswith(".pdf"):
-            pdf_bytes = await file.read()
-            pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text_chunks = []
-            for page in pdf:
-                text_chunks.append(page.get_text()) # type: ignore
-            content = "\n".join(text_chunks)
-        # DOCX extraction
-        elif file.filename and file.filename.lower().endswith(".docx"):
-            docx_bytes = await file.read()
-            with tempfile.NamedTemporaryFile(suffix=".docx", delete=True) as tmp:
-                tmp.write(docx_bytes)
-                tmp.flush()
-                content = docx2txt.process(tmp.name)
-         # Image Extraction
-        elif file.filename and file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            import subprocess
-            image_bytes = await file.read()
-            image = Image.open(io.BytesIO(image_bytes))
-            content = pytesseract.image_to_string(image)
-        else:
-            return {"error": "Unsupported file type. Please upload a PDF, DOCX or Image File."}
-
-        return await generate_mindmap(MindMapRequest(text=content))
+        upload = await spool_upload(file)
+        if job:
+            return await submit_job(request, "mindmap-file", f"{upload.sha256}:{layout}:{mode}",
+                                    lambda progress: mindmap_upload(upload, progress, layout, mode), priority, upload)
+        return await mindmap_upload(upload, layout=layout, mode=mode)
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"File processing error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"File processing error: {str(e)}")
+
+
+@router.post("/generate-mindmap-batch")
+async def generate_mindmap_batch(files: list[UploadFile] = File(default=[]), texts: list[str] = Form(default=[]),
+                                 mode: MindmapMode = Form("single")):
+    """
+    Generate one mindmap per uploaded file or text field.
+
+    Files are extracted concurrently and the model calls fan out, at most
+    MINDMAP_BATCH_CONCURRENCY at a time. The response is NDJSON with one line per
+    item in completion order: {"index", "name", "status": "ok", "mindmap"} or
+    {"index", "name", "status": "error", "error"}. A final {"done": true, ...}
+    line gives the totals. Items fail independently. The whole request shares
+    the MAX_UPLOAD_BYTES limit.
+    """
+    if not files and not texts:
+        raise HTTPException(status_code=400, detail="Provide at least one file or text.")
+    if len(files) + len(texts) > MINDMAP_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MINDMAP_BATCH_MAX_ITEMS} items per batch.")
+
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await spool_upload(file))
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        raise
+
+    semaphore = asyncio.Semaphore(MINDMAP_BATCH_CONCURRENCY)
+
+    async def run_item(index: int, name: str, upload=None, text: str | None = None) -> dict:
+        item = {"index": index, "name": name}
+        try:
+            if upload is not None:
+                pages = await extract_upload_pages(upload)
+                upload.close()
+                if pages is None:
+                    return {**item, "status": "error", "error": "Unsupported file type. Please upload a PDF, DOCX or Image File."}
+                text = "\n".join(pages)
+            async with semaphore:
+                mindmap = await mindmap_for(text or "", mode)
+            return {**item, "status": "ok", "mindmap": mindmap}
+        except HTTPException as e:
+            return {**item, "status": "error", "error": e.detail}
+        except Exception as e:
+            traceback.print_exc()
+            return {**item, "status": "error", "error": str(e)}
+        finally:
+            if upload is not None:
+                upload.close()
+
+    def close_uploads():
+        for upload in uploads:
+            upload.close()
+
+    async def lines():
+        # Coroutines are only created here, so none is left un-awaited if the stream never starts
+        tasks = [asyncio.ensure_future(run_item(i, upload.filename or f"file-{i}", upload=upload))
+                 for i, upload in enumerate(uploads)]
+        tasks += [asyncio.ensure_future(run_item(len(uploads) + i, f"text-{i}", text=text))
+                  for i, text in enumerate(texts)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += result["status"] == "error"
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"done": True, "total": len(tasks), "failed": failed}) + "\n"
+        finally:
+            # Client went away: stop outstanding work and drop spooled files
+            for task in tasks:
+                task.cancel()
+            close_uploads()
+
+    # Also runs if the client disconnects before the stream starts, when lines() never runs
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"},
+                             background=BackgroundTask(close_uploads))
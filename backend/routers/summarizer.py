@@ -1,16 +1,17 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from utils.openai_client import client
-import fitz  
-import docx2txt
-import tempfile
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-import os
-print("PYTESSERACT CMD:", pytesseract.pytesseract.tesseract_cmd)
-print("PATH:", os.environ.get("PATH"))
-from PIL import Image
-import io
+from utils.openai_client import chat_completion, stream_chat_completion
+from utils.cache import digest_result_key, result_cache, result_key
+from utils.near_duplicates import find_near_duplicate, remember
+from utils.map_reduce import condense, map_reduce_summarize
+from utils.sse import SSE_HEADERS, sse_event, relay_progress
+from utils.extraction import extract_upload_pages
+from utils.uploads import SpooledUpload, spool_upload
+from utils.jobs import JobPriority, submit_job
+from utils.prompts import PromptTemplate, get_prompt
+from utils.tokens import input_budget, fit_text
 import traceback
 
 router = APIRouter()
@@ -19,91 +20,187 @@ class SummarizeRequest(BaseModel):
     text: str
     type: str 
 
-@router.post("/summarize")
-async def summarize(request: SummarizeRequest):
-    prompt_map = {
-        "short": "Summarize the following in a short paragraph:",
-        "long": "Summarize the following in a long, detailed paragraph:",
-        "bullet": "Summarize the following using bullet points:",
-    }
-
-    prompt = f"{prompt_map[request.type]}\n\n{request.text}"
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful academic summarizer."},
-            {"role": "user", "content": prompt}
-        ],
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_MAX_TOKENS = 500
+SUMMARY_TYPES = ("short", "long", "bullet")
+
+def summary_prompt(type: str) -> PromptTemplate:
+    if type not in SUMMARY_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown summary type. Use one of: {', '.join(SUMMARY_TYPES)}.")
+    return get_prompt(f"summary.{type}")
+
+def fit_input(prompt: PromptTemplate, text: str, max_tokens: int) -> str:
+    # Pre-flight: never send a request the model's context window cannot hold
+    budget = input_budget(SUMMARY_MODEL, max_tokens, prompt.overhead_tokens(SUMMARY_MODEL))
+    fitted = fit_text(text, budget, SUMMARY_MODEL)
+    if len(fitted) < len(text):
+        print(f"[WARN] Summary input over {budget} tokens, truncated from {len(text)} to {len(fitted)} characters")
+    return fitted
+
+async def complete_summary(prompt: PromptTemplate, text: str, max_tokens: int, kind: str) -> str:
+    # Chunk summaries are cached on their own so repeated sections are free
+    key = result_key(text, kind, SUMMARY_MODEL, prompt.version) if kind == "chunk" else None
+    if key:
+        cached = result_cache.get(key)
+        if cached is None:
+            # A lightly edited section reuses the summary of the earlier version
+            cached = await find_near_duplicate(text, lambda digest: digest_result_key(
+                digest, kind, SUMMARY_MODEL, prompt.version))
+        if cached is not None:
+            return cached
+
+    response = await chat_completion(
+        model=SUMMARY_MODEL,
+        messages=prompt.messages(fit_input(prompt, text, max_tokens)),
         temperature=0.5,
-        max_tokens=500
+        max_tokens=max_tokens,
+        hedge=True
     )
 
-    return {"summary": response.choices[0].message.content}
+    content = response.choices[0].message.content or ""
+    if key and content:
+        result_cache.set(key, content)
+        await remember(text)
+    return content
+
+def summary_key(pages: list[str], type: str) -> str:
+    return result_key("\f".join(pages), type, SUMMARY_MODEL, summary_prompt(type).version)
+
+async def cached_summary(pages: list[str], type: str) -> str | None:
+    # Exact match first, then an earlier upload of nearly the same document
+    cached = result_cache.get(summary_key(pages, type))
+    if cached is None:
+        version = summary_prompt(type).version
+        cached = await find_near_duplicate("\f".join(pages), lambda digest: digest_result_key(
+            digest, type, SUMMARY_MODEL, version))
+    return cached
+
+async def store_summary(pages: list[str], type: str, summary: str):
+    result_cache.set(summary_key(pages, type), summary)
+    await remember("\f".join(pages))
+
+async def summarize_pages(pages: list[str], type: str) -> str:
+    cached = await cached_summary(pages, type)
+    if cached is not None:
+        return cached
+
+    summary = await map_reduce_summarize(pages, summary_prompt(type), complete_summary, max_tokens=SUMMARY_MAX_TOKENS)
+    if summary:
+        await store_summary(pages, type, summary)
+    return summary
+
+async def stream_summary_events(pages: list[str], type: str):
+    """
+    Summarize pages, yielding SSE events: map-stage progress, then tokens, then done.
+    """
+    cached = await cached_summary(pages, type)
+    if cached is not None:
+        yield sse_event("token", {"text": cached})
+        yield sse_event("done", {"summary": cached, "cached": True})
+        return
+
+    text = ""
+    async for kind, value in relay_progress(condense, pages, complete_summary):
+        if kind == "progress":
+            yield sse_event("progress", value)
+        else:
+            text = value
+
+    prompt = summary_prompt(type)
+    parts = []
+    async for delta in stream_chat_completion(
+        model=SUMMARY_MODEL,
+        messages=prompt.messages(fit_input(prompt, text, SUMMARY_MAX_TOKENS)),
+        temperature=0.5,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        hedge=True
+    ):
+        parts.append(delta)
+        yield sse_event("token", {"text": delta})
+
+    summary = "".join(parts)
+    if summary:
+        await store_summary(pages, type, summary)
+    yield sse_event("done", {"summary": summary})
+
+@router.post("/summarize")
+async def summarize(request: SummarizeRequest):
+    return {"summary": await summarize_pages([request.text], request.type)}
+
+
+@router.post("/summarize-stream")
+async def summarize_stream(request: SummarizeRequest):
+    summary_prompt(request.type)
+
+    async def events():
+        try:
+            async for event in stream_summary_events([request.text], request.type):
+                yield event
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"OpenAI error: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def summarize_upload(upload: SpooledUpload, type: str, progress=None) -> dict:
+    with upload:
+        pages = await extract_upload_pages(upload, progress)
+    if pages is None:
+        return {"error": "Unsupported file type. Please upload a PDF, DOCX or Image File."}
+
+    return {"summary": await summarize_pages(pages, type)}
 
 
 @router.post("/summarize-file")
-async def summarize_file(file: UploadFile = File(...), type: str = Form(...)):
+async def summarize_file(request: Request, file: UploadFile = File(...), type: str = Form(...),
+                         job: bool = False, priority: JobPriority = "normal"):
+    """
+    Summarize an uploaded document. With `?job=true` the work runs in the
+    background: the response is 202 with the job status, and the result is
+    fetched from /jobs/{id}/result.
+    """
+    summary_prompt(type)  # reject unknown types before paying for the upload and extraction
     try:
-        content = ""
-        # PDf Extraction
-        if file.filename and file.filename.endswith(".pdf"):
-            pdf_bytes = await file.read()
-            pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text_chunks = []
-            for page in pdf:
-                text_chunks.append(page.get_text())  # type: ignore
-            content = "\n".join(text_chunks)
-        # DOCX Extraction
-        elif file.filename and file.filename.endswith(".docx"):
-            docx_bytes = await file.read()
-            with tempfile.NamedTemporaryFile(suffix=".docx", delete=True) as tmp:
-                tmp.write(docx_bytes)
-                tmp.flush()
-                content = docx2txt.process(tmp.name)
-        # Image Extraction
-        elif file.filename and file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            print("PYTESSERACT CMD (runtime):", pytesseract.pytesseract.tesseract_cmd)
-            print("PATH (runtime):", os.environ.get("PATH"))
-            print("FILE EXISTS:", os.path.exists(pytesseract.pytesseract.tesseract_cmd))
-            import subprocess
-            try:
-                version = subprocess.check_output([pytesseract.pytesseract.tesseract_cmd, "--version"])
-                print("Tesseract CLI version (runtime):", version.decode())
-            except Exception as ex:
-                print("Error running tesseract --version at runtime:", ex)
-            print("Verifying Tesseract subprocess execution...")
-            import subprocess
-            try:
-                output = subprocess.check_output([pytesseract.pytesseract.tesseract_cmd, "--version"])
-                print("Tesseract CLI version (subprocess):", output.decode())
-            except Exception as ex:
-                print("Error running tesseract CLI directly (subprocess):", ex)
-            image_bytes = await file.read()
-            image = Image.open(io.BytesIO(image_bytes))
-            content = pytesseract.image_to_string(image)
-        else:
-            return {"error": "Unsupported file type. Please upload a PDF, DOCX or Image File."}
-
-        prompt_map = {
-            "short": "Summarize the following in a short paragraph:",
-            "long": "Summarize the following in a long, detailed paragraph:",
-            "bullet": "Summarize the following using bullet points:",
-        }
-
-        prompt = f"{prompt_map[type]}\n\n{content}"
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful academic summarizer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=500
-        )
-
-        return {"summary": response.choices[0].message.content}
+        upload = await spool_upload(file)
+        if job:
+            return await submit_job(request, "summarize-file", f"{upload.sha256}:{type}",
+                                    lambda progress: summarize_upload(upload, type, progress), priority, upload)
+        return await summarize_upload(upload, type)
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"File processing error: {str(e)}")
+
+
+@router.post("/summarize-file-stream")
+async def summarize_file_stream(file: UploadFile = File(...), type: str = Form(...)):
+    summary_prompt(type)
+    upload = await spool_upload(file)
+
+    async def events():
+        try:
+            yield sse_event("progress", {"stage": "upload", "status": "received", "bytes": upload.size})
+            pages = None
+            async for kind, value in relay_progress(extract_upload_pages, upload):
+                if kind == "progress":
+                    yield sse_event("progress", value)
+                else:
+                    pages = value
+            upload.close()
+            if pages is None:
+                yield sse_event("error", {"detail": "Unsupported file type. Please upload a PDF, DOCX or Image File."})
+                return
+
+            async for event in stream_summary_events(pages, type):
+                yield event
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"File processing error: {str(e)}"})
+        finally:
+            upload.close()
+
+    # Also runs if the client disconnects before the stream starts, when events() never runs
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS,
+                             background=BackgroundTask(upload.close))
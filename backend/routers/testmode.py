@@ -1,41 +1,112 @@
-from fastapi import APIRouter, UploadFile, File, Form
-from utils.parser import parse_test_paper 
-import fitz
-import docx2txt
+from fastapi import APIRouter, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from utils.parser import iter_test_paper, apply_answer_key, strip_running_lines
+from utils.extraction import iter_upload_pages, sniff_kind
+from utils.uploads import spool_upload
+from utils.workers import iter_in_thread
+from utils.sse import SSE_HEADERS, sse_event, relay_stream
 import os
-import uuid
-import subprocess
+import traceback
 from fastapi.responses import FileResponse
 from fastapi import UploadFile, File
-from utils.docx_to_pdf import convert_docx_to_pdf
+from utils.docx_to_pdf import libreoffice_pool
+from utils.artifact_store import artifact_store
+from utils.jobs import JobPriority, file_result, submit_job
 
 router = APIRouter()
 
+
+async def test_paper_items(upload, progress=None):
+    """
+    Parse a spooled test paper while it is being extracted.
+
+    Pages are handed to the parser, which runs in a thread, in order as soon
+    as they are extracted (each one once the next has arrived, so running
+    headers and footers can be dropped first), so questions come out while
+    later pages are still being read, and questions that run over a page
+    break are stitched together.
+
+    Args:
+        upload (SpooledUpload): The spooled test paper.
+        progress (Callable, optional): Extraction progress callback.
+
+    Yields:
+        tuple[str, dict]: ("question", question) as each question is complete,
+        then ("answers", {number: answer}) if the paper has an answer key.
+    """
+    async def pages():
+        async for batch in iter_upload_pages(upload, progress):
+            for page in batch:
+                yield page
+
+    def parse(items):
+        return iter_test_paper(strip_running_lines(items))
+
+    async for item in iter_in_thread(parse, pages()):
+        yield item
+
+
 @router.post("/upload-test-paper")
 async def upload_test_paper(file: UploadFile = File(...), title: str = Form(...)):
-    content = ""
-
     if not file.filename:
         return {"error": "Invalid file"}
 
-    filename = file.filename.lower()
+    with await spool_upload(file) as upload:
+        if sniff_kind(upload.path) is None:
+            return {"error": "Unsupported file type"}
+        questions = []
+        by_number = {}
+        try:
+            async for kind, value in test_paper_items(upload):
+                if kind == "question":
+                    questions.append(value)
+                    by_number[value["number"]] = value
+                else:
+                    apply_answer_key(by_number, value)
+        except Exception as e:
+            return {"error": f"Failed to parse test paper: {str(e)}"}
 
-    if filename.endswith(".pdf"):
-        pdf_bytes = await file.read()
-        pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-        text_chunks = [page.get_text() for page in pdf]  # type: ignore
-        content = "\n".join(text_chunks)
-    elif filename.endswith(".docx"):
-        content = docx2txt.process(file.file)
-    else:
-        return {"error": "Unsupported file type"}
+    return {"questions": questions, "title": title}
 
-    try:
-        questions = parse_test_paper(content)
-    except Exception as e:
-        return {"error": f"Failed to parse test paper: {str(e)}"}
 
-    return {"questions": questions, "title": title}
+@router.post("/upload-test-paper-stream")
+async def upload_test_paper_stream(file: UploadFile = File(...), title: str = Form(...)):
+    """
+    Server-sent events variant of /upload-test-paper.
+
+    Emits `progress` events while pages are extracted, a `question` event for
+    each question as soon as it is parsed, `answers` with the answer key (if
+    the paper has one; it applies to questions without a `correctAnswer`),
+    then `done` with the title and question count. Failures are sent as an
+    `error` event.
+    """
+    upload = await spool_upload(file)
+
+    async def events():
+        try:
+            if sniff_kind(upload.path) is None:
+                yield sse_event("error", {"detail": "Unsupported file type"})
+                return
+            yield sse_event("progress", {"stage": "upload", "status": "received", "bytes": upload.size})
+            count = 0
+            async for kind, value in relay_stream(test_paper_items, upload):
+                if kind == "progress":
+                    yield sse_event("progress", value)
+                    continue
+                kind, value = value
+                count += kind == "question"
+                yield sse_event(kind, value)
+            yield sse_event("done", {"title": title, "questions": count})
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event("error", {"detail": f"Failed to parse test paper: {str(e)}"})
+        finally:
+            upload.close()
+
+    # Also runs if the client disconnects before the stream starts, when events() never runs
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS,
+                             background=BackgroundTask(upload.close))
 
 
 # DOCX to PDF conversion endpoint
@@ -43,26 +114,34 @@ from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
 @router.post("/convert-docx-to-pdf")
-async def convert_docx_endpoint(file: UploadFile = File(...)):
+async def convert_docx_endpoint(request: Request, file: UploadFile = File(...),
+                                job: bool = False, priority: JobPriority = "normal"):
+    """
+    Convert a DOCX upload to PDF. With `?job=true` the conversion runs in the
+    background: the response is 202 with the job status, and the PDF is
+    downloaded from /jobs/{id}/result.
+    """
     try:
-        UPLOAD_DIR = "uploads"
-        PDF_DIR = "converted_pdfs"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        os.makedirs(PDF_DIR, exist_ok=True)
-
-        file_id = str(uuid.uuid4())
-        docx_path = os.path.join(UPLOAD_DIR, f"{file_id}.docx")
+        key, docx_path = await artifact_store.save_upload(file, ".docx")
 
-        with open(docx_path, "wb") as f:
-            f.write(await file.read())
+        async def convert() -> str:
+            return await artifact_store.get_or_convert(
+                key, ".pdf", lambda: libreoffice_pool.convert(docx_path, artifact_store.pdf_dir)
+            )
 
-        pdf_path = convert_docx_to_pdf(docx_path, PDF_DIR)
+        if job:
+            async def run(progress):
+                return file_result(await convert(), "application/pdf")
+            return await submit_job(request, "docx-to-pdf", key, run, priority)
 
+        pdf_path = await convert()
         return FileResponse(pdf_path, media_type="application/pdf", filename=os.path.basename(pdf_path))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error converting DOCX to PDF: {e}")
         return JSONResponse(
             status_code=500,
             content={"detail": "Failed to convert DOCX to PDF", "error": str(e)},
             headers={"Access-Control-Allow-Origin": "*"}
-        )
\ No newline at end of file
+        )
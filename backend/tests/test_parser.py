@@ -0,0 +1,110 @@
+from utils.parser import iter_test_paper, parse_test_paper, strip_running_lines
+
+
+def questions_of(*pages: str) -> list[dict]:
+    return [value for kind, value in iter_test_paper(pages) if kind == "question"]
+
+
+def test_mcq_with_inline_answer():
+    [question] = parse_test_paper("1. What is 2 + 2?\nA. 3\nB. 4\nC. 5\nAnswer: B")
+    assert question["type"] == "mcq"
+    assert question["options"] == ["A. 3", "B. 4", "C. 5"]
+    assert question["correctAnswer"] == "B"
+
+
+def test_stem_over_several_lines():
+    [question] = parse_test_paper("1. Which gas do plants\ntake in during the day?\nA. Oxygen\nB. Carbon dioxide")
+    assert question["questionText"] == "1. Which gas do plants take in during the day?"
+    assert question["options"] == ["A. Oxygen", "B. Carbon dioxide"]
+
+
+def test_text_after_answer_line_is_dropped():
+    paper = "1. What is 2 + 2?\nA. 3\nB. 4\nAnswer: B\nPage 1 of 3\n2. Explain photosynthesis.\nAnswer: Plants make food\nCS101 Midterm"
+    first, second = parse_test_paper(paper)
+    assert first["options"] == ["A. 3", "B. 4"]
+    assert first["correctAnswer"] == "B"
+    assert second["questionText"] == "2. Explain photosynthesis."
+    assert second["correctAnswer"] == "Plants make food"
+
+
+def test_options_after_answer_line_are_dropped():
+    [question] = parse_test_paper("1. Name the organelle.\nAnswer: Nucleus\nA. Section A")
+    assert question["type"] == "open-ended"
+    assert question["correctAnswer"] == "Nucleus"
+
+
+def test_lowercase_abbreviation_in_stem_is_not_an_option():
+    [question] = parse_test_paper("1. Photosynthesis,\na. k. a. carbon fixation, needs\nA. light\nB. salt\nAnswer: A")
+    assert question["questionText"] == "1. Photosynthesis, a. k. a. carbon fixation, needs"
+    assert question["options"] == ["A. light", "B. salt"]
+    assert question["correctAnswer"] == "A"
+
+
+def test_stem_line_in_other_case_gives_way_to_real_options():
+    [question] = parse_test_paper("1. Pick the odd one out\na) among these words\nA) red\nB) blue\nC) seven")
+    assert question["questionText"] == "1. Pick the odd one out a) among these words"
+    assert question["options"] == ["A) red", "B) blue", "C) seven"]
+
+
+def test_options_keep_the_case_of_the_first_option():
+    [question] = parse_test_paper("1. Choose one.\nA. first\nB. second\nc. note for markers")
+    assert question["options"] == ["A. first", "B. second c. note for markers"]
+
+
+def test_option_markers_only_at_line_start():
+    [question] = parse_test_paper("1. Solve for x in part a. of the table\nA. 1\nB. 2")
+    assert question["options"] == ["A. 1", "B. 2"]
+
+
+def test_lowercase_options():
+    [question] = parse_test_paper("Q1. Pick one\n(a) It rises\n(b) It falls\nAns: (b)")
+    assert question["options"] == ["(a) It rises", "(b) It falls"]
+    assert question["correctAnswer"] == "B"
+
+
+def test_several_options_on_one_line():
+    [question] = parse_test_paper("1) Pick one\nA) 1    B) 2    C) 3")
+    assert question["options"] == ["A) 1", "B) 2", "C) 3"]
+
+
+def test_subparts():
+    [question] = parse_test_paper("1. Explain enzymes.\n(i) Define the optimum.\n(ii) Describe denaturation.")
+    assert question["type"] == "open-ended"
+    assert question["subparts"] == ["(i) Define the optimum.", "(ii) Describe denaturation."]
+
+
+def test_question_continues_across_pages():
+    first, second = questions_of("1. Which of these is\n", "a mammal?\nA. Whale\nB. Shark", "2. Define osmosis.")
+    assert first["questionText"] == "1. Which of these is a mammal?"
+    assert first["options"] == ["A. Whale", "B. Shark"]
+    assert second["questionText"] == "2. Define osmosis."
+
+
+def test_running_headers_and_footers_are_stripped():
+    pages = [
+        "CS101 Midterm\n1. Which of these is\nPage 1 of 3",
+        "CS101 Midterm\na mammal?\nA. Whale\nB. Shark\nPage 2 of 3",
+        "CS101 Midterm\n2. Define osmosis.\nPage 3 of 3",
+    ]
+    first, second = questions_of(*strip_running_lines(pages))
+    assert first["questionText"] == "1. Which of these is a mammal?"
+    assert first["options"] == ["A. Whale", "B. Shark"]
+    assert second["questionText"] == "2. Define osmosis."
+
+
+def test_running_lines_keep_question_lines_and_single_pages():
+    assert list(strip_running_lines(["Page 1\n1. Define osmosis."])) == ["Page 1\n1. Define osmosis."]
+    pages = ["1. Pick one\nA. x", "2. Pick one\nA. x"]
+    assert list(strip_running_lines(pages)) == pages
+
+
+def test_answer_key_fills_missing_answers():
+    paper = "1. Pick one\nA. x\nB. y\n2. Pick another\nA. x\nB. y\nAnswer: A\nAnswer Key\n1. B\n2. B"
+    first, second = parse_test_paper(paper)
+    assert first["correctAnswer"] == "B"
+    assert second["correctAnswer"] == "A"  # inline answers win over the key
+
+
+def test_no_numbered_questions():
+    [question] = parse_test_paper("Write an essay about rivers.")
+    assert question == {"questionText": "Write an essay about rivers.", "type": "open-ended", "number": None}
@@ -0,0 +1,19 @@
+from utils import tokens
+
+
+class TwoTokensPerCharacter:
+    def encode_ordinary(self, text):
+        return [c for c in text for _ in range(2)]
+
+    def decode(self, tokens):
+        return "".join(tokens[::2])
+
+
+def test_short_text_is_not_tokenized(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", lambda model: None)
+    assert tokens.fit_text("short", 10, "gpt-4o") == "short"
+
+
+def test_non_ascii_text_within_the_character_budget_is_still_cut(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", lambda model: TwoTokensPerCharacter())
+    assert tokens.fit_text("光合作用需要阳光", 8, "gpt-4o") == "光合作用"
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+from fastapi import UploadFile
+from utils.uploads import spool_upload
+
+# Tunables for stored uploads and converted files
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+PDF_DIR = os.getenv("PDF_DIR", "converted_pdfs")
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARTIFACT_MAX_AGE_SECONDS = float(os.getenv("ARTIFACT_MAX_AGE_SECONDS", str(24 * 3600)))
+ARTIFACT_EVICT_INTERVAL = float(os.getenv("ARTIFACT_EVICT_INTERVAL", "300"))
+# Files used this recently are never evicted, e.g. a PDF a response is still streaming
+ARTIFACT_EVICT_GRACE_SECONDS = float(os.getenv("ARTIFACT_EVICT_GRACE_SECONDS", "300"))
+
+# Files still being written: spooled uploads and renders before their final rename
+TEMP_SUFFIXES = (".upload", ".tmp")
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for uploaded files and their converted outputs.
+
+    Files are named by the SHA-256 of the upload, so identical uploads share
+    one stored copy and one converted PDF. Background eviction keeps the
+    total size under ARTIFACT_MAX_BYTES and drops files not used for
+    ARTIFACT_MAX_AGE_SECONDS. It never removes files of a key that is being
+    converted, files used within ARTIFACT_EVICT_GRACE_SECONDS, or temporary
+    files younger than ARTIFACT_MAX_AGE_SECONDS.
+    """
+
+    def __init__(self, upload_dir: str = UPLOAD_DIR, pdf_dir: str = PDF_DIR,
+                 max_bytes: int = ARTIFACT_MAX_BYTES, max_age: float = ARTIFACT_MAX_AGE_SECONDS):
+        self.upload_dir = upload_dir
+        self.pdf_dir = pdf_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._locks = {}  # key -> [lock, number of requests using it]
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    async def save_upload(self, file: UploadFile, suffix: str) -> tuple[str, str]:
+        """
+        Stream an upload into the store, hashing it on the way.
+
+        Returns:
+            tuple[str, str]: The upload's digest and its stored path.
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        upload = await spool_upload(file, directory=self.upload_dir)
+        path = os.path.join(self.upload_dir, upload.sha256 + suffix)
+        if os.path.exists(path):
+            upload.close()
+            os.utime(path)
+        else:
+            os.replace(upload.path, path)
+        return upload.sha256, path
+
+    async def get_or_convert(self, key: str, suffix: str, convert) -> str:
+        """
+        Return the stored output for `key`, running `convert()` only on a miss.
+
+        Concurrent requests for the same key wait for a single conversion.
+
+        Args:
+            key (str): Digest of the source upload or content.
+            suffix (str): Output file suffix, e.g. ".pdf".
+            convert: Coroutine function that produces the output and returns its path.
+
+        Returns:
+            str: Path to the stored output.
+        """
+        path = os.path.join(self.pdf_dir, key + suffix)
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if os.path.exists(path):
+                    os.utime(path)
+                    self.hits += 1
+                    return path
+                self.misses += 1
+                os.makedirs(self.pdf_dir, exist_ok=True)
+                produced = await convert()
+                if os.path.abspath(produced) != os.path.abspath(path):
+                    os.replace(produced, path)
+                return path
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        files = []
+        for directory in (self.upload_dir, self.pdf_dir):
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def evict(self, busy: set | None = None) -> int:
+        """
+        Delete expired files, then the least recently used until under the size cap.
+
+        Args:
+            busy (set, optional): Keys in use, whose files are kept. Defaults
+                to the keys with a conversion running or waiting.
+
+        Returns:
+            int: Number of files deleted.
+        """
+        busy = set(self._locks) if busy is None else busy
+        now = time.time()
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            age = now - mtime
+            if age <= self.max_age and total <= self.max_bytes:
+                break
+            name = os.path.basename(path)
+            if age <= ARTIFACT_EVICT_GRACE_SECONDS or name.split(".", 1)[0] in busy:
+                continue
+            if name.endswith(TEMP_SUFFIXES) and age <= self.max_age:
+                continue  # still being written; only orphans past the age limit go
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    async def run_eviction(self, interval: float = ARTIFACT_EVICT_INTERVAL):
+        while True:
+            try:
+                await asyncio.to_thread(self.evict, set(self._locks))
+            except Exception as e:
+                print(f"[WARN] Artifact eviction failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        files = self._files()
+        return {
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+
+artifact_store = ArtifactStore()
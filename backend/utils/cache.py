@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from utils.metrics import register_gauge
+
+# Tunables for the shared result caches
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_DIR = os.getenv("CACHE_DIR")  # enables the on-disk tier when set
+
+_whitespace = re.compile(r"\s+")
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    return _whitespace.sub(" ", text).strip()
+
+
+def text_digest(text: str) -> str:
+    """
+    SHA-256 of the text with whitespace differences removed.
+    """
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def result_key(text: str, kind: str, model: str, prompt_version: str) -> str:
+    """
+    Build a cache key for an LLM result.
+
+    Args:
+        text (str): Input text; whitespace differences are ignored.
+        kind (str): Result kind, e.g. the summary type or "mindmap".
+        model (str): Model name used for the completion.
+        prompt_version (str): Version of the prompt template.
+
+    Returns:
+        str: Hex digest identifying the result.
+    """
+    return digest_result_key(text_digest(text), kind, model, prompt_version)
+
+
+def digest_result_key(digest: str, kind: str, model: str, prompt_version: str) -> str:
+    """
+    Same as `result_key`, for a text known only by its `text_digest`.
+    """
+    h = hashlib.sha256()
+    for part in (kind, model, prompt_version, digest):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for JSON-serializable values.
+
+    The memory tier is an LRU bounded by entry count and approximate size in
+    bytes. The optional disk tier stores one JSON file per key under
+    `disk_dir/<name>/` so entries survive restarts. Both tiers honour the TTL.
+    """
+
+    def __init__(self, name: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl: float = CACHE_TTL_SECONDS, disk_dir: str | None = CACHE_DIR):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = os.path.join(disk_dir, name) if disk_dir else None
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")  # type: ignore[arg-type]
+
+    def _store(self, key: str, expires_at: float, size: int, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+                self._bytes -= entry[1]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                record = json.loads(raw)
+                if record["expires_at"] > now:
+                    with self._lock:
+                        self._store(key, record["expires_at"], len(raw), record["value"])
+                        self.disk_hits += 1
+                    return record["value"]
+                os.remove(path)
+            except (OSError, ValueError, KeyError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value):
+        expires_at = time.time() + self.ttl
+        raw = json.dumps({"expires_at": expires_at, "value": value})
+        with self._lock:
+            self._store(key, expires_at, len(raw), value)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(raw)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Extracted text keyed by hash of the uploaded bytes
+text_cache = ResultCache("text")
+# LLM results keyed by result_key()
+result_cache = ResultCache("results")
+# OCR text of scanned PDF pages keyed by page hash, DPI and language
+ocr_cache = ResultCache("ocr")
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (text_cache, result_cache, ocr_cache)}
+
+
+def _cache_metric(field: str):
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items()}
+
+
+register_gauge("summaraize_cache_hit_ratio", "Share of cache lookups served from memory or disk.",
+               ("cache",), _cache_metric("hit_rate"))
+register_gauge("summaraize_cache_entries", "Entries in the memory tier of each cache.",
+               ("cache",), _cache_metric("entries"))
+register_gauge("summaraize_cache_bytes", "Approximate size of the memory tier of each cache.",
+               ("cache",), _cache_metric("bytes"))
+register_gauge(
+    "summaraize_cache_lookups_total", "Cache lookups by result.", ("cache", "result"),
+    lambda: {(name, result): stats[field] for name, stats in cache_stats().items()
+             for result, field in (("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))},
+    kind="counter",
+)
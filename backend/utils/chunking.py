@@ -0,0 +1,61 @@
+import re
+
+# Rough token estimate for English text (~4 characters per token)
+CHARS_PER_TOKEN = 4
+
+_section_break = re.compile(r"\n\s*\n|\n(?=(?:#{1,6}\s|\d+(?:\.\d+)*\s+[A-Z]|[A-Z][A-Z0-9 ,:-]{3,}\n))")
+_sentence_break = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    # Try section/paragraph boundaries first, then sentences, then hard cuts
+    for pattern in (_section_break, _sentence_break):
+        parts = [p for p in pattern.split(text) if p and p.strip()]
+        if len(parts) > 1:
+            return _pack(parts, max_tokens, sep="\n\n" if pattern is _section_break else " ")
+    step = max_tokens * CHARS_PER_TOKEN
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def _pack(parts: list[str], max_tokens: int, sep: str) -> list[str]:
+    chunks = []
+    current = []
+    current_tokens = 0
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(sep.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(part, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(sep.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += tokens
+    if current:
+        chunks.append(sep.join(current))
+    return chunks
+
+
+def split_into_chunks(pages: list[str], max_tokens: int) -> list[str]:
+    """
+    Split extracted document text into chunks under a token budget.
+
+    Whole pages are packed together while they fit. Pages that are too large
+    on their own are split on section or paragraph breaks, then sentences.
+
+    Args:
+        pages (list[str]): Text of each page, in order.
+        max_tokens (int): Approximate token budget per chunk.
+
+    Returns:
+        list[str]: Non-empty chunks, in document order.
+    """
+    pages = [p.strip() for p in pages if p and p.strip()]
+    return _pack(pages, max_tokens, sep="\n\n")
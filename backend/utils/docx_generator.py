@@ -1,188 +1,422 @@
-from docx.document import Document as DocxDocument
+import re
+from copy import deepcopy
+from functools import lru_cache
+from typing import NamedTuple
+from lxml import etree, html as lxml_html
 from docx import Document
-from docx.shared import RGBColor
-from docx.enum.text import WD_UNDERLINE
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from bs4 import BeautifulSoup
-from bs4.element import NavigableString
+from docx.document import Document as DocxDocument
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docx.oxml import parse_xml
-from docx.oxml.ns import nsdecls
-from docx.oxml.ns import qn
-from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml.ns import nsdecls, qn
+from docx.table import _Cell
+
+# Bump when rendering changes so cached exports are regenerated
+DOCX_RENDER_VERSION = "1"
+
+# Word paragraph styles for HTML blocks (all present in python-docx's default template)
+HEADING_STYLES = {
+    'h1': 'Title', 'h2': 'Heading 1', 'h3': 'Heading 2',
+    'h4': 'Heading 3', 'h5': 'Heading 4', 'h6': 'Heading 5',
+}
+LIST_STYLES = {
+    'bullet': ['List Bullet', 'List Bullet 2', 'List Bullet 3'],
+    'number': ['List Number', 'List Number 2', 'List Number 3'],
+}
+QUOTE_STYLE = 'Quote'
+TABLE_STYLE = 'Table Grid'
+
+# Quill alignment classes -> w:jc values
+ALIGNMENTS = {
+    'ql-align-center': 'center',
+    'ql-align-right': 'right',
+    'ql-align-left': 'left',
+    'ql-align-justify': 'both',
+}
+# Named background colors -> w:highlight values
+HIGHLIGHT_NAMES = {
+    'yellow': 'yellow',
+    'red': 'red',
+    'green': 'green',
+    'cyan': 'cyan',
+    'blue': 'blue',
+    'pink': 'magenta',
+    'violet': 'darkMagenta',
+}
+_highlight_values = frozenset(HIGHLIGHT_NAMES.values())
+LINK_COLOR = '0563C1'
+INDENT_TWIPS = 720  # per Quill indent level
+
+BLOCK_TAGS = frozenset(['p', 'div', 'ul', 'ol', 'table', 'blockquote', 'pre', 'hr', *HEADING_STYLES])
+LIST_TAGS = frozenset(['ul', 'ol'])
+TABLE_SECTIONS = frozenset(['thead', 'tbody', 'tfoot'])
+SKIPPED_TAGS = frozenset(['script', 'style', 'img', 'head', 'title'])
+
+_rgb = re.compile(r'rgb\(\s*(\d+),\s*(\d+),\s*(\d+)\s*\)')
+_hex_color = re.compile(r'#?([0-9A-Fa-f]{6})')
+_indent_class = re.compile(r'ql-indent-(\d+)')
+_whitespace = re.compile(r'[ \t\r\n]+')
+
+
+class RunStyle(NamedTuple):
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+    strike: bool = False
+    code: bool = False
+    color: str | None = None
+    highlight: str | None = None
+
+
+PLAIN = RunStyle()
+TAG_STYLES = {
+    'b': {'bold': True}, 'strong': {'bold': True},
+    'i': {'italic': True}, 'em': {'italic': True},
+    'u': {'underline': True},
+    's': {'strike': True}, 'strike': {'strike': True}, 'del': {'strike': True},
+    'code': {'code': True},
+    'a': {'underline': True},
+}
+
+
+def _to_hex(value: str) -> str | None:
+    match = _rgb.fullmatch(value)
+    if match:
+        return '{:02X}{:02X}{:02X}'.format(*(min(int(c), 255) for c in match.groups()))
+    match = _hex_color.fullmatch(value)
+    if match:
+        return match.group(1).upper()
+    return None
 
-def add_html_to_docx(doc: DocxDocument, html: str):
 
-    highlights_map = {
-        'yellow': 7,
-        'red': 2,
-        'green': 4,
-        'cyan': 3,
-        'blue': 5,
-    }
+@lru_cache(maxsize=1024)
+def parse_style(style_str: str) -> dict:
+    """
+    Read the text color and background color from an inline style attribute.
 
-    import re
+    Results are cached, since editor output repeats the same few styles; treat
+    the returned dict as read-only.
 
-    def rgb_to_hex(rgb_str):
-        match = re.match(r'rgb\((\d+),\s*(\d+),\s*(\d+)\)', rgb_str)
+    Args:
+        style_str (str): Value of an HTML style attribute.
+
+    Returns:
+        dict: 'color' as a hex string and 'highlight' as a hex string or a
+        w:highlight name, for whichever of them are set and understood.
+    """
+    styles = {}
+    for part in style_str.split(';'):
+        key, sep, val = part.partition(':')
+        if not sep:
+            continue
+        key = key.strip().lower()
+        val = val.strip().lower()
+        if key == 'color':
+            color = _to_hex(val)
+            if color:
+                styles['color'] = color
+        elif key in ('background-color', 'background'):
+            highlight = _to_hex(val) or HIGHLIGHT_NAMES.get(val)
+            if highlight:
+                styles['highlight'] = highlight
+    return styles
+
+
+@lru_cache(maxsize=4096)
+def _child_style(parent: RunStyle, tag: str, style_attr: str | None) -> RunStyle:
+    changes = dict(TAG_STYLES.get(tag, ()))
+    if tag == 'a' and parent.color is None:
+        changes['color'] = LINK_COLOR
+    if style_attr:
+        changes.update(parse_style(style_attr))
+    return parent._replace(**changes) if changes else parent
+
+
+@lru_cache(maxsize=1024)
+def _run_template(style: RunStyle):
+    # Prebuilt <w:r> with its run properties; each run is a deepcopy of this
+    props = []
+    if style.code:
+        props.append('<w:rFonts w:ascii="Courier New" w:hAnsi="Courier New" w:cs="Courier New"/>')
+    if style.bold:
+        props.append('<w:b/>')
+    if style.italic:
+        props.append('<w:i/>')
+    if style.strike:
+        props.append('<w:strike/>')
+    if style.color:
+        props.append(f'<w:color w:val="{style.color}"/>')
+    if style.highlight and style.highlight in _highlight_values:
+        props.append(f'<w:highlight w:val="{style.highlight}"/>')
+    if style.underline:
+        props.append('<w:u w:val="single"/>')
+    if style.highlight and style.highlight not in _highlight_values:
+        props.append(f'<w:shd w:val="clear" w:color="auto" w:fill="{style.highlight}"/>')
+    rpr = f'<w:rPr>{"".join(props)}</w:rPr>' if props else ''
+    return parse_xml(f'<w:r {nsdecls("w")}>{rpr}<w:t xml:space="preserve"/></w:r>')
+
+
+_BREAK = parse_xml(f'<w:r {nsdecls("w")}><w:br/></w:r>')
+
+
+def _classes(el) -> list[str]:
+    return (el.get('class') or '').split()
+
+
+def _indent_level(el) -> int:
+    for cls in _classes(el):
+        match = _indent_class.fullmatch(cls)
         if match:
-            r, g, b = match.groups()
-            return '{:02X}{:02X}{:02X}'.format(int(r), int(g), int(b))
-        return None
-
-    def parse_style(style_str):
-        styles = {}
-        for part in style_str.split(';'):
-            if ':' in part:
-                key, val = part.split(':', 1)
-                key = key.strip()
-                val = val.strip()
-                if key == 'color':
-                    if val.startswith('rgb'):
-                        hex_val = rgb_to_hex(val)
-                        styles['color'] = hex_val if hex_val else val
-                    else:
-                        styles['color'] = val
-                elif key == 'background-color':
-                    if val.startswith('rgb'):
-                        hex_val = rgb_to_hex(val)
-                        styles['highlight'] = hex_val if hex_val else val
-                    else:
-                        styles['highlight'] = val
-        return styles
-
-    def set_run_background(run, rgb_color):
-        rPr = run._r.get_or_add_rPr()
-        # Remove existing shading elements if any
-        for child in rPr.findall(qn('w:shd')):
-            rPr.remove(child)
-        shading_elm = parse_xml(
-            r'<w:shd {} w:val="clear" w:color="auto" w:fill="{}"/>'.format(nsdecls('w'), rgb_color)
-        )
-        rPr.append(shading_elm)
-
-    def apply_highlight_fallback(run, rgb_color):
-        color_map = {
-            'FFFF00': WD_COLOR_INDEX.YELLOW,
-            'FF0000': WD_COLOR_INDEX.RED,
-            '00FF00': WD_COLOR_INDEX.BRIGHT_GREEN,
-            '00FFFF': WD_COLOR_INDEX.TURQUOISE,
-            '0000FF': WD_COLOR_INDEX.BLUE,
-            'FFC0CB': WD_COLOR_INDEX.PINK,
-            '800080': WD_COLOR_INDEX.VIOLET,
-        }
-        rgb_color = rgb_color.upper()
-        highlight_color = color_map.get(rgb_color, None)
-        if highlight_color:
-            run.font.highlight_color = highlight_color
-
-    def apply_style_to_run(run, style):
-        if style.get('bold'):
-            run.bold = True
-        if style.get('italic'):
-            run.italic = True
-        if style.get('underline'):
-            run.underline = True
-        if style.get('code'):
-            run.font.name = 'Courier New'
-        if 'color' in style:
-            color_str = style['color']
-            if color_str.startswith('#'):
-                color_str = color_str[1:]
+            return int(match.group(1))
+    return 0
+
+
+class _Renderer:
+    """
+    Renders parsed HTML into one python-docx document.
+
+    Holds the per-document caches: style ids, paragraph templates and
+    hyperlink relationship ids.
+    """
+
+    def __init__(self, doc: DocxDocument):
+        self.doc = doc
+        self._style_ids = {}
+        self._paragraphs = {}
+        self._links = {}
+
+    def _style_id(self, name: str | None) -> str | None:
+        if name is None:
+            return None
+        if name not in self._style_ids:
             try:
-                run.font.color.rgb = RGBColor.from_string(color_str)
-            except Exception:
+                self._style_ids[name] = self.doc.styles[name].style_id
+            except KeyError:
+                self._style_ids[name] = None
+        return self._style_ids[name]
+
+    def _paragraph_template(self, style: str | None, align: str | None, indent: int):
+        key = (style, align, indent)
+        if key not in self._paragraphs:
+            props = []
+            style_id = self._style_id(style)
+            if style_id:
+                props.append(f'<w:pStyle w:val="{style_id}"/>')
+            if indent:
+                props.append(f'<w:ind w:left="{indent * INDENT_TWIPS}"/>')
+            if align:
+                props.append(f'<w:jc w:val="{align}"/>')
+            ppr = f'<w:pPr>{"".join(props)}</w:pPr>' if props else ''
+            self._paragraphs[key] = parse_xml(f'<w:p {nsdecls("w")}>{ppr}</w:p>')
+        return self._paragraphs[key]
+
+    def add_paragraph(self, container, style: str | None = None, el=None):
+        align = indent = None
+        if el is not None:
+            for cls in _classes(el):
+                align = ALIGNMENTS.get(cls, align)
+            if style is None:
+                indent = _indent_level(el)
+        p = deepcopy(self._paragraph_template(style, align, indent or 0))
+        container._insert_p(p)
+        return p
+
+    def _link_id(self, href: str) -> str:
+        if href not in self._links:
+            self._links[href] = self.doc.part.relate_to(href, RT.HYPERLINK, is_external=True)
+        return self._links[href]
+
+    @staticmethod
+    def add_text(target, text: str, style: RunStyle):
+        r = deepcopy(_run_template(style))
+        r[-1].text = text
+        target.append(r)
+
+    def render_inline(self, p, text: str | None, children, style: RunStyle, deferred: list | None = None):
+        """
+        Append `text` and the inline content of `children` to paragraph `p`.
+
+        Walks the tree with an explicit stack, so deeply nested spans cost no
+        recursion. Each element's tail text is written after its children, in
+        its parent's style. Lists and tables met directly under `p`'s element
+        are appended to `deferred` (when given) instead of being flattened.
+        """
+        if text:
+            text = _whitespace.sub(' ', text)
+            if text.strip():
+                self.add_text(p, text.lstrip(), style)
+        # Each entry: children iterator, style, target element, tail to write after it
+        stack = [(iter(children), style, p, None)]
+        while stack:
+            items, current, target, _ = stack[-1]
+            child = next(items, None)
+            if child is None:
+                _, _, _, tail = stack.pop()
+                if tail and stack:
+                    self.add_text(stack[-1][2], tail, stack[-1][1])
+                continue
+
+            tail = _whitespace.sub(' ', child.tail) if child.tail else None
+            tag = child.tag if isinstance(child.tag, str) else None
+            if tag is None or tag in SKIPPED_TAGS:
                 pass
-        if 'highlight' in style:
-            bg_color = style['highlight'].lstrip('#').upper()
-            try:
-                set_run_background(run, bg_color)
-            except Exception:
-                try:
-                    apply_highlight_fallback(run, bg_color)
-                except Exception:
-                    pass
-
-    def merge_styles(parent, new):
-        """Merge two style dicts, with 'new' overriding."""
-        merged = parent.copy()
-        merged.update(new)
-        return merged
-
-    def extract_styles(el):
-        """Extract styles from tag name and inline styles."""
-        style = {}
-        tag = el.name
-        if tag in ['b', 'strong']:
-            style['bold'] = True
-        if tag in ['i', 'em']:
-            style['italic'] = True
-        if tag == 'u':
-            style['underline'] = True
-        if tag in ['s', 'strike', 'del']:
-            style['strike'] = True
-        if tag == 'code':
-            style['code'] = True
-        # Inline style parsing
-        if 'style' in el.attrs:
-            inline_styles = parse_style(el.attrs['style'])
-            if 'color' in inline_styles:
-                style['color'] = inline_styles['color']
-            if 'highlight' in inline_styles:
-                style['highlight'] = inline_styles['highlight']
-        return style
-
-    def process_element(el, paragraph, current_style):
-        if isinstance(el, NavigableString):
-            if el.strip():  
-                run = paragraph.add_run(str(el))
-                apply_style_to_run(run, current_style)
-        else:
-            el_style = extract_styles(el)
-            combined_style = merge_styles(current_style, el_style)
-
-            # Handle <a> specially to include link text and href
-            if el.name == 'a':
-                href = el.attrs.get('href', None)
-                text_content = ''.join(str(c) for c in el.children if isinstance(c, NavigableString))
-                run = paragraph.add_run()
-                run.text = text_content
-                apply_style_to_run(run, combined_style)
-                return
-
-            # Recursively process children
-            for child in el.children:
-                process_element(child, paragraph, combined_style)
-
-    soup = BeautifulSoup(html, 'html.parser')
-
-    for elem in soup.children:
-        align = None
-        classes = getattr(elem, 'attrs', {}).get('class', [])
-        if 'ql-align-center' in classes:
-            align = WD_ALIGN_PARAGRAPH.CENTER
-        elif 'ql-align-right' in classes:
-            align = WD_ALIGN_PARAGRAPH.RIGHT
-        elif 'ql-align-left' in classes:
-            align = WD_ALIGN_PARAGRAPH.LEFT
-
-        if getattr(elem, "name", None) == 'p':
-            p = doc.add_paragraph()
-            if align is not None:
-                p.alignment = align
-            process_element(elem, p, {})
-        elif getattr(elem, "name", None) in ['h1', 'h2', 'h3']:
-            name = getattr(elem, "name", None)
-            level = {'h1': 0, 'h2': 1, 'h3': 2}.get(name or '', 0)
-            p = doc.add_heading(level=level)
-            if align is not None:
-                p.alignment = align
-            process_element(elem, p, {})
-        elif getattr(elem, "name", None) in ['ul', 'ol']:
-            for li in getattr(elem, 'find_all', lambda *a, **k: [])('li'):
-                p = doc.add_paragraph(style='List Bullet' if getattr(elem, "name", None) == 'ul' else 'List Number')
-                if align is not None:
-                    p.alignment = align
-                process_element(li, p, {})
-        elif isinstance(elem, NavigableString):
-            if elem.strip():
-                doc.add_paragraph(str(elem))
\ No newline at end of file
+            elif deferred is not None and len(stack) == 1 and (tag in LIST_TAGS or tag == 'table'):
+                deferred.append(child)
+            elif tag == 'br':
+                if len(p) > (p[0].tag == qn('w:pPr') if len(p) else 0):
+                    target.append(deepcopy(_BREAK))
+            else:
+                child_style = _child_style(current, tag, child.get('style'))
+                child_target = target
+                href = child.get('href') if tag == 'a' else None
+                if href and target is p:
+                    child_target = etree.SubElement(p, qn('w:hyperlink'))
+                    child_target.set(qn('r:id'), self._link_id(href))
+                if child.text:
+                    self.add_text(child_target, _whitespace.sub(' ', child.text), child_style)
+                stack.append((iter(child), child_style, child_target, tail))
+                continue
+            if tail:
+                self.add_text(target, tail, current)
+
+    def render_list(self, container, el, depth: int = 0):
+        kind = 'number' if el.tag == 'ol' else 'bullet'
+        for li in el:
+            if li.tag != 'li':
+                continue
+            # Quill 2 marks the list type per item; Quill 1 flattens nesting into indent classes
+            item_kind = {'ordered': 'number', 'bullet': 'bullet'}.get(li.get('data-list'), kind)
+            level = min(depth + _indent_level(li), len(LIST_STYLES[item_kind]) - 1)
+            p = self.add_paragraph(container, LIST_STYLES[item_kind][level], li)
+            nested = []
+            self.render_inline(p, li.text, li, PLAIN, deferred=nested)
+            for child in nested:
+                if child.tag == 'table':
+                    self.render_table(container, child)
+                else:
+                    self.render_list(container, child, depth + 1)
+
+    def render_table(self, container, el):
+        rows = []
+        for child in el:
+            # Rows sit directly under <table> or inside thead/tbody/tfoot, never in nested tables
+            for row in ([child] if child.tag == 'tr' else child if child.tag in TABLE_SECTIONS else ()):
+                if row.tag == 'tr':
+                    rows.append([cell for cell in row if cell.tag in ('td', 'th')])
+        cols = max((len(row) for row in rows), default=0)
+        if not cols:
+            return
+        table = self._owner(container).add_table(len(rows), cols)
+        try:
+            table.style = TABLE_STYLE
+        except (KeyError, ValueError):
+            pass
+        for row, cells in zip(table.rows, rows):
+            for cell, source in zip(row.cells, cells):
+                tc = cell._tc
+                placeholder = tc.p_lst[0]
+                style = PLAIN._replace(bold=True) if source.tag == 'th' else PLAIN
+                self.render_blocks(tc, source, style)
+                if len(tc.p_lst) > 1 or len(tc.tbl_lst):
+                    tc.remove(placeholder)
+                if tc[-1].tag != qn('w:p'):
+                    tc.append(deepcopy(self._paragraph_template(None, None, 0)))
+
+    def _owner(self, container):
+        # python-docx object for the block container, used to add tables
+        if container is self.doc.element.body:
+            return self.doc
+        return _Cell(container, self.doc)
+
+    def render_pre(self, container, el):
+        p = self.add_paragraph(container, None, el)
+        style = PLAIN._replace(code=True)
+        for i, line in enumerate(el.text_content().split('\n')):
+            if i:
+                p.append(deepcopy(_BREAK))
+            if line:
+                self.add_text(p, line, style)
+
+    def render_blocks(self, container, parent, style: RunStyle = PLAIN):
+        """
+        Render the children of `parent` as block content of `container`.
+
+        Inline content found between blocks is gathered into its own paragraph.
+        """
+        loose = None
+
+        def add_loose(text):
+            nonlocal loose
+            if text and text.strip():
+                if loose is None:
+                    loose = self.add_paragraph(container)
+                self.render_inline(loose, text, (), style)
+
+        add_loose(parent.text)
+        for child in parent:
+            tag = child.tag if isinstance(child.tag, str) else None
+            if tag in BLOCK_TAGS:
+                loose = None
+                if tag == 'p':
+                    p = self.add_paragraph(container, None, child)
+                    self.render_inline(p, child.text, child, _child_style(style, tag, child.get('style')))
+                elif tag in HEADING_STYLES:
+                    p = self.add_paragraph(container, HEADING_STYLES[tag], child)
+                    self.render_inline(p, child.text, child, style)
+                elif tag in LIST_TAGS:
+                    self.render_list(container, child)
+                elif tag == 'table':
+                    self.render_table(container, child)
+                elif tag == 'blockquote':
+                    p = self.add_paragraph(container, QUOTE_STYLE, child)
+                    self.render_inline(p, child.text, child, style)
+                elif tag == 'pre':
+                    self.render_pre(container, child)
+                elif tag == 'div':
+                    self.render_blocks(container, child, style)
+                add_loose(child.tail)
+            elif tag is not None and tag not in SKIPPED_TAGS:
+                if loose is None:
+                    loose = self.add_paragraph(container)
+                self.render_inline(loose, None, [child], style)
+            else:
+                add_loose(child.tail)
+
+
+def add_html_to_docx(doc: DocxDocument, html: str):
+    """
+    Append editor HTML (Quill output) to a DOCX document.
+
+    Handles paragraphs, headings, nested and Quill-indented lists, tables,
+    links, block quotes and code blocks, with bold/italic/underline/strike,
+    text color, background color and alignment. The HTML is parsed once with
+    lxml and walked in a single pass.
+
+    Args:
+        doc (Document): The python-docx document to append to.
+        html (str): HTML fragment to render.
+    """
+    if not html or not html.strip():
+        return
+    root = lxml_html.fragment_fromstring(html, create_parent='div')
+    _Renderer(doc).render_blocks(doc.element.body, root)
+
+
+def render_docx(title: str, html: str, path: str) -> str:
+    """
+    Build a titled DOCX from editor HTML and save it to `path`.
+
+    Runs in a worker process, so the python-docx work stays off the event loop.
+
+    Args:
+        title (str): Document title; "Summary" when empty.
+        html (str): HTML fragment to render.
+        path (str): Where to write the .docx file.
+
+    Returns:
+        str: `path`.
+    """
+    doc = Document()
+    doc.add_heading(title or "Summary", 0)
+    add_html_to_docx(doc, html)
+    doc.save(path)
+    return path
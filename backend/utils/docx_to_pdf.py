@@ -1,14 +1,46 @@
 import os
+import time
+import shlex
+import asyncio
+import tempfile
 import subprocess
-import uuid
+import xmlrpc.client
+from utils.metrics import debug, register_gauge, timed
 
-def convert_docx_to_pdf(docx_path: str, output_dir: str) -> str:
+# Tunables for the LibreOffice worker pool
+LIBREOFFICE_CMD = os.getenv("LIBREOFFICE_CMD", "libreoffice")
+UNOSERVER_CMD = os.getenv("UNOSERVER_CMD", "unoserver")
+LIBREOFFICE_POOL_SIZE = int(os.getenv("LIBREOFFICE_POOL_SIZE", "2"))
+LIBREOFFICE_TIMEOUT = float(os.getenv("LIBREOFFICE_TIMEOUT", "60"))
+LIBREOFFICE_STARTUP_TIMEOUT = float(os.getenv("LIBREOFFICE_STARTUP_TIMEOUT", "60"))
+LIBREOFFICE_BASE_PORT = int(os.getenv("LIBREOFFICE_BASE_PORT", "2100"))
+LIBREOFFICE_RETRY_SECONDS = float(os.getenv("LIBREOFFICE_RETRY_SECONDS", "5"))  # first wait before restarting a failed worker
+LIBREOFFICE_RETRY_MAX_SECONDS = float(os.getenv("LIBREOFFICE_RETRY_MAX_SECONDS", "300"))
+LIBREOFFICE_PROFILE_ROOT = os.getenv(
+    "LIBREOFFICE_PROFILE_ROOT", os.path.join(tempfile.gettempdir(), "summaraize-libreoffice")
+)
+
+
+def _profile_url(profile_dir: str) -> str:
+    return "file://" + os.path.abspath(profile_dir)
+
+
+def _pdf_path_for(docx_path: str, output_dir: str) -> str:
+    base_name = os.path.splitext(os.path.basename(docx_path))[0]
+    return os.path.join(output_dir, base_name + ".pdf")
+
+
+def convert_docx_to_pdf(docx_path: str, output_dir: str, profile_dir: str | None = None,
+                        timeout: float | None = None) -> str:
     """
     Convert a DOCX file to PDF using LibreOffice CLI.
 
     Args:
         docx_path (str): Path to the DOCX file.
         output_dir (str): Directory where PDF should be saved.
+        profile_dir (str, optional): LibreOffice user profile to use. Concurrent
+            conversions must not share a profile.
+        timeout (float, optional): Seconds before the conversion is killed.
 
     Returns:
         str: Path to the converted PDF file.
@@ -16,21 +48,20 @@ def convert_docx_to_pdf(docx_path: str, output_dir: str) -> str:
     Raises:
         RuntimeError: If conversion fails.
     """
-    print(f"[DEBUG] Starting DOCX to PDF conversion for: {docx_path}")
+    debug(f"Starting DOCX to PDF conversion for: {docx_path}")
     if not os.path.exists(docx_path):
         raise FileNotFoundError(f"DOCX file not found: {docx_path}")
 
     os.makedirs(output_dir, exist_ok=True)
 
+    cmd = [LIBREOFFICE_CMD, "--headless"]
+    if profile_dir:
+        cmd.append(f"-env:UserInstallation={_profile_url(profile_dir)}")
+    cmd += ["--convert-to", "pdf", docx_path, "--outdir", output_dir]
+
     try:
-        print(f"[DEBUG] Running LibreOffice command...")
-        subprocess.run([
-            "libreoffice",
-            "--headless",
-            "--convert-to", "pdf",
-            docx_path,
-            "--outdir", output_dir
-        ], check=True)
+        debug("Running LibreOffice command...")
+        subprocess.run(cmd, check=True, timeout=timeout)
     except subprocess.CalledProcessError as e:
         print(f"[ERROR] LibreOffice conversion failed. Error: {e}")
         raise RuntimeError(f"LibreOffice conversion failed. Error: {e}")
@@ -39,11 +70,223 @@ def convert_docx_to_pdf(docx_path: str, output_dir: str) -> str:
         raise RuntimeError(f"Unexpected error during DOCX to PDF conversion: {e}")
 
     # Construct PDF path
-    base_name = os.path.splitext(os.path.basename(docx_path))[0]
-    pdf_path = os.path.join(output_dir, base_name + ".pdf")
+    pdf_path = _pdf_path_for(docx_path, output_dir)
 
     if not os.path.exists(pdf_path):
         raise RuntimeError(f"PDF file not created: {pdf_path}")
 
-    print(f"[DEBUG] PDF successfully created at: {pdf_path}")
-    return pdf_path
\ No newline at end of file
+    debug(f"PDF successfully created at: {pdf_path}")
+    return pdf_path
+
+
+class _Worker:
+    """
+    One long-lived headless LibreOffice instance with its own profile.
+
+    The instance is driven through unoserver's XML-RPC API. While the instance
+    cannot be started the worker still owns a private, warm profile directory
+    and falls back to one `--convert-to` process per job; starting is retried
+    with exponential backoff.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.port = LIBREOFFICE_BASE_PORT + 2 * index
+        self.uno_port = self.port + 1
+        self.profile_dir = os.path.join(LIBREOFFICE_PROFILE_ROOT, f"worker-{index}")
+        self.process = None
+        self.restarts = 0
+        self.failures = 0  # failed starts in a row
+        self.retry_at = 0.0  # monotonic time of the next start attempt
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.process = subprocess.Popen(
+            shlex.split(UNOSERVER_CMD) + [
+                "--interface", "127.0.0.1",
+                "--port", str(self.port),
+                "--uno-port", str(self.uno_port),
+                "--user-installation", os.path.abspath(self.profile_dir),  # unoserver makes the file:// URL
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + LIBREOFFICE_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if not self.alive():
+                raise RuntimeError(f"LibreOffice worker {self.index} exited during start-up")
+            try:
+                xmlrpc.client.ServerProxy(self.url, allow_none=True).info()
+                return
+            except (OSError, xmlrpc.client.Error):
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"LibreOffice worker {self.index} did not start in time")
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, 15)
+                self.process.wait(timeout=10)
+            except (ProcessLookupError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(self.process.pid, 9)
+                except ProcessLookupError:
+                    pass
+                self.process.wait()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def try_start(self) -> bool:
+        """
+        Start the instance, or schedule the next attempt with backoff.
+
+        Returns:
+            bool: Whether the instance is running.
+        """
+        try:
+            if self.process is not None:
+                self.restart()
+            else:
+                self.start()
+        except (OSError, RuntimeError) as e:
+            self.stop()
+            delay = min(LIBREOFFICE_RETRY_MAX_SECONDS, LIBREOFFICE_RETRY_SECONDS * 2 ** self.failures)
+            self.failures += 1
+            self.retry_at = time.monotonic() + delay
+            print(f"[WARN] LibreOffice worker {self.index} could not start ({e}); "
+                  f"converting with one process per job, retrying in {delay:g}s")
+            return False
+        self.failures = 0
+        return True
+
+    def convert(self, docx_path: str, output_dir: str) -> str:
+        os.makedirs(output_dir, exist_ok=True)
+        pdf_path = os.path.abspath(_pdf_path_for(docx_path, output_dir))
+        xmlrpc.client.ServerProxy(self.url, allow_none=True).convert(
+            os.path.abspath(docx_path), None, pdf_path, "pdf"
+        )
+        if not os.path.exists(pdf_path):
+            raise RuntimeError(f"PDF file not created: {pdf_path}")
+        return pdf_path
+
+    def convert_cold(self, docx_path: str, output_dir: str) -> str:
+        return convert_docx_to_pdf(docx_path, output_dir, profile_dir=self.profile_dir,
+                                   timeout=LIBREOFFICE_TIMEOUT)
+
+
+class LibreOfficePool:
+    """
+    Pool of warm LibreOffice workers for DOCX to PDF conversion.
+
+    Jobs wait in FIFO order for an idle worker. A worker that crashed is
+    restarted before it takes the next job, and a job that exceeds
+    LIBREOFFICE_TIMEOUT kills and restarts its worker. Blocking calls run in
+    threads so the event loop stays free.
+    """
+
+    def __init__(self, size: int = LIBREOFFICE_POOL_SIZE):
+        self.size = max(1, size)
+        self.workers = [_Worker(i) for i in range(self.size)]
+        self.waiting = 0
+        self._idle = None
+        self._start_task = None
+
+    @property
+    def warm(self) -> bool:
+        return any(worker.alive() for worker in self.workers)
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        await asyncio.gather(*(asyncio.to_thread(worker.try_start) for worker in self.workers))
+        if not self.warm:
+            print(f"[ERROR] No warm LibreOffice worker started (UNOSERVER_CMD={UNOSERVER_CMD!r}); every "
+                  "DOCX to PDF conversion runs a cold LibreOffice process until a restart succeeds")
+        for worker in self.workers:
+            self._idle.put_nowait(worker)
+
+    async def start(self):
+        if self._start_task is None:
+            self._start_task = asyncio.ensure_future(self._start())
+        await self._start_task
+
+    async def convert(self, docx_path: str, output_dir: str) -> str:
+        """
+        Convert a DOCX file to PDF on the next idle worker.
+
+        Returns:
+            str: Path to the converted PDF file.
+
+        Raises:
+            RuntimeError: If conversion fails or times out.
+        """
+        await self.start()
+        self.waiting += 1
+        try:
+            worker = await self._idle.get()  # type: ignore[union-attr]
+        finally:
+            self.waiting -= 1
+
+        try:
+            with timed("libreoffice"):
+                return await self._convert_on(worker, docx_path, output_dir)
+        finally:
+            self._idle.put_nowait(worker)  # type: ignore[union-attr]
+
+    async def _convert_on(self, worker: _Worker, docx_path: str, output_dir: str) -> str:
+        if not worker.alive():
+            if worker.process is not None:
+                print(f"[WARN] LibreOffice worker {worker.index} crashed; restarting")
+            started = time.monotonic() >= worker.retry_at and await asyncio.to_thread(worker.try_start)
+            if not started:
+                return await asyncio.to_thread(worker.convert_cold, docx_path, output_dir)
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(worker.convert, docx_path, output_dir), LIBREOFFICE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(worker.try_start)
+            raise RuntimeError(f"LibreOffice conversion timed out after {LIBREOFFICE_TIMEOUT}s")
+        except xmlrpc.client.Fault as e:
+            # The document failed to convert; the instance itself is fine
+            raise RuntimeError(f"LibreOffice conversion failed. Error: {e.faultString}")
+        except (OSError, xmlrpc.client.Error) as e:
+            # Connection-level failure: treat the instance as crashed
+            await asyncio.to_thread(worker.try_start)
+            raise RuntimeError(f"LibreOffice conversion failed. Error: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "warm": self.warm,
+            "warm_workers": sum(worker.alive() for worker in self.workers),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "waiting": self.waiting,
+            "restarts": sum(worker.restarts for worker in self.workers),
+        }
+
+    async def close(self):
+        for worker in self.workers:
+            await asyncio.to_thread(worker.stop)
+
+
+libreoffice_pool = LibreOfficePool()
+
+register_gauge(
+    "summaraize_libreoffice_workers", "LibreOffice conversions waiting for a worker, and idle workers.",
+    ("state",), lambda: {("waiting",): libreoffice_pool.waiting, ("idle",): libreoffice_pool.stats()["idle"]},
+)
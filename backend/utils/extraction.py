@@ -0,0 +1,319 @@
+import os
+import time
+import zipfile
+import asyncio
+from dataclasses import dataclass, field
+from utils.workers import run_in_process, WORKER_PROCESSES
+from utils.cache import ocr_cache, text_cache
+from utils.uploads import SpooledUpload
+from utils.metrics import observe_stage
+from utils.ocr import page_hash, ocr_key, ocr_files, ocr_pdf_pages, debug_tesseract, OCR_BATCH_PAGES
+
+# PDFs with at least this many pages are split across worker processes
+PARALLEL_PDF_MIN_PAGES = int(os.getenv("PARALLEL_PDF_MIN_PAGES", "32"))
+# Pages per batch when streaming pages in order (iter_upload_pages)
+STREAM_PAGE_BATCH = int(os.getenv("STREAM_PAGE_BATCH", "8"))
+# Scanned-page OCR batches in flight at once
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", str(WORKER_PROCESSES)))
+
+IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"\xff\xd8\xff",       # JPEG
+    b"II*\x00",            # TIFF (little endian)
+    b"MM\x00*",            # TIFF (big endian)
+    b"BM",                 # BMP
+    b"GIF87a",
+    b"GIF89a",
+)
+
+
+@dataclass
+class ExtractedDocument:
+    kind: str
+    pages: list[str]
+    page_timings: list[float] = field(default_factory=list)  # seconds spent on each page
+    timings: dict = field(default_factory=dict)  # seconds spent per stage
+    ocr_pages: list[int] = field(default_factory=list)  # pages recovered by OCR
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+
+def sniff_kind(path: str) -> str | None:
+    """
+    Detect the document type from its magic bytes rather than the filename.
+
+    Returns:
+        str | None: "pdf", "docx", "image", or None if unsupported.
+    """
+    with open(path, "rb") as f:
+        head = f.read(16)
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            return None
+        return None
+    if head.startswith(IMAGE_SIGNATURES) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        return "image"
+    return None
+
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> tuple[list[str], list[float], dict]:
+    # Runs in a worker process. Pages without a text layer are returned with a
+    # content hash so the caller can OCR them.
+    import fitz
+
+    texts = []
+    timings = []
+    missing = {}
+    with fitz.open(path, filetype="pdf") as pdf:
+        for number in range(start, stop):
+            t0 = time.perf_counter()
+            page = pdf[number]
+            text = page.get_text()  # type: ignore
+            if not text.strip():
+                missing[number] = page_hash(pdf, page)
+            texts.append(text)
+            timings.append(time.perf_counter() - t0)
+    return texts, timings, missing
+
+
+def _pdf_page_count(path: str) -> int:
+    import fitz
+
+    with fitz.open(path, filetype="pdf") as pdf:
+        return pdf.page_count
+
+
+def _extract_docx(path: str) -> str:
+    import docx2txt
+
+    return docx2txt.process(path)
+
+
+def _extract_image(path: str) -> str:
+    debug_tesseract()
+    return ocr_files([path])[0]
+
+
+def _page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+async def _extract_pdf(path: str, doc: ExtractedDocument, report):
+    t0 = time.perf_counter()
+    page_count = await run_in_process(_pdf_page_count, path)
+    workers = WORKER_PROCESSES if page_count >= PARALLEL_PDF_MIN_PAGES else 1
+    ranges = _page_ranges(page_count, workers) if page_count else []
+
+    parsed = 0
+
+    async def extract_range(start: int, stop: int):
+        nonlocal parsed
+        result = await run_in_process(_extract_pdf_range, path, start, stop)
+        parsed += stop - start
+        report("extract", pages_parsed=parsed, pages_total=page_count)
+        return result
+
+    results = await asyncio.gather(*(extract_range(start, stop) for start, stop in ranges))
+    missing = {}
+    for texts, timings, empty in results:
+        doc.pages.extend(texts)
+        doc.page_timings.extend(timings)
+        missing.update(empty)
+    doc.timings["extract"] = time.perf_counter() - t0
+    observe_stage("extract", doc.timings["extract"])
+
+    if missing:
+        await _ocr_missing_pages(path, missing, doc, report)
+
+
+async def _ocr_missing_pages(path: str, missing: dict, doc: ExtractedDocument, report):
+    """
+    Fill in pages without a text layer by rasterizing and OCR-ing them.
+
+    Results are cached by page hash, so a scanned page seen before (in this
+    or any other upload) costs neither a raster nor a tesseract run.
+    """
+    t0 = time.perf_counter()
+    todo = []
+    for number, digest in sorted(missing.items()):
+        cached = ocr_cache.get(ocr_key(digest))
+        if cached is not None:
+            doc.pages[number] = cached
+        else:
+            todo.append(number)
+    doc.ocr_pages = sorted(missing)
+
+    semaphore = asyncio.Semaphore(OCR_CONCURRENCY)
+    done = len(missing) - len(todo)
+    stage_totals = {"raster": 0.0, "ocr": 0.0}
+
+    async def ocr_batch(numbers: list[int]):
+        nonlocal done
+        async with semaphore:
+            texts, timings = await run_in_process(ocr_pdf_pages, path, numbers)
+        observe_stage("ocr", timings["raster"] + timings["ocr"])
+        per_page = (timings["raster"] + timings["ocr"]) / len(numbers)
+        for number, text in zip(numbers, texts):
+            doc.pages[number] = text
+            doc.page_timings[number] += per_page
+            ocr_cache.set(ocr_key(missing[number]), text)
+        for stage in stage_totals:
+            stage_totals[stage] += timings[stage]
+        done += len(numbers)
+        report("ocr", pages_done=done, pages_total=len(missing))
+
+    batches = [todo[i:i + OCR_BATCH_PAGES] for i in range(0, len(todo), OCR_BATCH_PAGES)]
+    await asyncio.gather(*(ocr_batch(batch) for batch in batches))
+    if not batches:
+        report("ocr", pages_done=done, pages_total=len(missing))
+
+    # Worker-side time summed over batches; wall time in "ocr_wall"
+    doc.timings.update(stage_totals)
+    doc.timings["ocr_wall"] = time.perf_counter() - t0
+
+
+async def extract_document(path: str, progress=None) -> ExtractedDocument | None:
+    """
+    Extract per-page text from an uploaded PDF, DOCX or image.
+
+    CPU-bound parsing and OCR run in the shared process pool. Workers open the
+    file by path, so the upload is never held in memory or pickled; large PDFs
+    are split into page ranges that are parsed in parallel.
+
+    Args:
+        path (str): Path to the spooled upload.
+        progress (Callable, optional): Called as progress(stage, **info) on the
+            event loop as pages are parsed and when OCR finishes.
+
+    Returns:
+        ExtractedDocument | None: Extracted pages with timings, or None if the
+        file type is unsupported.
+    """
+    report = progress or (lambda stage, **info: None)
+    kind = sniff_kind(path)
+    if kind is None:
+        return None
+
+    doc = ExtractedDocument(kind=kind, pages=[])
+    if kind == "pdf":
+        await _extract_pdf(path, doc, report)
+    elif kind == "docx":
+        t0 = time.perf_counter()
+        doc.pages.append(await run_in_process(_extract_docx, path))
+        doc.page_timings.append(time.perf_counter() - t0)
+        doc.timings["extract"] = doc.page_timings[0]
+        observe_stage("extract", doc.timings["extract"])
+        report("extract", pages_parsed=1, pages_total=1)
+    else:
+        t0 = time.perf_counter()
+        doc.pages.append(await run_in_process(_extract_image, path))
+        doc.page_timings.append(time.perf_counter() - t0)
+        doc.timings["ocr"] = doc.page_timings[0]
+        observe_stage("ocr", doc.timings["ocr"])
+        report("ocr", status="done")
+    return doc
+
+
+async def extract_upload_pages(upload: SpooledUpload, progress=None) -> list[str] | None:
+    """
+    Extract per-page text from a spooled upload, reusing earlier results.
+
+    Extracted pages are cached by the SHA-256 of the upload, so a repeat
+    upload skips parsing and OCR entirely.
+
+    Returns:
+        list[str] | None: Text of each page, or None if the file type is unsupported.
+    """
+    pages = text_cache.get(upload.sha256)
+    if pages is not None:
+        if progress:
+            progress("extract", cached=True, pages_total=len(pages))
+        return pages
+
+    doc = await extract_document(upload.path, progress)
+    if doc is None:
+        return None
+    text_cache.set(upload.sha256, doc.pages)
+    return doc.pages
+
+
+async def iter_upload_pages(upload: SpooledUpload, progress=None):
+    """
+    Extract a spooled upload and yield its pages in order as they become ready.
+
+    PDFs are split into ranges of STREAM_PAGE_BATCH pages that are parsed (and
+    OCR-ed where needed) concurrently on the process pool; each range is
+    yielded as soon as it and every range before it are done, so consumers
+    can start on the first pages while the rest are still being extracted.
+    Other file types arrive as one batch. The full result is cached like
+    extract_upload_pages, and a cache hit yields every page at once.
+
+    Args:
+        upload (SpooledUpload): The spooled file.
+        progress (Callable, optional): Called as progress(stage, **info) on the
+            event loop as pages are parsed and OCR-ed.
+
+    Yields:
+        list[str]: Text of the next pages in document order.
+
+    Raises:
+        ValueError: If the file type is unsupported.
+    """
+    report = progress or (lambda stage, **info: None)
+    pages = text_cache.get(upload.sha256)
+    if pages is not None:
+        report("extract", cached=True, pages_total=len(pages))
+        yield pages
+        return
+
+    kind = sniff_kind(upload.path)
+    if kind is None:
+        raise ValueError("Unsupported file type")
+    if kind != "pdf":
+        doc = await extract_document(upload.path, progress)
+        text_cache.set(upload.sha256, doc.pages)  # type: ignore[union-attr]
+        yield doc.pages  # type: ignore[union-attr]
+        return
+
+    path = upload.path
+    t0 = time.perf_counter()
+    page_count = await run_in_process(_pdf_page_count, path)
+    doc = ExtractedDocument(kind=kind, pages=[""] * page_count, page_timings=[0.0] * page_count)
+    parsed = 0
+    ocr_done = 0
+
+    async def extract_range(start: int, stop: int) -> list[str]:
+        nonlocal parsed, ocr_done
+        texts, timings, missing = await run_in_process(_extract_pdf_range, path, start, stop)
+        doc.pages[start:stop] = texts
+        doc.page_timings[start:stop] = timings
+        parsed += stop - start
+        if parsed == page_count:
+            observe_stage("extract", time.perf_counter() - t0)
+        report("extract", pages_parsed=parsed, pages_total=page_count)
+        if missing:
+            await _ocr_missing_pages(path, missing, doc, lambda stage, **info: None)
+            ocr_done += len(missing)
+            report("ocr", pages_done=ocr_done)
+        return doc.pages[start:stop]
+
+    tasks = [
+        asyncio.ensure_future(extract_range(start, min(start + STREAM_PAGE_BATCH, page_count)))
+        for start in range(0, page_count, STREAM_PAGE_BATCH)
+    ]
+    try:
+        for task in tasks:
+            yield await task
+        text_cache.set(upload.sha256, doc.pages)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,228 @@
+import math
+import numpy as np
+
+EDGE_LENGTH = 100.0  # layout units between connected nodes; the frontend scales as it likes
+RING_SPACING = 100.0  # distance between the rings of a cluster
+NODE_GAP = 40.0  # minimum arc length between neighbours on a ring
+FORCE_ITERATIONS = 120
+LAYOUT_VERSION = "1"  # bump when positions change, so cached layouts are recomputed
+
+
+def _csr(n: int, u: np.ndarray, v: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Undirected adjacency as (indptr, neighbours)
+    heads = np.concatenate([u, v])
+    tails = np.concatenate([v, u])
+    order = np.argsort(heads, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=indptr[1:])
+    return indptr, tails[order]
+
+
+def _neighbours(indptr: np.ndarray, adjacency: np.ndarray, nodes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # All (node, neighbour) pairs of `nodes`, without a Python loop
+    starts, counts = indptr[nodes], indptr[nodes + 1] - indptr[nodes]
+    owners = np.repeat(nodes, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, adjacency[np.repeat(starts, counts) + offsets]
+
+
+def cluster_nodes(n: int, indptr: np.ndarray, adjacency: np.ndarray, cluster_size: int):
+    """
+    Group nodes around hubs with a multi-source breadth-first search.
+
+    The ceil(n / cluster_size) best-connected nodes are hubs; every other node
+    joins the hub it is fewest hops from. Nodes no hub reaches share one
+    extra cluster.
+
+    Returns:
+        tuple: (hubs, cluster, depth, parent) arrays; depth is hops from the
+        hub and parent the node a node was reached from (-1 for none).
+    """
+    degree = np.diff(indptr)
+    count = min(max(1, math.ceil(n / cluster_size)), int((degree > 0).sum()))
+    hubs = np.argsort(-degree, kind="stable")[:count]
+    cluster = np.full(n, -1, dtype=np.int64)
+    depth = np.full(n, -1, dtype=np.int64)
+    parent = np.full(n, -1, dtype=np.int64)
+    cluster[hubs] = np.arange(count)
+    depth[hubs] = 0
+    frontier, level = hubs, 0
+    while len(frontier):
+        level += 1
+        owners, found = _neighbours(indptr, adjacency, frontier)
+        new = cluster[found] == -1
+        found, first = np.unique(found[new], return_index=True)
+        owners = owners[new][first]
+        cluster[found] = cluster[owners]
+        depth[found] = level
+        parent[found] = owners
+        frontier = found
+    unreached = cluster == -1
+    if unreached.any():
+        cluster[unreached] = count
+        depth[unreached] = 1
+    return hubs, cluster, depth, parent
+
+
+def force_layout(n: int, u: np.ndarray, v: np.ndarray, rng: np.random.Generator,
+                 weights: np.ndarray | None = None, iterations: int = FORCE_ITERATIONS) -> np.ndarray:
+    """
+    Fruchterman-Reingold layout, with all pairwise repulsions computed at once.
+
+    O(n^2) memory and time per iteration, so meant for a few hundred nodes.
+    """
+    if n == 1:
+        return np.zeros((1, 2))
+    pos = rng.random((n, 2))
+    k = math.sqrt(1.0 / n)
+    weights = np.ones(len(u)) if weights is None else weights
+    temperature = 0.1
+    cooling = (0.01 / temperature) ** (1 / iterations)
+    for _ in range(iterations):
+        dx = pos[:, 0, None] - pos[None, :, 0]
+        dy = pos[:, 1, None] - pos[None, :, 1]
+        dist2 = dx * dx + dy * dy
+        np.fill_diagonal(dist2, np.inf)
+        np.maximum(dist2, 1e-6, out=dist2)
+        repulsion = (k * k) / dist2  # k^2/d along the unit vector
+        disp = np.stack([(dx * repulsion).sum(axis=1), (dy * repulsion).sum(axis=1)], axis=1)
+        edge = pos[u] - pos[v]
+        pull = edge * (np.linalg.norm(edge, axis=1) * weights / k)[:, None]  # attraction d^2/k
+        for axis in (0, 1):
+            disp[:, axis] -= np.bincount(u, pull[:, axis], minlength=n)
+            disp[:, axis] += np.bincount(v, pull[:, axis], minlength=n)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return pos
+
+
+def _separate(centers: np.ndarray, radii: np.ndarray, rounds: int = 60) -> np.ndarray:
+    # Push overlapping cluster discs apart, half the overlap each way per round
+    for _ in range(rounds):
+        delta = centers[:, None, :] - centers[None, :, :]
+        dist = np.maximum(np.linalg.norm(delta, axis=2), 1e-9)
+        overlap = radii[:, None] + radii[None, :] - dist
+        np.fill_diagonal(overlap, 0)
+        overlap = np.maximum(overlap, 0)
+        if not overlap.any():
+            break
+        centers = centers + np.einsum("ijk,ij->ik", delta / dist[:, :, None], overlap / 2)
+    return centers
+
+
+def _radial(n: int, cluster: np.ndarray, depth: np.ndarray, parent: np.ndarray, clusters: int):
+    # Rings around each hub; siblings sit next to each other, ordered by their parent's angle
+    offsets = np.zeros((n, 2))
+    angle = np.zeros(n)
+    radius = np.zeros(clusters)
+    for level in range(1, int(depth.max(initial=0)) + 1):
+        members = np.nonzero(depth == level)[0]
+        parent_angle = np.where(parent[members] >= 0, angle[np.maximum(parent[members], 0)], members / max(n, 1))
+        members = members[np.lexsort((parent_angle, cluster[members]))]
+        groups = cluster[members]
+        sizes = np.bincount(groups, minlength=clusters)
+        rank = np.arange(len(members)) - (np.cumsum(sizes) - sizes)[groups]
+        ring = np.maximum(radius + RING_SPACING, sizes * NODE_GAP / (2 * math.pi))
+        radius = np.where(sizes > 0, ring, radius)
+        angle[members] = 2 * math.pi * (rank + 0.5) / sizes[groups]
+        offsets[members, 0] = ring[groups] * np.cos(angle[members])
+        offsets[members, 1] = ring[groups] * np.sin(angle[members])
+    return offsets, radius + RING_SPACING / 2
+
+
+def layout_graph(ids: list[str], labels: list[str], pairs: list[list[str]], seed: int = 0,
+                 force_max_nodes: int = 300, cluster_size: int = 30) -> dict:
+    """
+    Compute node positions, clusters and detail levels for a mindmap.
+
+    Graphs of up to `force_max_nodes` nodes get a force-directed layout.
+    Larger ones are laid out per cluster: the clusters are placed with a
+    force-directed layout of the cluster graph and kept apart, and each
+    cluster's nodes sit on rings around its hub by distance from it.
+
+    Args:
+        ids (list[str]): Node ids, in the order of the mindmap's `nodes`.
+        labels (list[str]): Node labels, same order.
+        pairs (list[list[str]]): [source, target] of each edge; edges to
+            unknown nodes and self-loops are ignored.
+        seed (int): Seed for the initial positions, so a graph always gets
+            the same layout.
+        force_max_nodes (int): Largest graph laid out as a whole.
+        cluster_size (int): Average nodes per cluster.
+
+    Returns:
+        dict: Columnar arrays in node order (`x`, `y`, `cluster`, `level`),
+        the `clusters` with their hub, label, size, centre and radius, and
+        `clusterEdges` as [cluster, cluster, edge count]. `level` is 0 for
+        hubs, 1 for other nodes with several links and 2 for leaves, so a
+        client can draw coarse levels first.
+    """
+    n = len(ids)
+    if n == 0:
+        return {"algorithm": "none", "width": 0, "height": 0, "x": [], "y": [], "cluster": [], "level": [],
+                "clusters": [], "clusterEdges": []}
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    known = [(index[s], index[t]) for s, t in pairs if s in index and t in index and s != t]
+    edges = np.array(known, dtype=np.int64).reshape(-1, 2)
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    u, v = edges[:, 0], edges[:, 1]
+    rng = np.random.default_rng(seed)
+
+    indptr, adjacency = _csr(n, u, v)
+    degree = np.diff(indptr)
+    hubs, cluster, depth, parent = cluster_nodes(n, indptr, adjacency, cluster_size)
+    clusters = int(cluster.max()) + 1
+
+    if n <= force_max_nodes:
+        algorithm = "force"
+        pos = force_layout(n, u, v, rng)
+        lengths = np.linalg.norm(pos[u] - pos[v], axis=1)
+        scale = EDGE_LENGTH / np.median(lengths) if len(lengths) else EDGE_LENGTH / math.sqrt(1.0 / n)
+        pos *= scale
+        centers = np.array([pos[cluster == c].mean(axis=0) for c in range(clusters)])
+        radii = np.array([np.linalg.norm(pos[cluster == c] - centers[c], axis=1).max() for c in range(clusters)])
+    else:
+        algorithm = "clustered"
+        offsets, radii = _radial(n, cluster, depth, parent, clusters)
+        crossing = cluster[u] != cluster[v]
+        cluster_pairs, weights = np.unique(np.sort(np.stack([cluster[u][crossing], cluster[v][crossing]], axis=1), axis=1),
+                                           axis=0, return_counts=True)
+        cluster_pairs = cluster_pairs.reshape(-1, 2)
+        centers = force_layout(clusters, cluster_pairs[:, 0], cluster_pairs[:, 1], rng,
+                               weights=np.log1p(weights.astype(float)))
+        centers = _separate(centers * 2 * radii.mean() * math.sqrt(clusters), radii)
+        pos = centers[cluster] + offsets
+
+    low = pos.min(axis=0)
+    pos -= low
+    centers = centers - low
+    level = np.where(degree > 1, 1, 2)
+    level[hubs] = 0
+
+    crossing = cluster[u] != cluster[v]
+    pairs_between, counts = np.unique(np.sort(np.stack([cluster[u][crossing], cluster[v][crossing]], axis=1), axis=1),
+                                      axis=0, return_counts=True)
+    sizes = np.bincount(cluster, minlength=clusters)
+    return {
+        "algorithm": algorithm,
+        "width": round(float(pos[:, 0].max()), 1),
+        "height": round(float(pos[:, 1].max()), 1),
+        "x": np.round(pos[:, 0], 1).tolist(),
+        "y": np.round(pos[:, 1], 1).tolist(),
+        "cluster": cluster.tolist(),
+        "level": level.tolist(),
+        "clusters": [
+            {
+                "id": c,
+                "hub": ids[hubs[c]] if c < len(hubs) else None,
+                "label": labels[hubs[c]] if c < len(hubs) else "Other",
+                "size": int(sizes[c]),
+                "x": round(float(centers[c, 0]), 1),
+                "y": round(float(centers[c, 1]), 1),
+                "radius": round(float(radii[c]), 1),
+            }
+            for c in range(clusters)
+        ],
+        "clusterEdges": [[int(a), int(b), int(count)] for (a, b), count in zip(pairs_between.reshape(-1, 2), counts)],
+    }
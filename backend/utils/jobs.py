@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import traceback
+import contextvars
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Literal
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from utils.metrics import register_gauge
+from utils.usage import current_endpoint
+
+# Tunables for background jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))  # how long finished jobs and their results are kept
+JOB_MAX_QUEUED_PER_USER = int(os.getenv("JOB_MAX_QUEUED_PER_USER", "20"))
+JOB_STORE_URL = os.getenv("JOB_STORE_URL")  # redis://host:port/db keeps job state in a Redis-compatible server
+
+JobPriority = Literal["high", "normal", "low"]
+PRIORITIES = ("high", "normal", "low")
+FINISHED = ("done", "failed")
+
+# run(progress) -> JSON-serializable result; progress(stage, **info) may be called while it runs
+JobRunner = Callable[[Callable], Awaitable]
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: str
+    user: str
+    priority: str = "normal"
+    endpoint: str = "other"  # path it was submitted on; its LLM usage is recorded there
+    status: str = "queued"  # queued | running | done | failed
+    progress: dict | None = None
+    result: object = None
+    error: str | None = None
+    status_code: int | None = None
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+
+    def public(self) -> dict:
+        """
+        Status as returned to clients. File results are fetched from `resultUrl`.
+        """
+        data = {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "progress": self.progress,
+            "createdAt": self.created,
+            "startedAt": self.started,
+            "finishedAt": self.finished,
+            "statusUrl": f"/jobs/{self.id}",
+            "eventsUrl": f"/jobs/{self.id}/events",
+            "resultUrl": f"/jobs/{self.id}/result",
+        }
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+def file_result(path: str, media_type: str, filename: str | None = None) -> dict:
+    """
+    Result of a job that produced a file; /jobs/{id}/result serves the file itself.
+    """
+    return {"file": path, "mediaType": media_type, "filename": filename or os.path.basename(path)}
+
+
+class MemoryJobStore:
+    """
+    Job state in this process. Finished jobs expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}  # id -> Job
+        self._keys = {}  # dedup key -> id
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._keys.get(job.key) == job_id:
+                del self._keys[job.key]
+
+    async def get(self, job_id: str) -> Job | None:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def put(self, job: Job):
+        self._jobs[job.id] = job
+
+    async def claim_key(self, key: str, job_id: str) -> str:
+        self._purge()
+        return self._keys.setdefault(key, job_id)
+
+    async def release_key(self, key: str, job_id: str):
+        if self._keys.get(key) == job_id:
+            del self._keys[key]
+
+    async def close(self):
+        pass
+
+
+class RedisJobStore:
+    """
+    Job state in a Redis-compatible server (Redis, Valkey, KeyDB, ...), so
+    status and deduplication are shared by every API instance using it.
+
+    Jobs still run in the process that accepted them; file results are only
+    served by an instance that can see the file.
+    """
+
+    def __init__(self, url: str, ttl: float = JOB_TTL_SECONDS):
+        import redis.asyncio as redis  # optional dependency, only needed with JOB_STORE_URL
+
+        self.ttl = int(ttl)
+        self._redis = redis.from_url(url)
+
+    async def get(self, job_id: str) -> Job | None:
+        raw = await self._redis.get(f"job:{job_id}")
+        return Job(**json.loads(raw)) if raw else None
+
+    async def put(self, job: Job):
+        await self._redis.set(f"job:{job.id}", json.dumps(asdict(job)), ex=self.ttl)
+
+    async def claim_key(self, key: str, job_id: str) -> str:
+        if await self._redis.set(f"jobkey:{key}", job_id, nx=True, ex=self.ttl):
+            return job_id
+        existing = await self._redis.get(f"jobkey:{key}")
+        return existing.decode() if existing else job_id
+
+    async def release_key(self, key: str, job_id: str):
+        # Only the job that claimed the key may release it
+        if await self._redis.get(f"jobkey:{key}") == job_id.encode():
+            await self._redis.delete(f"jobkey:{key}")
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class JobQueue:
+    """
+    Bounded pool of background workers for slow requests.
+
+    Jobs run JOB_WORKERS at a time. Higher priorities go first; within a
+    priority, users take turns (round robin), so one user's batch cannot
+    starve everyone else. A job whose dedup key matches a queued, running or
+    finished job is not started again: the submitter gets the existing job,
+    so a retry attaches to the original. Failed jobs release their key, so
+    they can be retried.
+    """
+
+    def __init__(self, store=None, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._pending = {priority: OrderedDict() for priority in PRIORITIES}  # user -> deque of (job, run)
+        self._ready = asyncio.Semaphore(0)
+        self._tasks = []
+        self._running = 0
+        self._changed = asyncio.Event()
+
+    def _get_store(self):
+        if self.store is None:
+            self.store = RedisJobStore(JOB_STORE_URL) if JOB_STORE_URL else MemoryJobStore()
+        return self.store
+
+    def start(self):
+        """
+        Start the workers, if not running yet (also done by the first `submit`).
+
+        Workers run in a fresh context, so they do not keep the contextvars
+        of whichever request happened to start them.
+        """
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._work(), context=contextvars.Context()) for _ in range(self.workers)]
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def queued(self, user: str | None = None) -> int:
+        return sum(len(jobs) for users in self._pending.values()
+                   for name, jobs in users.items() if user is None or name == user)
+
+    async def submit(self, kind: str, key: str, user: str, run: JobRunner,
+                     priority: str = "normal") -> tuple[Job, bool]:
+        """
+        Queue `run` as a job, or attach to an identical job.
+
+        Args:
+            kind (str): Job type, e.g. "summarize-file".
+            key (str): Dedup key; jobs with the same key share one run.
+            user (str): Who submitted it, for fair scheduling.
+            run (JobRunner): Coroutine function doing the work.
+            priority (str): "high", "normal" or "low".
+
+        Returns:
+            tuple[Job, bool]: The job and whether it was newly created.
+
+        Raises:
+            HTTPException: 429 if the user already has JOB_MAX_QUEUED_PER_USER jobs waiting.
+        """
+        store = self._get_store()
+        job = Job(id=uuid.uuid4().hex, kind=kind, key=key, user=user, priority=priority,
+                  endpoint=current_endpoint.get())
+        owner = await store.claim_key(key, job.id)
+        if owner != job.id:
+            existing = await store.get(owner)
+            if existing is not None and existing.status != "failed":
+                return existing, False
+            await store.release_key(key, owner)
+            await store.claim_key(key, job.id)
+
+        if self.queued(user) >= JOB_MAX_QUEUED_PER_USER:
+            await store.release_key(key, job.id)
+            raise HTTPException(status_code=429, detail="Too many queued jobs. Wait for some to finish.")
+
+        await store.put(job)
+        self._pending[priority].setdefault(user, deque()).append((job, run))
+        self.start()
+        self._ready.release()
+        return job, True
+
+    def _next(self) -> tuple[Job, JobRunner]:
+        for users in self._pending.values():
+            if users:
+                user, jobs = next(iter(users.items()))
+                item = jobs.popleft()
+                if jobs:
+                    users.move_to_end(user)  # the next job of this user waits for the others
+                else:
+                    del users[user]
+                return item
+        raise RuntimeError("No job pending")
+
+    async def _work(self):
+        while True:
+            await self._ready.acquire()
+            job, run = self._next()
+            self._running += 1
+            try:
+                await self._run(job, run)
+            finally:
+                self._running -= 1
+
+    async def _save(self, job: Job):
+        try:
+            await self.store.put(job)  # type: ignore[union-attr]
+        except Exception as e:
+            print(f"[WARN] Could not save job {job.id}: {e}")
+        self._notify()
+
+    async def _run(self, job: Job, run: JobRunner):
+        endpoint = current_endpoint.set(job.endpoint)
+        try:
+            await self._run_job(job, run)
+        finally:
+            current_endpoint.reset(endpoint)
+
+    async def _run_job(self, job: Job, run: JobRunner):
+        job.status = "running"
+        job.started = time.time()
+        await self._save(job)
+
+        def progress(stage: str, **info):
+            job.progress = {"stage": stage, **info}
+            asyncio.ensure_future(self._save(job))
+
+        try:
+            job.result = await run(progress)
+            job.status = "done"
+        except HTTPException as e:
+            job.status, job.error, job.status_code = "failed", str(e.detail), e.status_code
+        except Exception as e:
+            traceback.print_exc()
+            job.status, job.error, job.status_code = "failed", str(e), 500
+        job.finished = time.time()
+        if job.status == "failed":
+            await self.store.release_key(job.key, job.id)  # type: ignore[union-attr]
+        await self._save(job)
+
+    async def get(self, job_id: str) -> Job | None:
+        return await self._get_store().get(job_id)
+
+    async def watch(self, job_id: str, poll: float = 1.0):
+        """
+        Yield the job's state each time it changes, until it finishes.
+
+        Changes made in this process are seen at once; the store is also
+        polled every `poll` seconds for jobs run by other instances.
+        """
+        last = None
+        while True:
+            changed = self._changed
+            job = await self.get(job_id)
+            if job is None:
+                return
+            state = (job.status, json.dumps(job.progress, sort_keys=True))
+            if state != last:
+                last = state
+                yield job
+            if job.status in FINISHED:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"queued": self.queued(), "running": self._running, "workers": self.workers}
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.store is not None:
+            await self.store.close()
+
+
+job_queue = JobQueue()
+
+register_gauge("summaraize_jobs", "Background jobs waiting for and running on the job workers.", ("state",),
+               lambda: {(state,): job_queue.stats()[state] for state in ("queued", "running")})
+
+
+def request_user(request: Request) -> str:
+    # No accounts: fair scheduling is per X-User-Id header, else per client address
+    return request.headers.get("x-user-id") or (request.client.host if request.client else "anonymous")
+
+
+async def submit_job(request: Request, kind: str, key: str, run: JobRunner,
+                     priority: str = "normal", upload=None) -> JSONResponse:
+    """
+    Submit a job for an endpoint's `?job=true` mode and answer 202 with its status.
+
+    `upload` (a SpooledUpload the job will read) is closed right away when
+    the request attaches to an existing job or is rejected.
+    """
+    try:
+        job, created = await job_queue.submit(kind, f"{kind}:{key}", request_user(request), run, priority)
+    except BaseException:
+        if upload is not None:
+            upload.close()
+        raise
+    if not created and upload is not None:
+        upload.close()
+    return JSONResponse(status_code=202, content=job.public())
@@ -0,0 +1,97 @@
+import json
+
+# Arrays whose object items are emitted as soon as they are complete
+ITEM_ARRAYS = {"nodes": "node", "edges": "edge"}
+
+
+class MindmapStreamParser:
+    """
+    Incremental parser for a streamed `{"nodes": [...], "edges": [...]}` reply.
+
+    Feed it text deltas as they arrive; every object in a `nodes` or `edges`
+    array is returned as soon as its closing brace has been seen, wherever
+    those arrays sit in the reply. Text before the first "{" (prose, a ```json
+    fence) and after the top-level object is ignored. A malformed item is
+    counted and skipped without losing the items around it, and a reply cut
+    off mid-way still yields everything completed before the cut.
+    """
+
+    def __init__(self):
+        self._stack = []  # [bracket, key]: pending key of an object, name of an array
+        self._in_string = False
+        self._escape = False
+        self._string = []
+        self._last_string = None
+        self._item = None  # characters of the item being captured
+        self._item_kind = None
+        self._item_depth = 0
+        self.started = False
+        self.complete = False
+        self.malformed = 0
+
+    def feed(self, text: str) -> list[tuple[str, dict]]:
+        """
+        Consume the next chunk of the reply.
+
+        Returns:
+            list[tuple[str, dict]]: ("node", obj) and ("edge", obj) for each item
+            completed by this chunk, in order.
+        """
+        items = []
+        stack = self._stack
+        for ch in text:
+            if self.complete:
+                break
+            if self._item is not None:
+                self._item.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                elif self._item is None:
+                    self._string.append(ch)  # only keys outside items matter
+                continue
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    stack.append(["{", None])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch == ":":
+                if stack[-1][0] == "{":
+                    stack[-1][1] = self._last_string
+            elif ch == ",":
+                if stack[-1][0] == "{":
+                    stack[-1][1] = None
+            elif ch == "{" or ch == "[":
+                parent = stack[-1]
+                if ch == "{" and parent[0] == "[" and parent[1] in ITEM_ARRAYS and self._item is None:
+                    self._item = ["{"]
+                    self._item_kind = ITEM_ARRAYS[parent[1]]
+                    self._item_depth = len(stack)
+                name = parent[1] if ch == "[" and parent[0] == "{" else None
+                stack.append([ch, name])
+            elif ch == "}" or ch == "]":
+                stack.pop()
+                if ch == "}" and self._item is not None and len(stack) == self._item_depth:
+                    raw = "".join(self._item)
+                    self._item = None
+                    try:
+                        item = json.loads(raw)
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        items.append((self._item_kind, item))
+                    else:
+                        self.malformed += 1
+                if not stack:
+                    self.complete = True
+        return items
@@ -0,0 +1,83 @@
+import os
+import asyncio
+from typing import Awaitable, Callable
+from utils.chunking import split_into_chunks, estimate_tokens
+from utils.prompts import PromptTemplate, get_prompt
+
+# Tunables for long-document summarization
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "8"))
+SUMMARY_MAP_MAX_TOKENS = int(os.getenv("SUMMARY_MAP_MAX_TOKENS", "400"))
+
+MAP_PROMPT = get_prompt("summary.map")
+
+# complete(prompt, text, max_tokens, kind) -> completion text
+Completer = Callable[[PromptTemplate, str, int, str], Awaitable[str]]
+
+
+async def condense(pages: list[str], complete: Completer, chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                   concurrency: int = SUMMARY_MAP_CONCURRENCY, progress: Callable | None = None) -> str:
+    """
+    Run the map stage: reduce a document of any length to text that fits in one chunk.
+
+    Text that already fits is returned unchanged. Otherwise every chunk is
+    summarized concurrently (at most `concurrency` at a time) and the partial
+    summaries are reduced again while they exceed the chunk budget.
+
+    Args:
+        pages (list[str]): Extracted text of each page.
+        complete (Completer): Coroutine that runs one completion; swap in a stub for tests.
+        chunk_tokens (int): Approximate input token budget per chunk.
+        concurrency (int): Maximum number of chunk completions in flight.
+        progress (Callable, optional): Called as progress(stage, **info) after each chunk.
+
+    Returns:
+        str: Text ready for the final summary prompt.
+    """
+    chunks = split_into_chunks(pages, chunk_tokens) or [""]
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def summarize_chunk(chunk: str, total: int) -> str:
+        nonlocal done
+        async with semaphore:
+            result = await complete(MAP_PROMPT, chunk, SUMMARY_MAP_MAX_TOKENS, "chunk")
+        done += 1
+        if progress:
+            progress("map", chunks_done=done, chunks_total=total)
+        return result
+
+    while len(chunks) > 1:
+        previous_tokens = sum(estimate_tokens(c) for c in chunks)
+        done = 0
+        partials = await asyncio.gather(*(summarize_chunk(c, len(chunks)) for c in chunks))
+        chunks = split_into_chunks(list(partials), chunk_tokens) or [""]
+        if len(chunks) > 1 and sum(estimate_tokens(c) for c in chunks) >= previous_tokens:
+            # Partials did not shrink; stop reducing rather than loop forever
+            chunks = ["\n\n".join(chunks)]
+
+    return chunks[0]
+
+
+async def map_reduce_summarize(pages: list[str], prompt: PromptTemplate, complete: Completer,
+                               max_tokens: int = 500, chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                               concurrency: int = SUMMARY_MAP_CONCURRENCY) -> str:
+    """
+    Summarize a document of any length with a map-reduce pass.
+
+    See `condense` for the map stage; the final pass applies `prompt`
+    (short/long/bullet) to the condensed text.
+
+    Args:
+        pages (list[str]): Extracted text of each page.
+        prompt (PromptTemplate): Prompt for the final summary.
+        complete (Completer): Coroutine that runs one completion; swap in a stub for tests.
+        max_tokens (int): Completion budget for the final summary.
+        chunk_tokens (int): Approximate input token budget per chunk.
+        concurrency (int): Maximum number of chunk completions in flight.
+
+    Returns:
+        str: The final summary.
+    """
+    text = await condense(pages, complete, chunk_tokens, concurrency)
+    return await complete(prompt, text, max_tokens, "final")
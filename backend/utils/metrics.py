@@ -0,0 +1,130 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+# Debug logging (tool paths, tesseract version, conversion steps); off on the hot path
+DEBUG = os.getenv("SUMMARAIZE_DEBUG", "0") == "1"
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def debug(*args):
+    if DEBUG:
+        print("[DEBUG]", *args)
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with one series per label combination.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "summaraize_stage_seconds",
+    "Time spent in each processing stage (upload, extract, ocr, llm, docx_render, libreoffice, layout).",
+    ("stage",),
+)
+request_seconds = Histogram(
+    "summaraize_request_seconds",
+    "HTTP request duration until the last byte of the response, by route.",
+    ("method", "route", "status"),
+)
+
+# name -> (type, help, labelnames, fn returning {label values: value})
+_collectors = {}
+
+
+def register_gauge(name: str, help: str, labelnames: tuple, fn: Callable[[], dict], kind: str = "gauge"):
+    """
+    Export values read at scrape time, e.g. queue depths or cache counters.
+
+    Args:
+        name (str): Metric name.
+        help (str): Metric description.
+        labelnames (tuple): Label names.
+        fn (Callable): Returns {label values tuple: value}.
+        kind (str): "gauge" or "counter".
+    """
+    _collectors[name] = (kind, help, labelnames, fn)
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Record the time spent in the `with` block as a stage, also when it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    lines = stage_seconds.render() + request_seconds.render()
+    for name, (kind, help, labelnames, fn) in sorted(_collectors.items()):
+        try:
+            values = fn()
+        except Exception as e:
+            print(f"[WARN] Metric {name} failed: {e}")
+            continue
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(labelnames, labels)} {value}" for labels, value in sorted(values.items())]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,187 @@
+import re
+from collections import deque
+
+_non_word = re.compile(r"[^\w]+")
+_leading_article = re.compile(r"^(?:the|a|an) ")
+
+
+def normalize_label(label) -> str:
+    """
+    Reduce a node label to the form used to detect duplicate concepts.
+
+    "The Cell Membrane", "cell-membrane" and "cell membrane." all map to
+    "cell membrane".
+    """
+    text = _non_word.sub(" ", str(label or "").casefold()).strip()
+    return _leading_article.sub("", text)
+
+
+def _adjacency(nodes: list[dict], edges: list[dict]) -> dict[str, set]:
+    adjacency = {node["id"]: set() for node in nodes}
+    for edge in edges:
+        adjacency[edge["source"]].add(edge["target"])
+        adjacency[edge["target"]].add(edge["source"])
+    return adjacency
+
+
+def section_hub(graph: dict) -> str | None:
+    """
+    Return the id of the best-connected node of a section's mindmap.
+    """
+    degree = {}
+    for node in graph.get("nodes", []):
+        degree.setdefault(str(node.get("id")), 0)
+    for edge in graph.get("edges", []):
+        for end in (str(edge.get("source")), str(edge.get("target"))):
+            if end in degree:
+                degree[end] += 1
+    return max(degree, key=degree.get) if degree else None
+
+
+def merge_mindmaps(graphs: list[dict]) -> tuple[dict, list[str]]:
+    """
+    Merge per-section mindmaps into one graph.
+
+    Nodes with the same normalized label become one node (keeping the first
+    label seen), ids are reassigned as "1", "2", ..., edges pointing at
+    unknown nodes or at themselves after merging are dropped, and duplicate
+    edges between the same pair of nodes collapse into one. Runs in time
+    linear in the total number of nodes and edges.
+
+    Args:
+        graphs (list[dict]): Mindmaps with `nodes` and `edges`, one per section.
+
+    Returns:
+        tuple[dict, list[str]]: The merged graph and the merged id of each
+        section's hub node (best-connected node), in section order, without
+        repeats.
+    """
+    nodes = []
+    edges = []
+    by_label = {}  # normalized label -> merged id
+    edge_index = {}  # (source, target) -> position in edges
+    hubs = []
+
+    for graph in graphs:
+        remap = {}
+        for node in graph.get("nodes", []):
+            label = str(node.get("label") or "").strip()
+            key = normalize_label(label)
+            if not key:
+                continue
+            if key not in by_label:
+                by_label[key] = str(len(nodes) + 1)
+                nodes.append({"id": by_label[key], "label": label})
+            remap[str(node.get("id"))] = by_label[key]
+
+        for edge in graph.get("edges", []):
+            source = remap.get(str(edge.get("source")))
+            target = remap.get(str(edge.get("target")))
+            if source is None or target is None or source == target:
+                continue
+            pair = (source, target)
+            label = edge.get("label") or ""
+            if pair in edge_index:
+                existing = edges[edge_index[pair]]
+                if not existing["label"]:
+                    existing["label"] = label
+                continue
+            edge_index[pair] = len(edges)
+            edges.append({"id": f"e{source}-{target}", "source": source, "target": target, "label": label})
+
+        hub = remap.get(section_hub(graph) or "")
+        if hub and hub not in hubs:
+            hubs.append(hub)
+
+    return {"nodes": nodes, "edges": edges}, hubs
+
+
+def split_levels(graph: dict, priority: list[str], max_top: int, max_detail: int) -> tuple[dict, dict]:
+    """
+    Cap a merged mindmap to a top level plus one lazily loaded detail graph per top node.
+
+    The top level holds the `priority` nodes (e.g. section hubs) first, then
+    the best-connected remaining nodes, up to `max_top`. Every other node is
+    assigned to its nearest top node by breadth-first search. Each top node's
+    detail graph holds up to `max_detail` of its nodes, nearest and best
+    connected first. Edges that cross between two detail groups are lifted to
+    an edge between their top nodes, so the top level stays connected.
+    Nodes unreachable from every top node are dropped.
+
+    Args:
+        graph (dict): Merged mindmap with `nodes` and `edges`.
+        priority (list[str]): Node ids to place in the top level first.
+        max_top (int): Maximum number of top-level nodes.
+        max_detail (int): Maximum number of nodes per detail graph, besides the top node.
+
+    Returns:
+        tuple[dict, dict]: The top-level graph, whose nodes carry a `detail`
+        count, and a map from top node id to its detail graph.
+    """
+    nodes = {node["id"]: node for node in graph["nodes"]}
+    adjacency = _adjacency(graph["nodes"], graph["edges"])
+
+    ranked = sorted(nodes, key=lambda node_id: -len(adjacency[node_id]))
+    top = []
+    seen = set()
+    for node_id in list(priority) + ranked:
+        if len(top) >= max_top:
+            break
+        if node_id in nodes and node_id not in seen:
+            seen.add(node_id)
+            top.append(node_id)
+
+    # Multi-source BFS: owner[n] is the top node closest to n
+    owner = {node_id: node_id for node_id in top}
+    distance = {node_id: 0 for node_id in top}
+    queue = deque(top)
+    while queue:
+        current = queue.popleft()
+        for neighbour in adjacency[current]:
+            if neighbour not in owner:
+                owner[neighbour] = owner[current]
+                distance[neighbour] = distance[current] + 1
+                queue.append(neighbour)
+
+    top_set = set(top)
+    groups = {node_id: [] for node_id in top}
+    for node_id in ranked:
+        if node_id in owner and node_id not in top_set:
+            groups[owner[node_id]].append(node_id)
+    for members in groups.values():
+        members.sort(key=lambda m: distance[m])  # stable: best connected first within a distance
+        del members[max_detail:]
+
+    top_edges = []
+    lifted = set()
+    detail_edges = {node_id: [] for node_id in top}
+    kept = {member: group for group, members in groups.items() for member in members}
+    for edge in graph["edges"]:
+        source, target = edge["source"], edge["target"]
+        if source in top_set and target in top_set:
+            top_edges.append(edge)
+            lifted.add((source, target))
+            continue
+        source_group = source if source in top_set else kept.get(source)
+        target_group = target if target in top_set else kept.get(target)
+        if source_group is None or target_group is None:
+            continue
+        if source_group == target_group:
+            detail_edges[source_group].append(edge)
+        elif (source_group, target_group) not in lifted:
+            lifted.add((source_group, target_group))
+            top_edges.append({"id": f"e{source_group}-{target_group}", "source": source_group,
+                              "target": target_group, "label": ""})
+
+    top_graph = {
+        "nodes": [{**nodes[node_id], "detail": len(groups[node_id])} for node_id in top],
+        "edges": top_edges,
+    }
+    details = {
+        node_id: {
+            "nodes": [nodes[node_id]] + [nodes[member] for member in groups[node_id]],
+            "edges": detail_edges[node_id],
+        }
+        for node_id in top if groups[node_id]
+    }
+    return top_graph, details
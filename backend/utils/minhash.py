@@ -0,0 +1,192 @@
+import os
+import zlib
+import threading
+import numpy as np
+
+MAX_HASH_BLOCK = 4096  # shingles hashed at once; bounds the (num_perm, block) scratch matrix
+MERGE_EVERY = 1024  # new entries scanned linearly before they are merged into the sorted band table
+_WORD_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def shingle_hashes(words: list[str], size: int) -> np.ndarray:
+    """
+    32-bit hashes of the distinct `size`-word shingles of a text.
+    """
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    size = min(size, len(words))
+    count = len(words) - size + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        combined = combined * _WORD_MULTIPLIER + word_hashes[offset:offset + count]  # wraps mod 2**64
+    return np.unique((combined >> np.uint64(32)) ^ (combined & np.uint64(0xFFFFFFFF)))
+
+
+class MinHashIndex:
+    """
+    Array-backed MinHash index with LSH banding for near-duplicate lookup.
+
+    Each document is reduced to `num_perm` MinHash values (multiply-shift
+    hashing of its word shingles). For lookups the signature is cut into
+    `bands` bands of rows; each band is hashed to one 64-bit key. All band
+    keys live in one sorted array, so a query is a single vectorized
+    `searchsorted` for its `bands` keys, plus a scan of the few entries added
+    since the last merge. Candidates are verified by the share of equal
+    signature values, an estimate of the Jaccard similarity of the shingle
+    sets.
+
+    Signatures are kept as their low 16 bits (b-bit MinHash): 2 bytes per
+    value, at the cost of a 1/65536 chance that unequal values agree.
+    Entries are identified by a 32-byte digest, e.g. the SHA-256 of the text.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, seed: int = 1, capacity: int = 1024):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2**63, (bands, num_perm // bands), dtype=np.uint64) | np.uint64(1)
+        self._lock = threading.Lock()
+        self.size = 0
+        self._signatures = np.zeros((capacity, num_perm), dtype=np.uint16)
+        self._digests = np.zeros((capacity, 32), dtype=np.uint8)
+        self._band_keys = np.zeros((capacity, bands), dtype=np.uint64)
+        self._sorted_keys = np.empty(0, dtype=np.uint64)  # band keys of entries [0, merged), sorted
+        self._sorted_rows = np.empty(0, dtype=np.int32)  # entry of each sorted key
+        self._merged = 0
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        """
+        MinHash signature of a set of shingle hashes (full 32-bit values).
+        """
+        result = np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint64)
+        for start in range(0, len(shingles), MAX_HASH_BLOCK):
+            block = shingles[start:start + MAX_HASH_BLOCK]
+            hashed = (self._a[:, None] * block[None, :] + self._b[:, None]) >> np.uint64(32)
+            np.minimum(result, hashed.min(axis=1), out=result)
+        return result
+
+    def _keys(self, signature: np.ndarray) -> np.ndarray:
+        rows = signature.reshape(self.bands, -1)
+        keys = (rows * self._band_mix).sum(axis=1)  # wraps mod 2**64
+        return keys ^ (keys >> np.uint64(29))
+
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        low = np.searchsorted(self._sorted_keys, keys, side="left")
+        high = np.searchsorted(self._sorted_keys, keys, side="right")
+        found = [self._sorted_rows[lo:hi] for lo, hi in zip(low, high) if hi > lo]
+        recent = np.nonzero((self._band_keys[self._merged:self.size] == keys).any(axis=1))[0]
+        if len(recent):
+            found.append((recent + self._merged).astype(np.int32))
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int32)
+
+    def query(self, signature: np.ndarray, threshold: float) -> list[tuple[bytes, float]]:
+        """
+        Stored entries whose estimated similarity is at least `threshold`.
+
+        Returns:
+            list[tuple[bytes, float]]: (digest, similarity), most similar first.
+        """
+        keys = self._keys(signature)
+        low_bits = signature.astype(np.uint16)
+        with self._lock:
+            rows = self._candidates(keys)
+            if not len(rows):
+                return []
+            similarity = (self._signatures[rows] == low_bits).mean(axis=1)
+            digests = self._digests[rows]
+        order = np.argsort(-similarity, kind="stable")
+        return [(digests[i].tobytes(), float(similarity[i])) for i in order if similarity[i] >= threshold]
+
+    def add(self, signature: np.ndarray, digest: bytes) -> bool:
+        """
+        Store a signature under `digest`, unless that digest is already stored.
+
+        Returns:
+            bool: Whether it was added.
+        """
+        keys = self._keys(signature)
+        with self._lock:
+            rows = self._candidates(keys)
+            if len(rows) and (self._digests[rows] == np.frombuffer(digest, dtype=np.uint8)).all(axis=1).any():
+                return False
+            if self.size == len(self._digests):
+                self._grow()
+            self._signatures[self.size] = signature.astype(np.uint16)
+            self._digests[self.size] = np.frombuffer(digest, dtype=np.uint8)
+            self._band_keys[self.size] = keys
+            self.size += 1
+            if self.size - self._merged >= MERGE_EVERY:
+                self._merge()
+        return True
+
+    def _grow(self):
+        capacity = 2 * len(self._digests)
+        for name in ("_signatures", "_digests", "_band_keys"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _merge(self):
+        # Insert the recent keys into the sorted table: O(n) copy instead of a full re-sort
+        keys = self._band_keys[self._merged:self.size].ravel()
+        rows = np.repeat(np.arange(self._merged, self.size, dtype=np.int32), self.bands)
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        positions = np.searchsorted(self._sorted_keys, keys, side="right")
+        self._sorted_keys = np.insert(self._sorted_keys, positions, keys)
+        self._sorted_rows = np.insert(self._sorted_rows, positions, rows)
+        self._merged = self.size
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return int(self._signatures[:self.size].nbytes + self._digests[:self.size].nbytes
+                       + self._band_keys[:self.size].nbytes + self._sorted_keys.nbytes + self._sorted_rows.nbytes)
+
+    def save(self, path: str):
+        """
+        Write the index to `path` (NumPy .npz), atomically.
+        """
+        with self._lock:
+            self._merge()
+            arrays = {
+                "params": np.array([self.num_perm, self.bands, self.seed], dtype=np.int64),
+                "signatures": self._signatures[:self.size],
+                "digests": self._digests[:self.size],
+                "band_keys": self._band_keys[:self.size],
+                "sorted_keys": self._sorted_keys,
+                "sorted_rows": self._sorted_rows,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, num_perm: int, bands: int, seed: int = 1) -> "MinHashIndex":
+        """
+        Read an index written by `save`. A file made with other parameters is
+        ignored, since its signatures cannot be compared with new ones.
+
+        Raises:
+            OSError, ValueError: If the file is missing or unreadable.
+        """
+        with np.load(path) as data:
+            if tuple(data["params"]) != (num_perm, bands, seed):
+                raise ValueError(f"index parameters {tuple(data['params'])} do not match")
+            size = len(data["digests"])
+            index = cls(num_perm, bands, seed, capacity=max(1024, size))
+            index._signatures[:size] = data["signatures"]
+            index._digests[:size] = data["digests"]
+            index._band_keys[:size] = data["band_keys"]
+            index._sorted_keys = data["sorted_keys"]
+            index._sorted_rows = data["sorted_rows"]
+        index.size = index._merged = size
+        return index
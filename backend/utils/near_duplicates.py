@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Callable
+from utils.cache import CACHE_DIR, normalize_text, result_cache, text_digest
+from utils.metrics import debug, register_gauge
+
+# Tunables for reusing results of near-duplicate texts
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))  # estimated Jaccard similarity; above 1 disables
+NEAR_DUP_MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", "50"))  # shorter texts only match exactly
+NEAR_DUP_SHINGLE_WORDS = int(os.getenv("NEAR_DUP_SHINGLE_WORDS", "5"))
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))
+NEAR_DUP_PATH = os.getenv("NEAR_DUP_PATH") or (os.path.join(CACHE_DIR, "near_duplicates.npz") if CACHE_DIR else None)
+NEAR_DUP_SAVE_EVERY = int(os.getenv("NEAR_DUP_SAVE_EVERY", "100"))  # additions between saves to NEAR_DUP_PATH
+
+ENABLED = NEAR_DUP_THRESHOLD <= 1
+
+_index = None
+_index_lock = threading.Lock()
+_unsaved = 0
+stats = {"hits": 0, "misses": 0}
+
+
+def get_index():
+    """
+    The shared MinHash index, loaded from NEAR_DUP_PATH on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from utils.minhash import MinHashIndex  # NumPy loads on first use
+
+                if NEAR_DUP_PATH and os.path.exists(NEAR_DUP_PATH):
+                    try:
+                        _index = MinHashIndex.load(NEAR_DUP_PATH, NEAR_DUP_NUM_PERM, NEAR_DUP_BANDS)
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"[WARN] Starting a new near-duplicate index, could not load {NEAR_DUP_PATH}: {e}")
+                if _index is None:
+                    _index = MinHashIndex(NEAR_DUP_NUM_PERM, NEAR_DUP_BANDS)
+    return _index
+
+
+def _signature(text: str):
+    words = normalize_text(text).lower().split()
+    if len(words) < NEAR_DUP_MIN_WORDS:
+        return None
+    from utils.minhash import shingle_hashes
+
+    index = get_index()
+    return index.signature(shingle_hashes(words, NEAR_DUP_SHINGLE_WORDS))
+
+
+def _lookup(text: str, key_for: Callable[[str], str]):
+    signature = _signature(text)
+    if signature is None:
+        return None
+    started = time.perf_counter()
+    for digest, similarity in get_index().query(signature, NEAR_DUP_THRESHOLD):
+        value = result_cache.get(key_for(digest.hex()))
+        if value is not None:
+            debug(f"Near-duplicate hit (similarity {similarity:.2f}) in {1000 * (time.perf_counter() - started):.2f} ms")
+            return value
+    return None
+
+
+async def find_near_duplicate(text: str, key_for: Callable[[str], str]):
+    """
+    Cached result of an earlier text that is nearly the same as `text`.
+
+    Texts are compared by the MinHash estimate of the Jaccard similarity of
+    their word shingles, so a changed cover page, a different export tool or
+    reordered sections still match. Called after an exact cache miss.
+
+    Args:
+        text (str): Input text of the request.
+        key_for (Callable): Maps the text digest of a stored text to the
+            cache key of the wanted result (see `digest_result_key`).
+
+    Returns:
+        The cached result of the most similar stored text above
+        NEAR_DUP_THRESHOLD that has one, or None.
+    """
+    if not ENABLED:
+        return None
+    value = await asyncio.to_thread(_lookup, text, key_for)
+    stats["hits" if value is not None else "misses"] += 1
+    return value
+
+
+def _remember(text: str):
+    global _unsaved
+    signature = _signature(text)
+    if signature is None or not get_index().add(signature, bytes.fromhex(text_digest(text))):
+        return
+    with _index_lock:
+        _unsaved += 1
+        due = _unsaved >= NEAR_DUP_SAVE_EVERY
+        if due:
+            _unsaved = 0
+    if due:
+        save_index()
+
+
+async def remember(text: str):
+    """
+    Add a text whose results were just cached, so near-duplicates can reuse them.
+    """
+    if ENABLED:
+        await asyncio.to_thread(_remember, text)
+
+
+def save_index():
+    """
+    Write the index to NEAR_DUP_PATH, if set and the index was used.
+    """
+    if NEAR_DUP_PATH and _index is not None:
+        try:
+            _index.save(NEAR_DUP_PATH)
+        except OSError as e:
+            print(f"[WARN] Could not save the near-duplicate index: {e}")
+
+
+register_gauge(
+    "summaraize_near_duplicate_lookups_total", "Near-duplicate lookups after an exact cache miss, by result.",
+    ("result",), lambda: {("hit",): stats["hits"], ("miss",): stats["misses"]}, kind="counter",
+)
+register_gauge("summaraize_near_duplicate_entries", "Texts in the near-duplicate index.", (),
+               lambda: {(): _index.size if _index is not None else 0})
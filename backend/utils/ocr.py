@@ -0,0 +1,118 @@
+import os
+import time
+import hashlib
+import tempfile
+import subprocess
+from utils.metrics import DEBUG, debug
+
+# Tunables for OCR
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "/usr/bin/tesseract")
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", "8"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "300"))
+
+PAGE_SEPARATOR = "\f"
+
+
+def page_hash(pdf, page) -> str:
+    """
+    Hash the raw content stream and embedded images of a PDF page.
+
+    Identical scanned pages hash the same without being decoded or rasterized.
+    """
+    h = hashlib.sha256()
+    h.update(f"{page.rect.width}x{page.rect.height}".encode())
+    h.update(page.read_contents())
+    for image in page.get_images(full=True):
+        h.update(pdf.xref_stream_raw(image[0]) or b"")
+    return h.hexdigest()
+
+
+def ocr_key(digest: str, dpi: int = OCR_DPI, lang: str = OCR_LANG) -> str:
+    return f"{digest}-{dpi}-{lang}"
+
+
+def _tesseract(input_path: str, lang: str) -> str:
+    # One thread per tesseract process; parallelism comes from the worker pool
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    result = subprocess.run(
+        [TESSERACT_CMD, input_path, "stdout", "-l", lang],
+        capture_output=True,
+        check=True,
+        timeout=OCR_TIMEOUT,
+        env=env,
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def ocr_files(paths: list[str], lang: str = OCR_LANG) -> list[str]:
+    """
+    OCR several image files with a single tesseract process.
+
+    Tesseract accepts a text file listing images and separates the output of
+    each page with a form feed, so a batch costs one process start-up instead
+    of one per image.
+
+    Returns:
+        list[str]: Recognized text for each path, in order.
+    """
+    if len(paths) == 1:
+        return [_tesseract(paths[0], lang).rstrip(PAGE_SEPARATOR)]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        listing.write("\n".join(paths) + "\n")
+    try:
+        output = _tesseract(listing.name, lang)
+    finally:
+        os.remove(listing.name)
+
+    texts = output.split(PAGE_SEPARATOR)
+    if texts and not texts[-1].strip():
+        texts.pop()
+    if len(texts) != len(paths):
+        # Unexpected separator count; fall back to one process per image
+        return [_tesseract(path, lang).rstrip(PAGE_SEPARATOR) for path in paths]
+    return texts
+
+
+def ocr_pdf_pages(path: str, numbers: list[int], dpi: int = OCR_DPI,
+                  lang: str = OCR_LANG) -> tuple[list[str], dict]:
+    """
+    Rasterize PDF pages without a text layer and OCR them as one batch.
+
+    Runs in a worker process.
+
+    Returns:
+        tuple[list[str], dict]: Text for each page number, and the seconds
+        spent rasterizing and recognizing the batch.
+    """
+    import fitz
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        t0 = time.perf_counter()
+        paths = []
+        with fitz.open(path, filetype="pdf") as pdf:
+            for number in numbers:
+                pixmap = pdf[number].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                png_path = os.path.join(tmp_dir, f"{number}.png")
+                pixmap.save(png_path)
+                paths.append(png_path)
+        t1 = time.perf_counter()
+        texts = ocr_files(paths, lang)
+        t2 = time.perf_counter()
+    return texts, {"raster": t1 - t0, "ocr": t2 - t1}
+
+
+def debug_tesseract():
+    # Runs a subprocess, so only with SUMMARAIZE_DEBUG=1
+    if not DEBUG:
+        return
+    debug("TESSERACT CMD (runtime):", TESSERACT_CMD)
+    debug("PATH (runtime):", os.environ.get("PATH"))
+    debug("FILE EXISTS:", os.path.exists(TESSERACT_CMD))
+    try:
+        version = subprocess.check_output([TESSERACT_CMD, "--version"])
+        debug("Tesseract CLI version (runtime):", version.decode())
+    except Exception as ex:
+        debug("Error running tesseract --version at runtime:", ex)
@@ -1,7 +1,425 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import contextlib
+from collections import deque
+from typing import Awaitable, Callable
 from dotenv import load_dotenv
-import openai
+from utils.tokens import count_tokens, count_message_tokens
+from utils.usage import record_usage
+from utils.metrics import observe_stage, register_gauge
 
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=api_key)
\ No newline at end of file
+base_url = os.getenv("OPENAI_BASE_URL") or None  # point at a local fake server for load tests
+
+# Tunables for the shared async client
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+# Ask for token usage at the end of streams (turn off for servers that reject stream_options)
+OPENAI_STREAM_USAGE = os.getenv("OPENAI_STREAM_USAGE", "1") == "1"
+
+# Tunables for sharing and hedging completions
+OPENAI_COALESCE = os.getenv("OPENAI_COALESCE", "1") == "1"  # identical concurrent calls share one completion
+OPENAI_COALESCE_MAX_WAITERS = int(os.getenv("OPENAI_COALESCE_MAX_WAITERS", "100"))  # callers per shared completion
+OPENAI_HEDGE = os.getenv("OPENAI_HEDGE", "0") == "1"  # backup request for slow idempotent calls
+OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", "95"))
+OPENAI_HEDGE_MIN_DELAY = float(os.getenv("OPENAI_HEDGE_MIN_DELAY_SECONDS", "1"))
+OPENAI_HEDGE_DEFAULT_DELAY = float(os.getenv("OPENAI_HEDGE_DEFAULT_DELAY_SECONDS", "10"))  # until enough samples
+OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", "20"))
+OPENAI_HEDGE_WINDOW = int(os.getenv("OPENAI_HEDGE_WINDOW", "200"))  # recent latencies the percentile is taken over
+OPENAI_HEDGE_BUDGET = float(os.getenv("OPENAI_HEDGE_BUDGET", "0.05"))  # backups per hedgeable call, on average
+OPENAI_HEDGE_BURST = float(os.getenv("OPENAI_HEDGE_BURST", "5"))  # most backups in a row
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The pooled OpenAI client shared by every router, created on first use.
+
+    Importing the SDK takes a large share of start-up time, so it is loaded
+    here (or by the background preload in main.py) rather than at import.
+    The SDK retries 408/409/429/5xx responses with exponential backoff
+    (honouring Retry-After) up to max_retries.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            import openai
+
+            _client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONCURRENCY,
+                        max_keepalive_connections=OPENAI_MAX_CONCURRENCY,
+                    ),
+                    timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                ),
+            )
+        return _client
+
+# Caps in-flight completions across all routers
+_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+_slots = {"running": 0, "waiting": 0}
+
+
+@contextlib.asynccontextmanager
+async def _slot():
+    _slots["waiting"] += 1
+    try:
+        await _semaphore.acquire()
+    finally:
+        _slots["waiting"] -= 1
+    _slots["running"] += 1
+    try:
+        yield
+    finally:
+        _slots["running"] -= 1
+        _semaphore.release()
+
+
+register_gauge(
+    "summaraize_openai_requests", "OpenAI completions in flight and waiting for a concurrency slot.",
+    ("state",), lambda: {(state,): count for state, count in _slots.items()},
+)
+
+
+def _record(kwargs: dict, usage, content: str, started: float):
+    model = kwargs.get("model", "")
+    seconds = time.perf_counter() - started
+    observe_stage("llm", seconds)
+    if usage is None:
+        # Provider did not report usage: count locally
+        record_usage(model, count_message_tokens(kwargs.get("messages", []), model),
+                     count_tokens(content, model), seconds, estimated=True)
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    record_usage(model, usage.prompt_tokens or 0, usage.completion_tokens or 0, seconds,
+                 cached_tokens=getattr(details, "cached_tokens", None) or 0)
+
+
+def _record_abandoned(kwargs: dict, started: float):
+    # A hedged attempt that lost the race: the provider still bills its prompt
+    model = kwargs.get("model", "")
+    record_usage(model, count_message_tokens(kwargs.get("messages", []), model), 0,
+                 time.perf_counter() - started, estimated=True)
+
+
+# Latencies of recent primary attempts per (model, stream): to the full response or the first chunk
+_latencies = {}
+_hedge_tokens = OPENAI_HEDGE_BURST
+llm_stats = {"coalesced": 0, "hedges_won": 0, "hedges_lost": 0, "hedges_skipped": 0}
+
+
+def _observe_latency(key: tuple, seconds: float):
+    samples = _latencies.get(key)
+    if samples is None:
+        samples = _latencies[key] = deque(maxlen=OPENAI_HEDGE_WINDOW)
+    samples.append(seconds)
+
+
+def hedge_delay(model: str, stream: bool) -> float:
+    """
+    Seconds to wait for a primary attempt before sending a backup.
+
+    The OPENAI_HEDGE_PERCENTILE of recent latencies of the same model and
+    call type, so only the slowest few percent of calls are hedged, and a
+    fixed delay until OPENAI_HEDGE_MIN_SAMPLES latencies are known.
+    """
+    samples = _latencies.get((model, stream))
+    if samples is None or len(samples) < OPENAI_HEDGE_MIN_SAMPLES:
+        return max(OPENAI_HEDGE_MIN_DELAY, OPENAI_HEDGE_DEFAULT_DELAY)
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * OPENAI_HEDGE_PERCENTILE / 100))
+    return max(OPENAI_HEDGE_MIN_DELAY, ordered[index])
+
+
+def _take_hedge_token() -> bool:
+    # Token bucket: every hedgeable call adds OPENAI_HEDGE_BUDGET, a backup costs one.
+    # Backups never wait for a concurrency slot, so they cannot hold up other requests.
+    global _hedge_tokens
+    if _hedge_tokens < 1 or _semaphore.locked():
+        llm_stats["hedges_skipped"] += 1
+        return False
+    _hedge_tokens -= 1
+    return True
+
+
+async def _hedged(start: Callable[[], Awaitable], hedge: bool, kwargs: dict, stream: bool,
+                  discard: Callable[[object], Awaitable] | None = None):
+    """
+    Run `start()`, and for hedged calls a second `start()` if the first is slow.
+
+    The first attempt to succeed wins and the other is cancelled. If both
+    fail, the error of the one that failed last is raised.
+
+    Args:
+        start (Callable): Starts one attempt.
+        hedge (bool): Whether the call is idempotent and may be hedged.
+        kwargs (dict): Arguments of the call, for latency and usage accounting.
+        stream (bool): Whether attempts are streams, timed to their first chunk.
+        discard (Callable): Releases the result of an attempt that finished
+            but lost, e.g. closes its stream.
+
+    Returns:
+        The result of the winning attempt.
+    """
+    global _hedge_tokens
+    model = kwargs.get("model", "")
+    attempts = [(asyncio.ensure_future(start()), time.perf_counter())]
+    primary, started = attempts[0]
+    winner = None
+    try:
+        if hedge and OPENAI_HEDGE:
+            _hedge_tokens = min(OPENAI_HEDGE_BURST, _hedge_tokens + OPENAI_HEDGE_BUDGET)
+            done, _ = await asyncio.wait([primary], timeout=hedge_delay(model, stream))
+            if not done and _take_hedge_token():
+                attempts.append((asyncio.ensure_future(start()), time.perf_counter()))
+        pending = {task for task, _ in attempts}
+        while winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task, _ in attempts if task in done and task.exception() is None), None)
+            if winner is None and not pending:
+                return done.pop().result()  # raises its error
+        return winner.result()
+    finally:
+        if winner is not None and (winner is primary or not primary.done()):
+            _observe_latency((model, stream), time.perf_counter() - started)  # a lower bound if it lost
+        if winner is not None and len(attempts) > 1:
+            llm_stats["hedges_won" if winner is not primary else "hedges_lost"] += 1
+        for task, task_started in attempts:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+                if winner is not None:
+                    _record_abandoned(kwargs, task_started)
+            elif discard is not None and not task.cancelled() and task.exception() is None:
+                await discard(task.result())
+
+
+class _Flight:
+    """
+    One upstream completion shared by concurrent identical calls.
+    """
+
+    def __init__(self):
+        self.parts = []  # stream deltas so far, replayed to callers that join late
+        self.result = None
+        self.error = None
+        self.done = False
+        self.waiters = 0
+        self.task = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def wait(self):
+        await self.changed.wait()
+
+
+_flights = {}
+
+
+def _flight_key(kwargs: dict, stream: bool) -> str:
+    payload = json.dumps([stream, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _join(key: str, work: Callable[["_Flight"], Awaitable]) -> _Flight:
+    # Share the running completion for `key`, or start one with `work(flight)`
+    flight = _flights.get(key)
+    if flight is not None and flight.waiters < OPENAI_COALESCE_MAX_WAITERS:
+        llm_stats["coalesced"] += 1
+    else:
+        flight = _flights[key] = _Flight()
+        flight.task = asyncio.ensure_future(_run_flight(key, flight, work(flight)))
+    flight.waiters += 1
+    return flight
+
+
+async def _run_flight(key: str, flight: _Flight, work: Awaitable):
+    try:
+        await work
+    except Exception as e:
+        flight.error = e
+    finally:
+        flight.done = True
+        if _flights.get(key) is flight:
+            del _flights[key]
+        flight.notify()
+
+
+def _leave(key: str, flight: _Flight):
+    # The last caller to go cancels a completion nobody reads any more
+    flight.waiters -= 1
+    if not flight.waiters and not flight.done:
+        if _flights.get(key) is flight:
+            del _flights[key]
+        flight.task.cancel()
+
+
+async def _complete(kwargs: dict, hedge: bool):
+    async def attempt():
+        async with _slot():
+            return await get_client().chat.completions.create(**kwargs)
+
+    started = time.perf_counter()
+    response = await _hedged(attempt, hedge, kwargs, stream=False)
+    content = response.choices[0].message.content if response.choices else None
+    _record(kwargs, response.usage, content or "", started)
+    return response
+
+
+async def chat_completion(hedge: bool = False, **kwargs):
+    """
+    Run a chat completion on the shared async client without blocking the event loop.
+
+    At most OPENAI_MAX_CONCURRENCY completions are in flight at once; extra
+    callers wait for a free slot. Concurrent calls with the same arguments
+    share one completion (OPENAI_COALESCE). Token usage and latency are
+    recorded for the current endpoint.
+
+    Args:
+        hedge (bool): The call is idempotent, so with OPENAI_HEDGE a backup
+            request may be sent when it is slower than usual.
+        **kwargs: Arguments forwarded to `chat.completions.create`.
+
+    Returns:
+        The ChatCompletion response object.
+    """
+    if not OPENAI_COALESCE:
+        return await _complete(kwargs, hedge)
+
+    async def work(flight: _Flight):
+        flight.result = await _complete(kwargs, hedge)
+
+    key = _flight_key(kwargs, stream=False)
+    flight = _join(key, work)
+    try:
+        while not flight.done:
+            await flight.wait()
+    finally:
+        _leave(key, flight)
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
+
+
+async def _stream_chunks(kwargs: dict):
+    async with _slot():
+        stream = await get_client().chat.completions.create(stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.close()
+
+
+async def _open_stream(kwargs: dict):
+    # Start a stream and wait for its first chunk, the latency that hedging races on
+    chunks = _stream_chunks(kwargs)
+    try:
+        return chunks, await anext(chunks, None)
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+
+async def _close_stream(opened: tuple):
+    await opened[0].aclose()
+
+
+async def _stream_deltas(kwargs: dict, hedge: bool):
+    started = time.perf_counter()
+    usage = None
+    parts = []
+    chunks, chunk = await _hedged(lambda: _open_stream(kwargs), hedge, kwargs, stream=True, discard=_close_stream)
+    try:
+        while chunk is not None:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+            chunk = await anext(chunks, None)
+    finally:
+        await chunks.aclose()
+        if parts or usage is not None:
+            _record(kwargs, usage, "".join(parts), started)
+
+
+async def stream_chat_completion(hedge: bool = False, **kwargs):
+    """
+    Stream a chat completion from the shared async client.
+
+    Holds one concurrency slot for the lifetime of the stream. Concurrent
+    calls with the same arguments share one stream (OPENAI_COALESCE); a
+    caller that joins late first gets the deltas sent so far. Token usage
+    and latency are recorded for the current endpoint when the stream ends,
+    also if the caller stops reading early.
+
+    Args:
+        hedge (bool): The call is idempotent, so with OPENAI_HEDGE a backup
+            stream may be opened when the first chunk is slower than usual.
+        **kwargs: Arguments forwarded to `chat.completions.create`.
+
+    Yields:
+        str: Content deltas as the model produces them.
+    """
+    if OPENAI_STREAM_USAGE:
+        kwargs = {"stream_options": {"include_usage": True}, **kwargs}
+    if not OPENAI_COALESCE:
+        async for delta in _stream_deltas(kwargs, hedge):
+            yield delta
+        return
+
+    async def work(flight: _Flight):
+        async for delta in _stream_deltas(kwargs, hedge):
+            flight.parts.append(delta)
+            flight.notify()
+
+    key = _flight_key(kwargs, stream=True)
+    flight = _join(key, work)
+    sent = 0
+    try:
+        while True:
+            while sent < len(flight.parts):
+                sent += 1
+                yield flight.parts[sent - 1]
+            if flight.done:
+                break
+            await flight.wait()
+    finally:
+        _leave(key, flight)
+    if flight.error is not None:
+        raise flight.error
+
+
+register_gauge("summaraize_openai_coalesced_total", "Completions shared with an identical call in flight.", (),
+               lambda: {(): llm_stats["coalesced"]}, kind="counter")
+register_gauge(
+    "summaraize_openai_hedges_total",
+    "Backup requests for slow hedged calls, by whether the backup won, lost or was not sent (budget or no free slot).",
+    ("result",), lambda: {(result,): llm_stats[f"hedges_{result}"] for result in ("won", "lost", "skipped")},
+    kind="counter",
+)
+
+
+async def close_clients():
+    if _client is not None:
+        await _client.close()
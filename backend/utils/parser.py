@@ -1,41 +1,297 @@
 import re
+from typing import Iterable, Iterator
 
-def parse_test_paper(text: str):
+# One pattern per line, tried once: question start, answer line, answer-key heading,
+# option marker or sub-part marker. Lines matching none continue the previous part,
+# until an answer line closes the question.
+_LINE = re.compile(
+    r"\s*(?:"
+    r"(?P<qmark>(?:q(?:uestion)?\.?\s*(?P<qnum>\d{1,5})\s*[.):]?|(?P<num>\d{1,5})\s*[.)])\s+)"
+    r"|(?P<key>(?:answer\s*key|answers|answer\s*sheet|solutions|key)\s*:?\s*$)"
+    r"|(?P<answer>(?:correct\s+)?(?:answer|ans|solution)\s*[:.\-]\s*)"
+    r"|(?P<smark>\((?P<roman>i{1,3}|iv|vi{0,3}|ix|x)\)\s*|(?P<roman2>i{1,3}|iv|vi{0,3}|ix|x)\)\s+)"
+    r"|(?P<omark>\((?P<olabel>[a-z])\)\s*|(?P<olabel2>[a-z])\s*[.)]\s+)"
+    r")",
+    re.IGNORECASE,
+)
+# Further options sharing a line, e.g. "A) 1    B) 2    C) 3"
+_INLINE_OPTION = re.compile(r"\s+(?:\(([A-Za-z])\)\s*|([A-Za-z])[.)]\s+)")
+# Entries of an answer key: "1. B", "2) c", "3 - (d)", "4:A, 5:B"
+_KEY_PAIR = re.compile(r"(\d{1,5})\s*[.):\-]?\s*\(?([A-Za-z])\)?(?![A-Za-z])")
+_KEY_LEFTOVER = re.compile(r"[\s,;|]*")
+_ANSWER_TOKENS = re.compile(r"[\s,&/]+|\band\b", re.IGNORECASE)
+# Dotted abbreviations at the start of a line ("a. k. a.", "e. g.", "i. e."), not option markers
+_ABBREVIATION = re.compile(r"\s*[a-z]\.\s?[a-z]\.", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+
+# Lines at each end of a page that can be a running header or footer
+RUNNING_LINES = 2
+
+
+def _next_letter(options: list) -> str:
+    return chr(ord("a") + len(options))
+
+
+def _split_options(line: str, first: str) -> list[str]:
+    # Cut a line holding several options at markers that continue the letter sequence
+    expected = chr(ord(first) + 1)
+    parts = []
+    start = 0
+    for match in _INLINE_OPTION.finditer(line):
+        letter = (match.group(1) or match.group(2)).lower()
+        if letter == expected:
+            parts.append(line[start:match.start()].strip())
+            start = match.start()
+            expected = chr(ord(expected) + 1)
+    parts.append(line[start:].strip())
+    return parts
+
+
+def _parse_answer(text: str, has_options: bool) -> str | None:
+    text = text.strip().rstrip(".")
+    if not text:
+        return None
+    tokens = [t.strip("().") for t in _ANSWER_TOKENS.split(text) if t and t.strip("().")]
+    if tokens and all(len(t) == 1 and t.isalpha() for t in tokens):
+        return ",".join(t.upper() for t in tokens)
+    if has_options and tokens and len(tokens[0]) == 1 and tokens[0].isalpha():
+        return tokens[0].upper()  # "B. 4" or "(b) It decreases"
+    return text
+
+
+class _Question:
+    __slots__ = ("number", "stem", "options", "subparts", "answer", "upper")
+
+    def __init__(self, number: str, first_line: str):
+        self.number = number
+        self.stem = [first_line]
+        self.options = []
+        self.subparts = []
+        self.answer = None
+        self.upper = None  # whether the option markers are capitals, set by the first option
+
+    def add_text(self, text: str):
+        # Continuation lines belong to whatever part came last; after the answer line
+        # they are page furniture or the next section's heading, not part of the question
+        if self.answer is not None:
+            return
+        if self.subparts:
+            self.subparts[-1] += " " + text
+        elif self.options:
+            self.options[-1] += " " + text
+        else:
+            self.stem.append(text)
+
+    def add_option(self, line: str, label: str) -> bool:
+        """
+        Start the next option(s) from a line beginning with option marker `label`.
+
+        Options continue the letter sequence in the case of the first option,
+        so a stem line like "a. k. a. ..." does not break "A. ..." options:
+        if a first option in the other case turns up while only one option
+        was read, that one was stem text after all.
+
+        Returns:
+            bool: False if the line is not an option of this question.
+        """
+        upper = label.isupper()
+        letter = label.lower()
+        if self.subparts or self.answer is not None:
+            return False
+        if self.options and upper != self.upper and letter == "a" and len(self.options) == 1:
+            self.stem.append(self.options.pop())
+        if (self.options and upper != self.upper) or letter != _next_letter(self.options):
+            return False
+        self.upper = upper
+        self.options.extend(_split_options(line, letter))
+        return True
+
+    def to_dict(self) -> dict:
+        question = {"questionText": " ".join(self.stem)}
+        if self.options:
+            question["type"] = "mcq"
+            question["options"] = self.options
+            question["correctAnswer"] = _parse_answer(self.answer, True) if self.answer else None
+        else:
+            question["type"] = "open-ended"
+            if self.answer:
+                question["correctAnswer"] = _parse_answer(self.answer, False)
+        if self.subparts:
+            question["subparts"] = self.subparts
+        question["number"] = self.number
+        return question
+
+
+def _edge_lines(page: list[str]) -> set[int]:
+    """Indexes of the first and last RUNNING_LINES non-blank lines of a page."""
+    filled = [i for i, line in enumerate(page) if line.strip()]
+    return set(filled[:RUNNING_LINES] + filled[-RUNNING_LINES:])
+
+
+def _running_key(line: str) -> str | None:
+    # Page numbers and dates change from page to page; question, option and answer lines never count
+    if _LINE.match(line):
+        return None
+    return _DIGITS.sub("#", " ".join(line.lower().split()))
+
+
+def strip_running_lines(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Drop running headers and footers from the pages of a document.
+
+    A line near the top or bottom of a page (the first or last RUNNING_LINES
+    non-blank lines) is dropped when the same line, ignoring digits, is also
+    near the top or bottom of the page before or after it, so "Page 2 of 5"
+    or a course title on every page does not end up in a question that runs
+    over a page break. Question, option and answer lines are always kept.
+
+    Each page is yielded once the next one has arrived (the last one at the
+    end), so it can feed `iter_test_paper` while pages are still extracted.
+
+    Args:
+        pages (Iterable[str]): Page texts in order.
+
+    Yields:
+        str: The page texts without their running lines.
+    """
+    previous_keys = set()
+    held = None  # (lines, {index: key}) of the page waiting for its successor
+
+    def keys_of(lines):
+        return {i: key for i in _edge_lines(lines) if (key := _running_key(lines[i]))}
+
+    def release(lines, keys, neighbours):
+        drop = {i for i, key in keys.items() if key in neighbours}
+        return "\n".join(line for i, line in enumerate(lines) if i not in drop)
+
+    for page in pages:
+        lines = page.splitlines()
+        keys = keys_of(lines)
+        if held is not None:
+            held_lines, held_keys = held
+            yield release(held_lines, held_keys, previous_keys | set(keys.values()))
+            previous_keys = set(held_keys.values())
+        held = lines, keys
+    if held is not None:
+        yield release(held[0], held[1], previous_keys)
+
+
+def iter_test_paper(chunks: Iterable[str]) -> Iterator[tuple[str, dict]]:
+    """
+    Parse a test paper incrementally, one line at a time.
+
+    `chunks` can be the pages of a document as they are extracted; each chunk
+    ends a line, as if the chunks were joined with newlines. Questions that
+    continue across chunks are stitched together. Only the question being
+    read is held in memory.
+
+    Understands "1.", "1)", "Q1." and "Question 1:" numbering, stems over
+    several lines, options marked "A.", "A)", "(a)" or "a)" at the start of
+    a line (any letter in the case of the first option, also several to a
+    line), "(i)"-style sub-parts, "Answer:"/"Ans:"/"Solution:" lines and an
+    answer key section at the end of the paper. Text after a question's
+    answer line (page headers and footers, section titles) is dropped.
+
+    Yields:
+        ("question", dict) for each question once it is complete, with
+        `questionText`, `type` ("mcq" or "open-ended"), `options` and
+        `correctAnswer` for MCQs, optional `subparts` and the question
+        `number`; then ("answers", {number: answer}) if the paper ends with an
+        answer key.
+    """
+    current = None
+    preamble = None
+    key = {}
+    in_key = False
+    for chunk in chunks:
+        for line in chunk.splitlines():
+            if not line or line.isspace():
+                continue
+            if in_key:
+                pairs = _KEY_PAIR.findall(line)
+                if pairs and not _KEY_LEFTOVER.fullmatch(_KEY_PAIR.sub("", line)):
+                    pairs = None
+                if pairs:
+                    for number, letter in pairs:
+                        key[number] = letter.upper()
+                    continue
+                in_key = False
+
+            match = _LINE.match(line)
+            group = match.lastgroup if match else None
+            if group == "qmark":
+                if current is not None:
+                    yield "question", current.to_dict()
+                current = _Question(match.group("qnum") or match.group("num"), line.strip())
+            elif current is None:
+                if group == "key":
+                    in_key = True
+                elif preamble is None:
+                    preamble = line.strip()
+            elif group == "answer":
+                current.answer = line[match.end():]
+            elif group == "key":
+                yield "question", current.to_dict()
+                current = None
+                in_key = True
+            elif current.answer is not None:
+                continue  # the answer line closed the question
+            elif group == "smark":
+                letter = (match.group("roman") or match.group("roman2")).lower()
+                if current.options and letter == _next_letter(current.options):
+                    current.options.append(line.strip())  # "(i)" after "(h)" is an option
+                else:
+                    current.subparts.append(line.strip())
+            elif group == "omark":
+                label = match.group("olabel") or match.group("olabel2")
+                abbreviation = match.group("olabel2") and _ABBREVIATION.match(line)
+                if abbreviation or not current.add_option(line.strip(), label):
+                    current.add_text(line.strip())
+            else:
+                current.add_text(line.strip())
+
+    if current is not None:
+        yield "question", current.to_dict()
+    elif preamble is not None and not key:
+        # No numbered questions at all: treat the text as one open-ended question
+        yield "question", {"questionText": preamble, "type": "open-ended", "number": None}
+    if key:
+        yield "answers", key
+
+
+def parse_test_paper(text: str) -> list[dict]:
+    """
+    Parse a whole test paper into questions.
+
+    See `iter_test_paper` for the formats understood. Answers from an answer
+    key at the end fill in questions that have no inline answer.
+
+    Args:
+        text (str): Extracted text of the paper.
+
+    Returns:
+        list[dict]: The questions in order.
+    """
     questions = []
-    raw_questions = re.split(r'\n(?=\d+\.\s)', text.strip())  # Split on "1. ", "2. ", etc
-
-    for block in raw_questions:
-        block = block.strip()
-        if not block:
-            continue
-
-        question_lines = block.splitlines()
-        question_text = question_lines[0]
-
-        # Scan for MCQ options (A., B., etc.)
-        options = []
-        for line in question_lines[1:]:
-            match = re.match(r"^[A-D]\.\s+(.*)", line)
-            if match:
-                options.append(match.group(0))
-
-        if options: # Treat as MCQ question
-            correct_answer = None
-            for line in question_lines:
-                ans_match = re.match(r"^(Answer|Solution):\s*([A-D])", line, re.IGNORECASE)
-                if ans_match:
-                    correct_answer = ans_match.group(2)
-
-            questions.append({
-                "questionText": question_text,
-                "type": "mcq",
-                "options": options,
-                "correctAnswer": correct_answer
-            })
-        else: # Treat as open-ended question
-            questions.append({
-                "questionText": question_text,
-                "type": "open-ended"
-            })
-
-    return questions
\ No newline at end of file
+    by_number = {}
+    for kind, value in iter_test_paper([text]):
+        if kind == "question":
+            questions.append(value)
+            by_number[value["number"]] = value
+        else:
+            apply_answer_key(by_number, value)
+    return questions
+
+
+def apply_answer_key(by_number: dict, key: dict):
+    """
+    Fill `correctAnswer` from an answer key, without overriding inline answers.
+
+    Args:
+        by_number (dict): Question dicts by question number.
+        key (dict): Answers by question number.
+    """
+    for number, answer in key.items():
+        question = by_number.get(number)
+        if question is not None and not question.get("correctAnswer"):
+            question["correctAnswer"] = answer
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from utils.tokens import count_message_tokens
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A versioned prompt. Bump `version` whenever the wording changes so cached
+    results made with the old prompt are not reused.
+    """
+    name: str
+    version: str
+    instruction: str
+    system: str | None = None
+
+    def messages(self, text: str, suffix: str = "") -> list[dict]:
+        """
+        Build the chat messages for an input text.
+
+        The parts that never change (system message, then the instruction)
+        come first and the input last, so every request with this template
+        shares the same prefix and providers can serve it from their prompt
+        cache. `suffix` goes after the input, so requests about the same
+        input also share the input part.
+        """
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        content = f"{self.instruction}\n\n{text}"
+        if suffix:
+            content += f"\n\n{suffix}"
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def overhead_tokens(self, model: str) -> int:
+        # Tokens of the prompt around the input text
+        return count_message_tokens(self.messages(""), model)
+
+
+SUMMARY_SYSTEM = "You are a helpful academic summarizer."
+
+MINDMAP_INSTRUCTION = (
+    "From the following input, extract a set of concepts and relationships as a mindmap. "
+    "Return only valid JSON with two arrays: `nodes` and `edges`. No explanation, no markdown — just JSON.\n\n"
+    "Format:\n"
+    "{\n  \"nodes\": [ {\"id\": \"1\", \"label\": \"...\"} ],\n"
+    "  \"edges\": [ {\"source\": \"1\", \"target\": \"2\", \"label\": \"...\"} ]\n}\n\n"
+    "Input:"
+)
+
+PROMPTS = {prompt.name: prompt for prompt in (
+    PromptTemplate("summary.short", "1", "Summarize the following in a short paragraph:", SUMMARY_SYSTEM),
+    PromptTemplate("summary.long", "1", "Summarize the following in a long, detailed paragraph:", SUMMARY_SYSTEM),
+    PromptTemplate("summary.bullet", "1", "Summarize the following using bullet points:", SUMMARY_SYSTEM),
+    PromptTemplate(
+        "summary.map", "1",
+        "Summarize the following section of a longer document. Keep the key facts, "
+        "definitions, headings and any numbers needed to understand it:",
+        SUMMARY_SYSTEM,
+    ),
+    PromptTemplate("mindmap", "2", MINDMAP_INSTRUCTION),
+)}
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    """
+    Look up a prompt template by name.
+
+    Raises:
+        KeyError: If there is no such prompt.
+    """
+    return PROMPTS[name]
@@ -0,0 +1,80 @@
+import json
+import asyncio
+from typing import Callable
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop reverse proxies from buffering the stream
+}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def relay_progress(fn: Callable, *args):
+    """
+    Run a coroutine function and relay its progress as it happens.
+
+    `fn` is awaited as fn(*args, progress=...) where progress(stage, **info)
+    is called on the event loop.
+
+    Yields:
+        ("progress", info) tuples while `fn` runs, then ("result", value).
+    """
+    queue = asyncio.Queue()
+
+    def progress(stage: str, **info):
+        queue.put_nowait({"stage": stage, **info})
+
+    task = asyncio.ensure_future(fn(*args, progress=progress))
+    try:
+        while not task.done() or not queue.empty():
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield "progress", getter.result()
+            else:
+                getter.cancel()
+    finally:
+        if not task.done():
+            task.cancel()
+    yield "result", task.result()
+
+
+async def relay_stream(gen_fn: Callable, *args):
+    """
+    Iterate an async generator function and relay its progress as it happens.
+
+    `gen_fn` is called as gen_fn(*args, progress=...) where progress(stage, **info)
+    is called on the event loop.
+
+    Yields:
+        ("progress", info) and ("item", value) tuples in the order they occur.
+    """
+    queue = asyncio.Queue()
+    finished = object()
+
+    def progress(stage: str, **info):
+        queue.put_nowait(("progress", {"stage": stage, **info}))
+
+    async def run():
+        try:
+            async for value in gen_fn(*args, progress=progress):
+                queue.put_nowait(("item", value))
+            queue.put_nowait((finished, None))
+        except BaseException as e:
+            queue.put_nowait((finished, e))
+
+    task = asyncio.ensure_future(run())
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind is finished:
+                if value is not None:
+                    raise value
+                return
+            yield kind, value
+    finally:
+        if not task.done():
+            task.cancel()
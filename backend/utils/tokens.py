@@ -0,0 +1,87 @@
+import os
+from functools import lru_cache
+from utils.chunking import CHARS_PER_TOKEN, estimate_tokens
+
+# Context window (input + output tokens) per model family, longest prefix wins
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("DEFAULT_CONTEXT_WINDOW", "8192"))
+# Tokens added per chat message for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def context_window(model: str) -> int:
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    return CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken  # optional: without it, token counts are estimated
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The encoding files are fetched on first use; offline hosts fall back
+        print(f"[WARN] No tokenizer for {model}, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens `model` will see for `text`.
+
+    Exact with tiktoken installed, otherwise the ~4 characters per token
+    estimate used for chunking.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode_ordinary(text))
+
+
+def count_message_tokens(messages: list[dict], model: str) -> int:
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages) + 3
+
+
+def input_budget(model: str, max_output: int, overhead: int = 0) -> int:
+    """
+    Tokens of input text that fit in one request after the prompt and the reply.
+
+    Args:
+        model (str): Model the request goes to.
+        max_output (int): Tokens reserved for the reply.
+        overhead (int): Tokens of the prompt around the input text.
+    """
+    return max(context_window(model) - max_output - overhead, 0)
+
+
+def fit_text(text: str, max_tokens: int, model: str) -> str:
+    """
+    Cut `text` to at most `max_tokens` tokens, keeping the start.
+
+    Returns the text unchanged when it fits. Texts with no more UTF-8 bytes
+    than the budget always fit (every token covers at least one byte), so
+    they are not tokenized at all; counting characters instead would let CJK
+    text, often a token or more per character, through uncut.
+    """
+    if len(text.encode()) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is None:
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        return text[:max(max_tokens - 1, 0) * CHARS_PER_TOKEN]
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,77 @@
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from fastapi import HTTPException, UploadFile
+from utils.metrics import timed
+
+# Largest accepted upload. Requests that declare a larger Content-Length are rejected
+# before the body is read; chunked uploads are only cut off while spooling (see spool_upload)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and other form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+    filename: str | None = None
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def too_large(limit: int = MAX_UPLOAD_BYTES) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large. The limit is {limit // (1024 * 1024)} MB.")
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, directory: str | None = None) -> SpooledUpload:
+    """
+    Copy an upload to a temporary file in fixed-size chunks, hashing it on the way.
+
+    Only one chunk is held in memory at a time. The copy stops with a 413 as
+    soon as the upload exceeds `max_bytes`. By then Starlette has already
+    parsed the multipart body into its own spooled file, so for uploads sent
+    without a Content-Length this bounds the second copy, not the request;
+    the limit_upload_size middleware in main.py only helps when the length is
+    declared.
+
+    Args:
+        file (UploadFile): The incoming upload.
+        max_bytes (int): Size limit for this upload.
+        directory (str, optional): Where to create the temporary file.
+
+    Returns:
+        SpooledUpload: Path, size and SHA-256 of the spooled file. The caller
+        must close() it to delete the file.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".upload")
+    try:
+        with timed("upload"), os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest(), filename=file.filename)
@@ -0,0 +1,59 @@
+import contextvars
+from collections import defaultdict
+from utils.metrics import register_gauge
+
+# Path of the API request being served, set by the middleware in main.py
+current_endpoint = contextvars.ContextVar("current_endpoint", default="other")
+
+_FIELDS = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens", "estimated", "seconds")
+_usage = defaultdict(lambda: dict.fromkeys(_FIELDS, 0))  # (endpoint, model) -> counters
+
+
+def record_usage(model: str, prompt_tokens: int, completion_tokens: int, seconds: float,
+                 cached_tokens: int = 0, estimated: bool = False):
+    """
+    Add one completion to the usage totals of the current endpoint.
+
+    Args:
+        model (str): Model the completion ran on.
+        prompt_tokens (int): Input tokens billed.
+        completion_tokens (int): Output tokens billed.
+        seconds (float): Wall time of the completion, including waiting for a slot.
+        cached_tokens (int): Input tokens served from the provider's prompt cache.
+        estimated (bool): True when the counts were made locally because the
+            provider did not report usage.
+    """
+    entry = _usage[(current_endpoint.get(), model)]
+    entry["requests"] += 1
+    entry["prompt_tokens"] += prompt_tokens
+    entry["cached_tokens"] += cached_tokens
+    entry["completion_tokens"] += completion_tokens
+    entry["estimated"] += estimated
+    entry["seconds"] += seconds
+
+
+def usage_stats() -> dict:
+    """
+    Token usage and latency per endpoint and model since start-up.
+
+    Returns:
+        dict: {endpoint: {model: counters}}, where counters include the mean
+        seconds per completion.
+    """
+    stats = {}
+    for (endpoint, model), entry in sorted(_usage.items()):
+        stats.setdefault(endpoint, {})[model] = {
+            **entry,
+            "seconds": round(entry["seconds"], 3),
+            "mean_seconds": round(entry["seconds"] / entry["requests"], 3),
+        }
+    return stats
+
+
+register_gauge(
+    "summaraize_llm_tokens_total", "LLM tokens billed, by endpoint, model and kind.",
+    ("endpoint", "model", "kind"),
+    lambda: {(endpoint, model, kind): entry[f"{kind}_tokens"] for (endpoint, model), entry in list(_usage.items())
+             for kind in ("prompt", "cached", "completion")},
+    kind="counter",
+)
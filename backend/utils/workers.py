@@ -0,0 +1,130 @@
+import os
+import queue
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from utils.metrics import register_gauge
+
+# Leave one core for the event loop by default
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+
+_pool = None
+_pending = 0  # jobs submitted to the pool and not finished yet
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound work (PDF parsing, OCR, DOCX rendering).
+
+    Workers are spawned rather than forked so they never inherit the server's
+    threads or event loop.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_process(fn, *args, **kwargs):
+    global _pending
+    loop = asyncio.get_running_loop()
+    _pending += 1
+    try:
+        return await loop.run_in_executor(get_process_pool(), functools.partial(fn, *args, **kwargs))
+    finally:
+        _pending -= 1
+
+
+register_gauge(
+    "summaraize_process_pool_jobs", "Jobs running on the worker process pool and queued for it.",
+    ("state",), lambda: {("running",): min(_pending, WORKER_PROCESSES), ("queued",): max(_pending - WORKER_PROCESSES, 0)},
+)
+
+
+_END = object()
+
+
+async def iter_in_thread(gen_fn, source):
+    """
+    Run a generator function in a thread, feeding it from an async iterator.
+
+    `gen_fn(items)` is called in a worker thread with a blocking iterator over
+    what `source` yields, so a stateful parser can consume input as it
+    arrives without running on the event loop. Whatever it yields is passed
+    back in order.
+
+    Args:
+        gen_fn: Generator function taking one iterable.
+        source: Async iterator providing the input.
+
+    Yields:
+        The values yielded by `gen_fn`.
+    """
+    loop = asyncio.get_running_loop()
+    inbox = queue.Queue()
+    outbox = asyncio.Queue()
+    failure = []
+
+    def items():
+        while (item := inbox.get()) is not _END:
+            yield item
+        if failure:
+            raise failure[0]
+
+    def run():
+        try:
+            for value in gen_fn(items()):
+                loop.call_soon_threadsafe(outbox.put_nowait, (True, value))
+            loop.call_soon_threadsafe(outbox.put_nowait, (False, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(outbox.put_nowait, (False, e))
+
+    async def pump():
+        try:
+            async for item in source:
+                inbox.put(item)
+        except BaseException as e:
+            failure.append(e)  # re-raised in the thread, which passes it back
+        finally:
+            inbox.put(_END)
+
+    pump_task = asyncio.ensure_future(pump())
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    try:
+        while True:
+            more, value = await outbox.get()
+            if not more:
+                if value is not None:
+                    raise value
+                break
+            yield value
+        await worker
+    finally:
+        # Stop feeding and unblock the thread if the consumer left early
+        pump_task.cancel()
+        inbox.put(_END)
+
+
+def _warm_worker():
+    import fitz  # noqa: F401
+    import docx2txt  # noqa: F401
+    import utils.docx_generator  # noqa: F401
+
+
+async def warm_pool():
+    """
+    Start every worker process and load the parsing libraries in it, so the
+    first upload does not pay for process start-up and imports.
+    """
+    await asyncio.gather(*(run_in_process(_warm_worker) for _ in range(WORKER_PROCESSES)))
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None